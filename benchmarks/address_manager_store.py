@@ -81,6 +81,8 @@ def populate_address_manager(num_new: int = 500000, num_tried: int = 200000) ->
                 # fallback if no bucket available
                 epi.ref_count = 0
 
+    # the matrices were filled directly, rebuild the occupied slot index to match
+    am.load_used_table_positions()
     return am
 
 
@@ -90,6 +92,7 @@ async def benchmark_serialize_deserialize(iterations: int = 5) -> None:
     """
 
     total_serialize_time = 0.0
+    total_reserialize_time = 0.0
     total_deserialize_time = 0.0
 
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -109,6 +112,16 @@ async def benchmark_serialize_deserialize(iterations: int = 5) -> None:
             total_serialize_time += serialize_duration
             print(f"Serialize time: {serialize_duration:.6f} seconds")
 
+            # Benchmark re-serializing after a small fraction of the entries changed
+            touched = random.Random(i).sample(list(address_manager.map_info.values()), 1000)
+            for info in touched:
+                info.timestamp += 1
+            start_reserialize = time.perf_counter()
+            address_manager.serialize_bytes()
+            reserialize_duration = time.perf_counter() - start_reserialize
+            total_reserialize_time += reserialize_duration
+            print(f"Re-serialize time ({len(touched)} changed): {reserialize_duration:.6f} seconds")
+
             # Benchmark deserialize
             async with aiofiles.open(peers_file_path, "rb") as f:
                 data = io.BytesIO(await f.read())
@@ -121,11 +134,27 @@ async def benchmark_serialize_deserialize(iterations: int = 5) -> None:
 
         print(f"\n=== Benchmark Summary ({iterations} iterations) ===")
         print(f"Average serialize time:   {total_serialize_time / iterations:.6f} seconds")
+        print(f"Average re-serialize time: {total_reserialize_time / iterations:.6f} seconds")
         print(f"Average deserialize time: {total_deserialize_time / iterations:.6f} seconds")
 
 
+async def benchmark_select_peer(iterations: int = 100000) -> None:
+    """
+    Benchmarks select_peer() on a sparsely populated table, where probing for an occupied slot used to dominate.
+    """
+
+    address_manager = populate_address_manager(num_new=2000, num_tried=500)
+    for new_only in (False, True):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await address_manager.select_peer(new_only)
+        duration = time.perf_counter() - start
+        print(f"select_peer(new_only={new_only}): {duration / iterations * 1_000_000:.2f} us per call")
+
+
 async def main() -> None:
     await benchmark_serialize_deserialize(iterations=10)
+    await benchmark_select_peer()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from time import perf_counter
+
+import click
+from chia_rs import AugSchemeMPL
+
+from chia.wallet.derive_keys import master_pk_to_wallet_pk_unhardened_intermediate
+from chia.wallet.util.puzzle_hash_derivation import derive_unhardened_keys
+
+
+async def main(count: int, workers: list[int]) -> None:
+    master_sk = AugSchemeMPL.key_gen(bytes([1] * 32))
+    intermediate_pk = master_pk_to_wallet_pk_unhardened_intermediate(master_sk.get_g1())
+    context = multiprocessing.get_context("spawn")
+
+    expected = None
+    for num_workers in workers:
+        start = perf_counter()
+        keys = await derive_unhardened_keys(
+            intermediate_pk,
+            0,
+            count,
+            num_workers=num_workers,
+            min_pool_size=0,
+            multiprocessing_context=context,
+        )
+        end = perf_counter()
+        if expected is None:
+            expected = keys
+        assert keys == expected
+        print(f"{num_workers:2d} workers: {end - start:0.2f}s ({count / (end - start):0.0f} puzzle hashes/s)")
+
+
+@click.command()
+@click.option("--count", type=int, default=10000, help="number of derivation indexes")
+@click.option("--workers", type=int, multiple=True, default=[0, 1, 2, 4], help="worker processes (0 = inline)")
+def entry_point(count: int, workers: tuple[int, ...]) -> None:
+    asyncio.run(main(count, list(workers)))
+
+
+if __name__ == "__main__":
+    entry_point()
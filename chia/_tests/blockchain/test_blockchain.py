@@ -5,6 +5,7 @@ import logging
 import random
 import time
 from collections.abc import AsyncIterator, Awaitable
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 from dataclasses import replace
 from typing import Optional
@@ -37,17 +38,19 @@ from chia._tests.blockchain.blockchain_test_utils import (
 from chia._tests.conftest import ConsensusMode
 from chia._tests.util.blockchain import create_blockchain
 from chia._tests.util.get_name_puzzle_conditions import get_name_puzzle_conditions
+from chia.consensus import multiprocess_validation
 from chia.consensus.augmented_chain import AugmentedBlockchain
 from chia.consensus.block_body_validation import ForkInfo
 from chia.consensus.block_header_validation import validate_finished_header_block
 from chia.consensus.block_rewards import calculate_base_farmer_reward
 from chia.consensus.blockchain import AddBlockResult, Blockchain
+from chia.consensus.blockchain_interface import BlockRecordsProtocol
 from chia.consensus.coinbase import create_farmer_coin
 from chia.consensus.find_fork_point import lookup_fork_chain
 from chia.consensus.full_block_to_block_record import block_to_block_record
 from chia.consensus.generator_tools import get_block_header
 from chia.consensus.get_block_generator import get_block_generator
-from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_block
+from chia.consensus.multiprocess_validation import PreValidationResult, check_pospace_batch, pre_validate_block
 from chia.consensus.pot_iterations import is_overflow_block
 from chia.simulator.block_tools import BlockTools, create_block_tools_async
 from chia.simulator.keyring import TempKeyring
@@ -4036,6 +4039,226 @@ async def test_get_tx_peak(default_400_blocks: list[FullBlock], empty_blockchain
     assert bc.get_tx_peak() == last_tx_block_record
 
 
+@pytest.mark.anyio
+async def test_check_pospace_batch(default_400_blocks: list[FullBlock], empty_blockchain: Blockchain) -> None:
+    bc = empty_blockchain
+    test_blocks = default_400_blocks[:100]
+    # none of the blocks are in the blockchain yet, so the challenges are
+    # derived from the FullBlocks alone
+    futures = check_pospace_batch(bc.constants, bc, test_blocks, {b.header_hash: b for b in test_blocks}, bc.pool)
+    speculative = await asyncio.gather(*futures)
+    for result in speculative:
+        assert result is not None
+        assert result[1] is not None
+
+    # once the blocks have been added, the challenges are found through the
+    # block records and must match
+    for block in test_blocks:
+        await _validate_and_add_block(bc, block)
+    futures = check_pospace_batch(bc.constants, bc, test_blocks, {}, bc.pool)
+    assert await asyncio.gather(*futures) == speculative
+
+    # a block whose challenge depends on unknown ancestors can't be checked
+    # ahead of time
+    orphan = next(b for b in default_400_blocks[200:] if len(b.finished_sub_slots) == 0)
+    futures = check_pospace_batch(bc.constants, bc, [orphan], {}, bc.pool)
+    assert await asyncio.gather(*futures) == [None]
+
+
+@pytest.mark.anyio
+async def test_pre_validate_block_process_pool(
+    default_1000_blocks: list[FullBlock], empty_blockchain: Blockchain, caplog: pytest.LogCaptureFixture
+) -> None:
+    bc = empty_blockchain
+    vs = ValidationState(bc.constants.SUB_SLOT_ITERS_STARTING, bc.constants.DIFFICULTY_STARTING, None)
+    chain = AugmentedBlockchain(bc)
+    futures: list[Awaitable[PreValidationResult]] = []
+    with caplog.at_level(logging.DEBUG), ProcessPoolExecutor(max_workers=2) as pool:
+        for block in default_1000_blocks:
+            futures.append(await pre_validate_block(bc.constants, chain, block, pool, None, vs))
+        results = await asyncio.gather(*futures)
+
+    # the block records passed to the worker processes were always enough to
+    # validate the blocks
+    assert "needed more block records" not in caplog.text
+    for block, result in zip(default_1000_blocks, results):
+        assert result.error is None
+        fork_info = ForkInfo(block.height - 1, block.height - 1, block.prev_header_hash)
+        _, err, _ = await bc.add_block(block, result, sub_slot_iters=vs.ssi, fork_info=fork_info)
+        assert err is None
+
+
+@pytest.mark.anyio
+async def test_pre_validate_block_process_pool_partial_view(
+    default_400_blocks: list[FullBlock],
+    empty_blockchain: Blockchain,
+    caplog: pytest.LogCaptureFixture,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # only pass the previous block record to the worker processes. Blocks that
+    # need more than that (e.g. at the epoch boundary, where the difficulty
+    # adjustment looks far back) are validated again in this process
+    def previous_record_only(
+        constants: ConsensusConstants, blockchain: BlockRecordsProtocol, block: FullBlock, prev_ses_block_known: bool
+    ) -> list[BlockRecord]:
+        prev = blockchain.try_block_record(block.prev_header_hash)
+        return [] if prev is None else [prev]
+
+    monkeypatch.setattr(multiprocess_validation, "_block_records_view", previous_record_only)
+    bc = empty_blockchain
+    vs = ValidationState(bc.constants.SUB_SLOT_ITERS_STARTING, bc.constants.DIFFICULTY_STARTING, None)
+    chain = AugmentedBlockchain(bc)
+    futures: list[Awaitable[PreValidationResult]] = []
+    with caplog.at_level(logging.DEBUG), ProcessPoolExecutor(max_workers=2) as pool:
+        for block in default_400_blocks:
+            futures.append(await pre_validate_block(bc.constants, chain, block, pool, None, vs))
+        results = await asyncio.gather(*futures)
+
+    assert "needed more block records" in caplog.text
+    for block, result in zip(default_400_blocks, results):
+        assert result.error is None
+        fork_info = ForkInfo(block.height - 1, block.height - 1, block.prev_header_hash)
+        _, err, _ = await bc.add_block(block, result, sub_slot_iters=vs.ssi, fork_info=fork_info)
+        assert err is None
+
+
+def test_block_records_view_misses() -> None:
+    view = multiprocess_validation._BlockRecordsView({})
+    assert view.try_block_record(bytes32.zeros) is None
+    assert view.incomplete
+
+    view = multiprocess_validation._BlockRecordsView({})
+    assert not view.contains_height(uint32(10))
+    assert view.incomplete
+
+    # if the records go back to the genesis block, a miss means there's no
+    # such block
+    view = multiprocess_validation._BlockRecordsView({})
+    view.reaches_genesis = True
+    assert view.try_block_record(bytes32.zeros) is None
+    assert view.height_to_hash(uint32(10)) is None
+    assert not view.incomplete
+
+
+@pytest.mark.anyio
+async def test_batch_commit(default_400_blocks: list[FullBlock], empty_blockchain: Blockchain) -> None:
+    bc = empty_blockchain
+    blocks = default_400_blocks[:30]
+    for block in blocks[:10]:
+        await _validate_and_add_block(bc, block)
+
+    # if the batch fails, none of its blocks are committed and the in-memory
+    # state is reloaded from the database
+    with pytest.raises(RuntimeError, match="batch failed"):
+        async with bc.batch_commit():
+            for block in blocks[10:20]:
+                await _validate_and_add_block(bc, block)
+            peak = bc.get_peak()
+            assert peak is not None
+            assert peak.height == 19
+            raise RuntimeError("batch failed")
+
+    peak = bc.get_peak()
+    assert peak is not None
+    assert peak.height == 9
+    for block in blocks[10:20]:
+        assert bc.height_to_hash(block.height) is None
+        assert bc.try_block_record(block.header_hash) is None
+        assert await bc.get_block_record_from_db(block.header_hash) is None
+        # nor are they left in the block store's caches
+        assert bc.block_store.block_cache.get(block.header_hash) is None
+        assert bc.block_store.generator_cache.get(block.header_hash) is None
+        assert await bc.block_store.get_full_block(block.header_hash) is None
+
+    async with bc.batch_commit():
+        for block in blocks[10:30]:
+            await _validate_and_add_block(bc, block)
+        # nested batches join the outer one
+        async with bc.batch_commit():
+            pass
+    peak = bc.get_peak()
+    assert peak is not None
+    assert peak.height == 29
+    for block in blocks:
+        assert await bc.get_block_record_from_db(block.header_hash) is not None
+        assert bc.height_to_hash(block.height) == block.header_hash
+
+
+@pytest.mark.anyio
+async def test_get_ancestor(empty_blockchain: Blockchain, bt: BlockTools) -> None:
+    b = empty_blockchain
+    blocks = bt.get_consecutive_blocks(40)
+    for block in blocks:
+        await _validate_and_add_block(b, block)
+
+    fork_blocks = bt.get_consecutive_blocks(15, blocks[:10], seed=b"2")[10:]
+    fork_info = ForkInfo(9, 9, blocks[9].header_hash)
+    for block in fork_blocks:
+        await _validate_and_add_block(b, block, expected_result=AddBlockResult.ADDED_AS_ORPHAN, fork_info=fork_info)
+
+    for chain in (blocks, blocks[:10] + fork_blocks):
+        tip = chain[-1]
+        for target_height in range(tip.height + 1):
+            assert await b.get_ancestor(tip.header_hash, tip.height, target_height) == chain[target_height].header_hash
+
+    # fork blocks that are not in the cache are looked up in the database
+    for block in fork_blocks[:-1]:
+        b.remove_block_record(block.header_hash)
+    chain = blocks[:10] + fork_blocks
+    tip = chain[-1]
+    for target_height in range(tip.height + 1):
+        assert await b.get_ancestor(tip.header_hash, tip.height, target_height) == chain[target_height].header_hash
+
+
+@pytest.mark.anyio
+async def test_block_record_cache_with_forks(empty_blockchain: Blockchain, bt: BlockTools) -> None:
+    b = empty_blockchain
+    blocks = bt.get_consecutive_blocks(30)
+    for block in blocks:
+        await _validate_and_add_block(b, block)
+
+    # two forks off of height 9, so heights 10 - 14 have three blocks each
+    fork_info = ForkInfo(9, 9, blocks[9].header_hash)
+    fork_1 = bt.get_consecutive_blocks(15, blocks[:10], seed=b"2")[10:]
+    for block in fork_1:
+        await _validate_and_add_block(b, block, expected_result=AddBlockResult.ADDED_AS_ORPHAN, fork_info=fork_info)
+    fork_info = ForkInfo(9, 9, blocks[9].header_hash)
+    fork_2 = bt.get_consecutive_blocks(5, blocks[:10], seed=b"3")[10:]
+    for block in fork_2:
+        await _validate_and_add_block(b, block, expected_result=AddBlockResult.ADDED_AS_ORPHAN, fork_info=fork_info)
+
+    # removing any of the blocks at a height leaves the others
+    b.remove_block_record(blocks[10].header_hash)
+    assert b.try_block_record(blocks[10].header_hash) is None
+    assert b.block_record(fork_1[0].header_hash).height == 10
+    assert b.block_record(fork_2[0].header_hash).height == 10
+    b.remove_block_record(fork_2[0].header_hash)
+    assert b.block_record(fork_1[0].header_hash).height == 10
+    b.remove_block_record(fork_1[0].header_hash)
+    assert b.try_block_record(fork_1[0].header_hash) is None
+
+    b.remove_block_record(fork_1[1].header_hash)
+    assert b.block_record(blocks[11].header_hash).height == 11
+    assert b.block_record(fork_2[1].header_hash).height == 11
+
+    # cleaning the cache drops every block at and below the height, including
+    # the forks, and keeps the ones above it
+    b.constants = b.constants.replace(BLOCKS_CACHE_SIZE=uint32(10))
+    b.clean_block_record(12)
+    for block in blocks[:13] + fork_1[:3] + fork_2[:3]:
+        assert b.try_block_record(block.header_hash) is None
+    for block in blocks[13:] + fork_1[3:] + fork_2[3:]:
+        assert b.try_block_record(block.header_hash) is not None
+
+    # a fork block added back below the cleaned height is dropped again
+    block_record = await b.get_block_record_from_db(fork_2[2].header_hash)
+    assert block_record is not None
+    b.add_block_record(block_record)
+    assert b.block_record(fork_2[2].header_hash).height == 12
+    b.clean_block_record(12)
+    assert b.try_block_record(fork_2[2].header_hash) is None
+
+
 def to_bytes(gen: Optional[SerializedProgram]) -> bytes:
     assert gen is not None
     return bytes(gen)
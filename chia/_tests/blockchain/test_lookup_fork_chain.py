@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Optional
 
 import pytest
 from chia_rs import BlockRecord
@@ -9,18 +10,28 @@ from chia_rs.sized_ints import uint32
 
 from chia._tests.util.benchmarks import rand_hash
 from chia.consensus.blockchain_interface import BlockRecordsProtocol
-from chia.consensus.find_fork_point import find_fork_point_in_chain, lookup_fork_chain
+from chia.consensus.find_fork_point import find_fork_point_in_chain, get_skip_height, lookup_fork_chain
 from chia.simulator.block_tools import test_constants
 
 
 class DummyChain:
     _chain: dict[bytes32, bytes32]
+    _height_to_hash: dict[uint32, bytes32]
 
     def __init__(self) -> None:
         self._chain = {}
+        self._height_to_hash = {}
 
-    def add_block(self, h: bytes32, prev: bytes32) -> None:
+    def add_block(self, h: bytes32, prev: bytes32, height: Optional[int] = None) -> None:
         self._chain[h] = prev
+        if height is not None:
+            self._height_to_hash[uint32(height)] = h
+
+    def contains_height(self, height: uint32) -> bool:
+        return height in self._height_to_hash
+
+    def height_to_hash(self, height: uint32) -> Optional[bytes32]:
+        return self._height_to_hash.get(height)
 
     async def prev_block_hash(self, header_hashes: list[bytes32]) -> list[bytes32]:
         ret: list[bytes32] = []
@@ -192,3 +203,87 @@ async def test_no_left_chain() -> None:
     )
     assert chain == {0: G, 1: D, 2: E, 3: F}
     assert fork_hash == test_constants.GENESIS_CHALLENGE
+
+
+# the same chain, but with A - B - C - D - G as the main chain
+main_chain = DummyChain()
+main_chain.add_block(G, test_constants.GENESIS_CHALLENGE, 0)
+main_chain.add_block(D, G, 1)
+main_chain.add_block(C, D, 2)
+main_chain.add_block(B, C, 3)
+main_chain.add_block(A, B, 4)
+main_chain.add_block(E, D)
+main_chain.add_block(F, E)
+
+test_main_chain: BlockRecordsProtocol = main_chain  # type: ignore[assignment]
+
+
+@pytest.mark.anyio
+async def test_main_chain_shortcut() -> None:
+    # when one of the blocks is on the main chain, the other chain is only
+    # walked until it joins the main chain. The result is the same
+    blocks = [(4, A, B), (3, B, C), (2, C, D), (1, D, G), (0, G, test_constants.GENESIS_CHALLENGE)]
+    blocks += [(2, E, D), (3, F, E)]
+    for height_1, hash_1, prev_1 in blocks:
+        for height_2, hash_2, prev_2 in blocks:
+            expected = await lookup_fork_chain(test_chain, (height_1, hash_1), (height_2, hash_2), test_constants)
+            actual = await lookup_fork_chain(test_main_chain, (height_1, hash_1), (height_2, hash_2), test_constants)
+            assert actual == expected
+
+            block_1 = BR(height_1, hash_1, prev_1)
+            block_2 = BR(height_2, hash_2, prev_2)
+            expected_height = await find_fork_point_in_chain(test_chain, block_1, block_2)
+            assert await find_fork_point_in_chain(test_main_chain, block_1, block_2) == expected_height
+
+    chain, fork_hash = await lookup_fork_chain(
+        test_main_chain, (-1, test_constants.GENESIS_CHALLENGE), (3, F), test_constants
+    )
+    assert chain == {0: G, 1: D, 2: E, 3: F}
+    assert fork_hash == test_constants.GENESIS_CHALLENGE
+
+    # the main chain blocks are looked up by height, not walked
+    sparse_chain = DummyChain()
+    sparse_chain._height_to_hash = main_chain._height_to_hash
+    sparse_chain.add_block(F, E)
+    sparse_chain.add_block(E, D)
+    test_sparse_chain: BlockRecordsProtocol = sparse_chain  # type: ignore[assignment]
+    chain, fork_hash = await lookup_fork_chain(test_sparse_chain, (4, A), (3, F), test_constants)
+    assert chain == {2: E, 3: F}
+    assert fork_hash == D
+    chain, fork_hash = await lookup_fork_chain(test_sparse_chain, (3, F), (4, A), test_constants)
+    assert chain == {2: C, 3: B, 4: A}
+    assert fork_hash == D
+    assert await find_fork_point_in_chain(test_sparse_chain, BR(4, A, B), BR(3, F, E)) == 1
+    assert await find_fork_point_in_chain(test_sparse_chain, BR(3, F, E), BR(4, A, B)) == 1
+
+    # a chain that never joins the main chain
+    other_chain = DummyChain()
+    other_chain.add_block(A, B, 1)
+    other_chain.add_block(B, test_constants.GENESIS_CHALLENGE, 0)
+    other_chain.add_block(E, D)
+    other_chain.add_block(D, test_constants.GENESIS_CHALLENGE)
+    test_other_chain: BlockRecordsProtocol = other_chain  # type: ignore[assignment]
+    chain, fork_hash = await lookup_fork_chain(test_other_chain, (1, A), (1, E), test_constants)
+    assert chain == {0: D, 1: E}
+    assert fork_hash == test_constants.GENESIS_CHALLENGE
+    chain, fork_hash = await lookup_fork_chain(test_other_chain, (1, E), (1, A), test_constants)
+    assert chain == {0: B, 1: A}
+    assert fork_hash == test_constants.GENESIS_CHALLENGE
+    assert await find_fork_point_in_chain(test_other_chain, BR(1, A, B), BR(1, E, D)) == -1
+
+
+def test_get_skip_height() -> None:
+    assert [get_skip_height(h) for h in range(10)] == [0, 0, 0, 1, 0, 1, 4, 1, 0, 1]
+    for height in range(1, 10000):
+        assert 0 <= get_skip_height(height) < height
+
+    # following the skip links (and previous-block links where they would
+    # overshoot) reaches any ancestor in a logarithmic number of steps
+    for height, target in [(9999, 0), (9999, 1), (9999, 5000), (65536, 12345), (123456, 7)]:
+        steps = 0
+        while height > target:
+            skip = get_skip_height(height)
+            height = skip if skip >= target else height - 1
+            steps += 1
+        assert height == target
+        assert steps < 110
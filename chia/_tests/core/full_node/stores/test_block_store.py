@@ -8,6 +8,7 @@ from pathlib import Path
 from typing import Optional, cast
 
 import pytest
+import zstd
 
 # TODO: update after resolution in https://github.com/pytest-dev/pytest/issues/7469
 from _pytest.fixtures import SubRequest
@@ -29,7 +30,7 @@ from chia.simulator.block_tools import BlockTools
 from chia.simulator.wallet_tools import WalletTool
 from chia.types.blockchain_format.serialized_program import SerializedProgram
 from chia.types.blockchain_format.vdf import VDFProof
-from chia.util.db_wrapper import get_host_parameter_limit
+from chia.util.db_wrapper import execute_fetchone, get_host_parameter_limit
 from chia.util.task_referencer import create_referenced_task
 
 log = logging.getLogger(__name__)
@@ -271,10 +272,11 @@ async def test_rollback(bt: BlockTools, tmp_dir: Path, use_cache: bool, default_
             await _validate_and_add_block(bc, b1)
             await _validate_and_add_block(bc, b2, expected_result=AddBlockResult.ADDED_AS_ORPHAN, fork_info=fork_info)
             count += 1
-            ret = await block_store.get_random_not_compactified(count)
+            # only the main chain blocks are returned
+            ret = await block_store.get_not_compactified(0, 2 * count)
             assert len(ret) == count
             # make sure all block heights are unique
-            assert len(set(ret)) == count
+            assert len({height for _, height in ret}) == count
 
         async with db_wrapper.reader_no_transaction() as conn:
             for block in blocks:
@@ -356,6 +358,33 @@ async def test_count_uncompactified_blocks(bt: BlockTools, tmp_dir: Path, db_ver
         assert count == 10
 
 
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_get_not_compactified(bt: BlockTools, tmp_dir: Path, db_version: int, use_cache: bool) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+
+    async with DBConnection(db_version) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper, use_cache=use_cache)
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2)
+
+        assert await block_store.get_not_compactified(0, 10) == []
+
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("UPDATE full_blocks SET is_fully_compactified=1 WHERE height=5")
+
+        rows = await block_store.get_not_compactified(0, 4)
+        assert [height for _, height in rows] == [0, 1, 2, 3]
+        rows = await block_store.get_not_compactified(rows[-1][0], 4)
+        assert [height for _, height in rows] == [4, 6, 7, 8]
+        rows = await block_store.get_not_compactified(rows[-1][0], 4)
+        assert [height for _, height in rows] == [9]
+        assert await block_store.get_not_compactified(rows[-1][0], 4) == []
+
+
 @pytest.mark.limit_consensus_modes(reason="save time")
 @pytest.mark.anyio
 async def test_replace_proof(bt: BlockTools, tmp_dir: Path, db_version: int, use_cache: bool) -> None:
@@ -402,6 +431,19 @@ async def test_replace_proof(bt: BlockTools, tmp_dir: Path, db_version: int, use
             assert b is not None
             assert b.challenge_chain_ip_proof == proof
 
+        # replace all of them in one go
+        replaced = [rand_vdf_proof() for _ in blocks]
+        async with db_wrapper.writer():
+            await block_store.replace_proofs(
+                [block.replace(challenge_chain_ip_proof=proof) for block, proof in zip(blocks, replaced)]
+            )
+
+        for block, proof in zip(blocks, replaced):
+            block_store.rollback_cache_block(block.header_hash)
+            b = await block_store.get_full_block(block.header_hash)
+            assert b is not None
+            assert b.challenge_chain_ip_proof == proof
+
 
 @pytest.mark.limit_consensus_modes(reason="save time")
 @pytest.mark.anyio
@@ -446,6 +488,29 @@ async def test_get_generator(bt: BlockTools, db_version: int, use_cache: bool) -
         assert await store.get_generator(blocks[6].header_hash) == maybe_serialize(new_blocks[6].transactions_generator)
         assert await store.get_generator(blocks[7].header_hash) == maybe_serialize(new_blocks[7].transactions_generator)
 
+        # the generators are stored compressed
+        gen_block = next(b for b in new_blocks if b.transactions_generator is not None)
+        async with db_wrapper.reader_no_transaction() as conn:
+            row = await execute_fetchone(
+                conn, "SELECT generator FROM block_generators WHERE header_hash=?", (gen_block.header_hash,)
+            )
+        assert row is not None
+        assert zstd.decompress(row[0]) == maybe_serialize(gen_block.transactions_generator)
+        uncached_store = await BlockStore.create(db_wrapper, use_cache=False)
+        expected_generators = {b.height: maybe_serialize(b.transactions_generator) for b in new_blocks[1:10]}
+        assert await uncached_store.get_generators_at({uint32(x) for x in range(1, 10)}) == expected_generators
+
+        # blocks stored before the block_generators table existed are parsed
+        # out of full_blocks instead
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("DELETE FROM block_generators")
+        uncached_store = await BlockStore.create(db_wrapper, use_cache=False)
+        expected_generators = {b.height: maybe_serialize(b.transactions_generator) for b in new_blocks[1:10]}
+        assert await uncached_store.get_generators_at({uint32(x) for x in range(1, 10)}) == expected_generators
+        assert await uncached_store.get_generator(blocks[3].header_hash) == maybe_serialize(
+            new_blocks[3].transactions_generator
+        )
+
 
 @pytest.mark.limit_consensus_modes(reason="save time")
 @pytest.mark.anyio
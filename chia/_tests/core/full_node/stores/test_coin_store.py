@@ -3,7 +3,7 @@ from __future__ import annotations
 import logging
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 import pytest
 from chia_rs import CoinState, FullBlock
@@ -21,7 +21,7 @@ from chia.consensus.blockchain import AddBlockResult, Blockchain
 from chia.consensus.coinbase import create_farmer_coin, create_pool_coin
 from chia.consensus.generator_tools import tx_removals_and_additions
 from chia.full_node.block_store import BlockStore
-from chia.full_node.coin_store import CoinStore
+from chia.full_node.coin_store import CoinStore, rows_to_coin_records, rows_to_coin_states
 from chia.full_node.hint_store import HintStore
 from chia.simulator.block_tools import BlockTools, test_constants
 from chia.simulator.wallet_tools import WalletTool
@@ -884,3 +884,21 @@ async def test_get_unspent_lineage_info_for_puzzle_hash(case: UnspentLineageInfo
             )
         else:
             assert result is None
+
+
+def test_row_decoders_match_streamable_construction() -> None:
+    parent = bytes32(b"\x01" * 32)
+    puzzle_hash = bytes32(b"\x02" * 32)
+    rows: list[Any] = [
+        (5, 0, 1, bytes(puzzle_hash), bytes(parent), uint64(1234).stream_to_bytes(), 1700000000),
+        (5, 9, 0, bytes(puzzle_hash), bytes(parent), uint64(2**64 - 1).stream_to_bytes(), 1700000000),
+    ]
+    records = rows_to_coin_records(rows)
+    expected = [
+        CoinRecord(Coin(parent, puzzle_hash, uint64(1234)), uint32(5), uint32(0), True, uint64(1700000000)),
+        CoinRecord(Coin(parent, puzzle_hash, uint64(2**64 - 1)), uint32(5), uint32(9), False, uint64(1700000000)),
+    ]
+    assert records == expected
+    assert [hash(record) for record in records] == [hash(record) for record in expected]
+    assert [bytes(record) for record in records] == [bytes(record) for record in expected]
+    assert rows_to_coin_states(rows) == [record.coin_state for record in expected]
@@ -16,6 +16,7 @@ from chia.simulator.wallet_tools import WalletTool
 from chia.types.blockchain_format.coin import Coin
 from chia.types.condition_opcodes import ConditionOpcode
 from chia.types.condition_with_args import ConditionWithArgs
+from chia.util.hash import std_hash
 
 log = logging.getLogger(__name__)
 
@@ -227,3 +228,18 @@ async def test_unsupported_version() -> None:
     with pytest.raises(RuntimeError, match="HintStore does not support database schema v1"):
         async with DBConnection(1) as db_wrapper:
             await HintStore.create(db_wrapper)
+
+
+@pytest.mark.anyio
+async def test_large_key_sets(db_version: int) -> None:
+    async with DBConnection(db_version) as db_wrapper:
+        hint_store = await HintStore.create(db_wrapper)
+        count = 2000
+        hints = [std_hash(i.to_bytes(4, byteorder="big")) for i in range(count)]
+        coin_ids = [std_hash(b"coin" + i.to_bytes(4, byteorder="big")) for i in range(count)]
+        await hint_store.add_hints(list(zip(coin_ids, hints)))
+
+        assert set(await hint_store.get_coin_ids_multi(set(hints))) == set(coin_ids)
+        assert set(await hint_store.get_coin_ids_multi(set(hints), max_items=10)) <= set(coin_ids)
+        assert len(await hint_store.get_coin_ids_multi(set(hints), max_items=10)) == 10
+        assert set(await hint_store.get_hints(coin_ids)) == set(hints)
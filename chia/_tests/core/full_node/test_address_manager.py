@@ -166,6 +166,47 @@ class TestPeerManager:
                 break
         assert len(ports) == 3
 
+    @pytest.mark.anyio
+    async def test_addrman_slot_index(self):
+        addrman = AddressManagerTest()
+        source = PeerInfo("252.2.2.2", 8444)
+        peers = [PeerInfo(f"250.{i}.{i}.1", 8444) for i in range(1, 40)]
+        for peer in peers:
+            assert await addrman.add_peer_info([peer], source)
+        for peer in peers[::3]:
+            await addrman.mark_good(peer)
+
+        def occupied(matrix):
+            return {
+                (bucket, pos) for bucket, row in enumerate(matrix) for pos, node_id in enumerate(row) if node_id != -1
+            }
+
+        assert set(addrman.used_new_matrix_positions.slots) == occupied(addrman.new_matrix)
+        assert set(addrman.used_tried_matrix_positions.slots) == occupied(addrman.tried_matrix)
+        for slots in (addrman.used_new_matrix_positions, addrman.used_tried_matrix_positions):
+            assert all(slots.index[slot] == i for i, slot in enumerate(slots.slots))
+
+        # a reloaded table rebuilds the same index
+        addrman2 = AddressManager.deserialize_bytes(io.BytesIO(addrman.serialize_bytes()))
+        assert set(addrman2.used_new_matrix_positions.slots) == occupied(addrman2.new_matrix)
+        assert set(addrman2.used_tried_matrix_positions.slots) == occupied(addrman2.tried_matrix)
+
+    @pytest.mark.anyio
+    async def test_serialization_reencodes_changed_entries(self):
+        addrman = AddressManagerTest()
+        now = int(math.floor(time.time()))
+        t_peer = TimestampedPeerInfo("250.7.1.1", uint16(8333), uint64(now - 10000))
+        await addrman.add_to_new_table([t_peer], PeerInfo("252.5.1.1", uint16(8333)))
+        first = addrman.serialize_bytes()
+        assert addrman.serialize_bytes() == first
+
+        # a timestamp update must invalidate the cached encoding of that entry
+        await addrman.connect(PeerInfo("250.7.1.1", uint16(8333)), now)
+        second = addrman.serialize_bytes()
+        assert second != first
+        addrman2 = AddressManager.deserialize_bytes(io.BytesIO(second))
+        assert [info.timestamp for info in addrman2.map_info.values()] == [now]
+
     @pytest.mark.anyio
     async def test_addrman_collisions_new(self):
         addrman = AddressManagerTest()
@@ -514,6 +514,69 @@ class TestBlockHeightMap:
                 for idx in range(0, 2000):
                     assert new_heights[idx * 32 : idx * 32 + 32] == gen_block_hash(idx)
 
+    @pytest.mark.anyio
+    async def test_cache_file_rollback_and_extend(self, tmp_dir: Path, db_version: int) -> None:
+        # Test a reorg that rewrites hashes that are already on disk (and
+        # memory mapped) and then extends past the end of the file
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            assert os.path.getsize(tmp_dir / "height-to-hash") == (2000 + 1) * 32
+
+            height_map.rollback(1500)
+            for height in range(1501, 2600):
+                height_map.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            assert height_map.get_hash(uint32(1500)) == gen_block_hash(1500)
+            assert height_map.get_hash(uint32(1501)) == gen_block_hash(1501 + 65536)
+            assert height_map.get_hash(uint32(2599)) == gen_block_hash(2599 + 65536)
+            await height_map.maybe_flush()
+
+            with open(tmp_dir / "height-to-hash", "rb") as f:
+                new_heights = f.read()
+            assert len(new_heights) == 2600 * 32
+            for height in range(2600):
+                expected = gen_block_hash(height if height <= 1500 else height + 65536)
+                assert new_heights[height * 32 : height * 32 + 32] == expected
+                assert height_map.get_hash(uint32(height)) == expected
+
+    @pytest.mark.anyio
+    async def test_cache_file_written_on_flush_only(self, tmp_dir: Path, db_version: int) -> None:
+        # hashes rewritten after a rollback must not reach the file before
+        # maybe_flush(), i.e. before the blocks are committed to the DB
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            with open(tmp_dir / "height-to-hash", "rb") as f:
+                original = f.read()
+
+            height_map.rollback(1500)
+            for height in range(1501, 1510):
+                height_map.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            assert height_map.get_hash(uint32(1505)) == gen_block_hash(1505 + 65536)
+            with open(tmp_dir / "height-to-hash", "rb") as f:
+                assert f.read() == original
+
+            # a rollback discards the pending updates
+            height_map.rollback(1504)
+            height_map.update_height(uint32(1505), gen_block_hash(1505), None)
+            assert height_map.get_hash(uint32(1505)) == gen_block_hash(1505)
+
+            for height in range(1506, 2500):
+                height_map.update_height(uint32(height), gen_block_hash(height + 65536), None)
+            await height_map.maybe_flush()
+            with open(tmp_dir / "height-to-hash", "rb") as f:
+                new_heights = f.read()
+            for height in range(2500):
+                expected = gen_block_hash(height if height <= 1500 or height == 1505 else height + 65536)
+                assert new_heights[height * 32 : height * 32 + 32] == expected
+                assert height_map.get_hash(uint32(height)) == expected
+
+            height_map.close()
+            with pytest.raises(AssertionError):
+                height_map.get_hash(uint32(10))
+
 
 @pytest.mark.anyio
 async def test_unsupported_version(tmp_dir: Path) -> None:
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from pathlib import Path
+
+import pytest
+from chia_rs import FullBlock
+from chia_rs.sized_ints import uint8
+
+from chia._tests.blockchain.blockchain_test_utils import _validate_and_add_block
+from chia._tests.util.db_connection import DBConnection
+from chia.consensus.blockchain import Blockchain
+from chia.full_node.block_store import BlockStore
+from chia.full_node.coin_store import CoinStore
+from chia.full_node.compaction import CompactionService
+from chia.simulator.block_tools import BlockTools
+from chia.types.blockchain_format.vdf import CompressibleVDFField, VDFProof
+
+log = logging.getLogger(__name__)
+
+
+def compact_proof(i: int) -> VDFProof:
+    return VDFProof(uint8(0), bytes([i]) * 100, True)
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_get_uncompact_heights(bt: BlockTools, tmp_dir: Path) -> None:
+    blocks = bt.get_consecutive_blocks(10)
+
+    async with DBConnection(2) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2)
+        compaction = CompactionService(block_store, db_wrapper, log)
+
+        assert await compaction.get_uncompact_heights(4) == []
+
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+
+        assert await compaction.get_uncompact_heights(4) == [0, 1, 2, 3]
+        assert await compaction.get_uncompact_heights(4) == [4, 5, 6, 7]
+        # we reach the end, and wrap around to the start
+        assert await compaction.get_uncompact_heights(4) == [8, 9, 0, 1]
+        assert await compaction.get_uncompact_heights(4) == [2, 3, 4, 5]
+        # never return the same height twice in one call
+        assert sorted(await compaction.get_uncompact_heights(20)) == list(range(10))
+
+
+@pytest.mark.limit_consensus_modes(reason="save time")
+@pytest.mark.anyio
+async def test_replace_proof_batches(bt: BlockTools, tmp_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    blocks = bt.get_consecutive_blocks(10, skip_slots=2)
+
+    async with DBConnection(2) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, bt.constants, tmp_dir, 2)
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+
+        compaction = CompactionService(block_store, db_wrapper, log, batch_size=100, min_write_interval=0)
+
+        written: list[list[FullBlock]] = []
+        replace_proofs = block_store.replace_proofs
+
+        async def record_replace_proofs(new_blocks: list[FullBlock]) -> None:
+            written.append(new_blocks)
+            await replace_proofs(new_blocks)
+
+        monkeypatch.setattr(block_store, "replace_proofs", record_replace_proofs)
+
+        # a proof for every block (two for the ones with end of slot VDFs), and one that doesn't match anything
+        requests = []
+        for i, block in enumerate(blocks):
+            for sub_slot in block.finished_sub_slots[:1]:
+                requests.append(
+                    compaction.replace_proof(
+                        block.header_hash,
+                        sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf,
+                        compact_proof(i),
+                        CompressibleVDFField.CC_EOS_VDF,
+                    )
+                )
+            requests.append(
+                compaction.replace_proof(
+                    block.header_hash,
+                    block.reward_chain_block.challenge_chain_ip_vdf,
+                    compact_proof(i),
+                    CompressibleVDFField.CC_IP_VDF,
+                )
+            )
+        assert len(requests) > len(blocks)
+        expected = [True] * len(requests) + [False]
+        requests.append(
+            compaction.replace_proof(
+                blocks[0].header_hash,
+                blocks[1].reward_chain_block.challenge_chain_ip_vdf,
+                compact_proof(0),
+                CompressibleVDFField.CC_IP_VDF,
+            )
+        )
+        results = await asyncio.gather(*requests)
+        assert results == expected
+
+        # all proofs were written in a single batch, with one update per block
+        assert len(written) == 1
+        assert len(written[0]) == len(blocks)
+
+        for i, block in enumerate(blocks):
+            block_store.rollback_cache_block(block.header_hash)
+            b = await block_store.get_full_block(block.header_hash)
+            assert b is not None
+            for sub_slot in b.finished_sub_slots[:1]:
+                assert sub_slot.proofs.challenge_chain_slot_proof == compact_proof(i)
+            assert b.challenge_chain_ip_proof == compact_proof(i)
+
+        # once the queue is drained, the next proof starts a new batch
+        assert await compaction.replace_proof(
+            blocks[0].header_hash,
+            blocks[0].reward_chain_block.challenge_chain_ip_vdf,
+            compact_proof(100),
+            CompressibleVDFField.CC_IP_VDF,
+        )
+        assert len(written) == 2
@@ -7,8 +7,14 @@ from chia_rs.sized_ints import uint32, uint64
 from chia._tests.util.get_name_puzzle_conditions import get_name_puzzle_conditions
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
 from chia.full_node.bundle_tools import simple_solution_generator
-from chia.full_node.subscriptions import PeerSubscriptions, peers_for_spend_bundle
+from chia.full_node.subscriptions import (
+    PeerSubscriptions,
+    SubscriptionSet,
+    coin_states_for_peers,
+    peers_for_spend_bundle,
+)
 from chia.types.blockchain_format.program import INFINITE_COST
+from chia.types.coin_record import CoinRecord
 
 IDENTITY_PUZZLE = Program.to(1)
 IDENTITY_PUZZLE_HASH = IDENTITY_PUZZLE.get_tree_hash()
@@ -445,6 +451,62 @@ def test_clear_subscriptions() -> None:
     assert subs.peer_subscription_count(peer1) == 0
 
 
+def test_subscription_set_many_peers() -> None:
+    subs = SubscriptionSet()
+    peers = [bytes32(i.to_bytes(32, "big")) for i in range(100)]
+
+    for peer in peers:
+        assert subs.add_subscription(peer, ph1)
+        assert not subs.add_subscription(peer, ph1)
+    assert subs.add_subscription(peers[-1], ph2)
+
+    assert subs.peers(ph1) == set(peers)
+    assert subs.peers(ph2) == {peers[-1]}
+    assert subs.peer_count() == 100
+    assert subs.total_count() == 2
+
+    # items come back as bytes32, even though they're stored as bytes
+    assert all(type(item) is bytes32 for item in subs.subscriptions(peers[-1]))
+    assert subs.subscriptions(peers[-1]) == {ph1, ph2}
+
+    for peer in peers[:50]:
+        subs.remove_peer(peer)
+    assert subs.peers(ph1) == set(peers[50:])
+    assert subs.peer_count() == 50
+
+    # peers that come back reuse the freed ids
+    assert subs.add_subscription(peers[0], ph2)
+    assert subs.peers(ph2) == {peers[0], peers[-1]}
+    assert subs.peer_count() == 51
+
+    for peer in peers:
+        subs.remove_subscription(peer, ph1)
+        subs.remove_subscription(peer, ph2)
+    assert subs.total_count() == 0
+    assert subs.peer_count() == 0
+    assert subs.peers(ph1) == set()
+
+
+def test_subscription_stats() -> None:
+    subs = PeerSubscriptions()
+
+    empty = subs.stats()
+    assert empty["puzzle_subscriptions"] == 0
+    assert empty["coin_subscriptions"] == 0
+
+    subs.add_puzzle_subscriptions(peer1, [ph1, ph2], 4)
+    subs.add_puzzle_subscriptions(peer2, [ph2, ph3], 4)
+    subs.add_coin_subscriptions(peer1, [coin1], 4)
+
+    stats = subs.stats()
+    assert stats["puzzle_subscriptions"] == 3
+    assert stats["puzzle_subscription_peers"] == 2
+    assert stats["coin_subscriptions"] == 1
+    assert stats["coin_subscription_peers"] == 1
+    assert stats["puzzle_subscription_memory"] > empty["puzzle_subscription_memory"]
+    assert stats["puzzle_subscription_memory"] > stats["coin_subscription_memory"]
+
+
 def test_peers_for_spent_coin() -> None:
     subs = PeerSubscriptions()
 
@@ -489,3 +551,35 @@ def test_peers_for_created_coin() -> None:
 
     peers = peers_for_spend_bundle(subs, npc_result.conds, set())
     assert peers == {peer1, peer2, peer3}
+
+
+def test_coin_states_for_peers() -> None:
+    subs = PeerSubscriptions()
+
+    new_coin = Coin(IDENTITY_COIN.name(), OTHER_PUZZLE_HASH, uint64(1000))
+    unrelated_coin = Coin(bytes32(b"4" * 32), bytes32(b"5" * 32), uint64(1000))
+
+    subs.add_puzzle_subscriptions(peer1, [IDENTITY_PUZZLE_HASH], 1)
+    subs.add_puzzle_subscriptions(peer2, [HINT_PUZZLE_HASH], 1)
+    subs.add_coin_subscriptions(peer3, [new_coin.name()], 1)
+    subs.add_coin_subscriptions(peer4, [OTHER_COIN.name(), IDENTITY_COIN.name()], 2)
+
+    spent = CoinRecord(IDENTITY_COIN, uint32(1), uint32(2), False, uint64(0))
+    created = CoinRecord(new_coin, uint32(2), uint32(0), False, uint64(0))
+    unrelated = CoinRecord(unrelated_coin, uint32(2), uint32(0), False, uint64(0))
+
+    changes = coin_states_for_peers(subs, [spent, created, unrelated], {new_coin.name(): HINT_PUZZLE_HASH})
+    assert changes == {
+        peer1: {spent.coin_state},
+        peer2: {created.coin_state},
+        peer3: {created.coin_state},
+        peer4: {spent.coin_state},
+    }
+
+    # looking up the peers must not change the subscriptions
+    assert subs.peers_for_coin_id(IDENTITY_COIN.name()) == {peer4}
+    assert subs.peers_for_coin_id(new_coin.name()) == {peer3}
+    assert subs.peers_for_puzzle_hash(IDENTITY_PUZZLE_HASH) == {peer1}
+
+    assert coin_states_for_peers(subs, [unrelated], {}) == {}
+    assert coin_states_for_peers(PeerSubscriptions(), [spent, created], {}) == {}
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import time
+from dataclasses import dataclass
 from logging import Logger
 from pathlib import Path
+from typing import Optional
 
 import pytest
+from chia_rs.sized_ints import uint16, uint64
 
 from chia.full_node.full_node_api import FullNodeAPI
-from chia.server.node_discovery import FullNodeDiscovery
+from chia.protocols.outbound_message import NodeType
+from chia.server.address_manager import ExtendedPeerInfo
+from chia.server.node_discovery import MAX_CONCURRENT_OUTBOUND_CONNECTIONS, MAX_DIALS_PER_ROUND, FullNodeDiscovery
 from chia.server.server import ChiaServer
+from chia.server.ws_connection import WSChiaConnection
 from chia.simulator.block_tools import BlockTools
+from chia.types.peer_info import PeerInfo, TimestampedPeerInfo
 from chia.util.default_root import SIMULATOR_ROOT_PATH
 
 
@@ -85,3 +94,128 @@ async def test_enable_private_networks(
     await discovery2.initialize_address_manager()
     assert discovery2.address_manager is not None
     assert discovery2.address_manager.allow_private_subnets is True
+
+
+def make_discovery(server: ChiaServer, target_outbound_count: int, tmp_path: Path) -> FullNodeDiscovery:
+    return FullNodeDiscovery(
+        server=server,
+        target_outbound_count=target_outbound_count,
+        peers_file_path=tmp_path / "peers.dat",
+        introducer_info=None,
+        dns_servers=[],
+        peer_connect_interval=0,
+        selected_network=server.config["selected_network"],
+        default_port=None,
+        log=Logger("node_discovery_tests"),
+    )
+
+
+@pytest.mark.anyio
+async def test_dials_per_round(
+    two_nodes: tuple[FullNodeAPI, FullNodeAPI, ChiaServer, ChiaServer, BlockTools], tmp_path: Path
+) -> None:
+    chia_server = two_nodes[2]
+    assert len(chia_server.get_connections(NodeType.FULL_NODE, outbound=True)) == 0
+
+    # bounded by the number of peers still needed, and the per-round cap
+    assert make_discovery(chia_server, 3, tmp_path)._num_dials_for_round() == 3
+    assert make_discovery(chia_server, 100, tmp_path)._num_dials_for_round() == MAX_DIALS_PER_ROUND
+
+    # dials in flight count towards the needed peers
+    discovery = make_discovery(chia_server, 3, tmp_path)
+    discovery.pending_outbound_connections = {"1.2.3.4", "1.2.3.5"}
+    assert discovery._num_dials_for_round() == 1
+
+    # and towards the concurrent dial cap
+    discovery = make_discovery(chia_server, 1000, tmp_path)
+    discovery.pending_outbound_connections = {f"10.0.{i // 256}.{i % 256}" for i in range(65)}
+    assert discovery._num_dials_for_round() == MAX_CONCURRENT_OUTBOUND_CONNECTIONS - 65
+
+    # at least one candidate is always selected
+    assert make_discovery(chia_server, 0, tmp_path)._num_dials_for_round() == 1
+
+
+@dataclass
+class FakeConnection:
+    peer_info: PeerInfo
+
+    def get_peer_info(self) -> PeerInfo:
+        return self.peer_info
+
+
+@pytest.mark.anyio
+async def test_feeler_peer_filtering(
+    two_nodes: tuple[FullNodeAPI, FullNodeAPI, ChiaServer, ChiaServer, BlockTools],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    chia_server = two_nodes[2]
+    discovery = make_discovery(chia_server, 0, tmp_path)
+    await discovery.initialize_address_manager()
+    assert discovery.address_manager is not None
+
+    def peer(host: str, last_try: int = 0) -> ExtendedPeerInfo:
+        info = ExtendedPeerInfo(TimestampedPeerInfo(host, uint16(8444), uint64(0)), None)
+        info.last_try = last_try
+        return info
+
+    local_peerinfo = PeerInfo("1.0.0.1", 8444)
+    connected = PeerInfo("1.0.0.2", 8444)
+    monkeypatch.setattr(chia_server, "get_connections", lambda *args, **kwargs: [FakeConnection(connected)])
+    discovery.pending_outbound_connections.add("1.0.0.3")
+    selected: list[ExtendedPeerInfo] = [
+        peer("1.0.0.1"),
+        peer("1.0.0.2"),
+        peer("1.0.0.3"),
+        peer("1.0.0.4", last_try=int(time.time())),
+        peer("1.0.0.5"),
+    ]
+
+    async def select_peer(new_only: bool = False) -> Optional[ExtendedPeerInfo]:
+        assert new_only
+        return selected.pop(0) if len(selected) > 0 else None
+
+    monkeypatch.setattr(discovery.address_manager, "select_peer", select_peer)
+
+    # ourselves, connected peers, pending dials and recently tried peers are skipped
+    assert await discovery._select_feeler_peer(local_peerinfo) == PeerInfo("1.0.0.5", 8444)
+    assert await discovery._select_feeler_peer(local_peerinfo) is None
+
+    # a tried table collision takes precedence, at most once a minute
+    async def select_tried_collision() -> Optional[ExtendedPeerInfo]:
+        return peer("1.0.0.6")
+
+    monkeypatch.setattr(discovery.address_manager, "select_tried_collision", select_tried_collision)
+    selected.append(peer("1.0.0.7"))
+    assert await discovery._select_feeler_peer(local_peerinfo) == PeerInfo("1.0.0.6", 8444)
+    assert await discovery._select_feeler_peer(local_peerinfo) == PeerInfo("1.0.0.7", 8444)
+
+
+@pytest.mark.anyio
+async def test_handshake_timeout(
+    two_nodes: tuple[FullNodeAPI, FullNodeAPI, ChiaServer, ChiaServer, BlockTools],
+    self_hostname: str,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _, _, server_1, server_2, _ = two_nodes
+    handshake_started = asyncio.Event()
+
+    async def stalled_handshake(self: WSChiaConnection, *args: object) -> None:
+        handshake_started.set()
+        await asyncio.sleep(1000)
+
+    monkeypatch.setattr(WSChiaConnection, "perform_handshake", stalled_handshake)
+    monkeypatch.setitem(server_1.config, "peer_connect_timeout", 1)
+    discovery = make_discovery(server_1, 1, tmp_path)
+    await discovery.initialize_address_manager()
+    assert discovery.address_manager is not None
+
+    target = PeerInfo(self_hostname, server_2.get_port())
+    await discovery.start_client_async(target, False)
+
+    # the stalled handshake times out, without banning the peer or leaving a connection behind
+    assert handshake_started.is_set()
+    assert discovery.pending_outbound_connections == set()
+    assert len(server_1.get_connections()) == 0
+    assert target.host not in server_1.banned_peers
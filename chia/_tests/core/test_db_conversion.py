@@ -29,7 +29,7 @@ def rand_bytes(num) -> bytes:
 @pytest.mark.anyio
 @pytest.mark.parametrize("with_hints", [True, False])
 @pytest.mark.skip("we no longer support DB v1")
-async def test_blocks(default_1000_blocks, with_hints: bool):
+async def test_blocks(default_1000_blocks, with_hints: bool, tmp_path: Path):
     blocks = default_1000_blocks
 
     hints: list[tuple[bytes32, bytes]] = []
@@ -67,7 +67,7 @@ async def test_blocks(default_1000_blocks, with_hints: bool):
                 for h in hints:
                     await hint_store1.add_hints([(h[0], h[1])])
 
-            bc = await Blockchain.create(coin_store1, block_store1, test_constants, Path("."), reserved_cores=0)
+            bc = await Blockchain.create(coin_store1, block_store1, test_constants, tmp_path, reserved_cores=0)
             sub_slot_iters = test_constants.SUB_SLOT_ITERS_STARTING
             for block in blocks:
                 if block.height != 0 and len(block.finished_sub_slots) > 0:
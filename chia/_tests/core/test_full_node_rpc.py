@@ -600,6 +600,68 @@ async def test_get_version(
         }
 
 
+@pytest.mark.anyio
+async def test_get_subscription_stats(
+    one_wallet_and_one_simulator_services: SimulatorsAndWalletsServices, self_hostname: str
+) -> None:
+    nodes, _, _bt = one_wallet_and_one_simulator_services
+    (full_node_service_1,) = nodes
+    assert full_node_service_1.rpc_server is not None
+    subscriptions = full_node_service_1._node.subscriptions
+    async with FullNodeRpcClient.create_as_context(
+        self_hostname,
+        full_node_service_1.rpc_server.listen_port,
+        full_node_service_1.root_path,
+        full_node_service_1.config,
+    ) as client:
+        stats = await client.get_subscription_stats()
+        assert stats["puzzle_subscriptions"] == 0
+        assert stats["coin_subscriptions"] == 0
+
+        peer = bytes32(b"1" * 32)
+        subscriptions.add_puzzle_subscriptions(peer, [bytes32(b"2" * 32), bytes32(b"3" * 32)], 10)
+        subscriptions.add_coin_subscriptions(peer, [bytes32(b"4" * 32)], 10)
+        try:
+            stats = await client.get_subscription_stats()
+            assert stats["puzzle_subscriptions"] == 2
+            assert stats["puzzle_subscription_peers"] == 1
+            assert stats["coin_subscriptions"] == 1
+            assert stats["coin_subscription_peers"] == 1
+            assert stats["coin_subscription_memory"] > 0
+            assert stats["puzzle_subscription_memory"] > stats["coin_subscription_memory"]
+        finally:
+            subscriptions.remove_peer(peer)
+
+
+@pytest.mark.anyio
+async def test_get_db_reader_stats(
+    one_wallet_and_one_simulator_services: SimulatorsAndWalletsServices, self_hostname: str
+) -> None:
+    nodes, _, _bt = one_wallet_and_one_simulator_services
+    (full_node_service_1,) = nodes
+    assert full_node_service_1.rpc_server is not None
+    async with FullNodeRpcClient.create_as_context(
+        self_hostname,
+        full_node_service_1.rpc_server.listen_port,
+        full_node_service_1.root_path,
+        full_node_service_1.config,
+    ) as client:
+        await client.get_db_reader_stats(reset=True)
+        await client.get_coin_records_by_puzzle_hash(bytes32(b"2" * 32))
+
+        stats = await client.get_db_reader_stats(reset=True)
+        assert stats["reader_count"] > 0
+        assert stats["max_reader_count"] >= stats["reader_count"]
+        assert stats["max_long_reader_count"] >= stats["long_reader_count"]
+        call_site = stats["call_sites"]["CoinStore.get_coin_records_by_puzzle_hash"]
+        assert call_site["execution"]["count"] == 1
+        assert call_site["queue_wait"]["count"] == 1
+
+        # the statistics were reset by the previous call
+        stats = await client.get_db_reader_stats()
+        assert "CoinStore.get_coin_records_by_puzzle_hash" not in stats["call_sites"]
+
+
 @pytest.mark.anyio
 async def test_get_blockchain_state(
     one_wallet_and_one_simulator_services: SimulatorsAndWalletsServices, self_hostname: str
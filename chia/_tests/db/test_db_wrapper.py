@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import sqlite3
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, Callable, Optional
 
@@ -13,7 +14,15 @@ from _pytest.fixtures import SubRequest
 
 from chia._tests.util.db_connection import DBConnection, PathDBConnection
 from chia._tests.util.misc import Marks, boolean_datacases, datacases
-from chia.util.db_wrapper import DBWrapper2, ForeignKeyError, InternalError, NestedForeignKeyDelayedRequestError
+from chia.util.db_wrapper import (
+    SQLITE_MAX_VARIABLE_NUMBER,
+    DBWrapper2,
+    ForeignKeyError,
+    InternalError,
+    NestedForeignKeyDelayedRequestError,
+    execute_key_set_query,
+    generate_in_memory_db_uri,
+)
 from chia.util.task_referencer import create_referenced_task
 
 if TYPE_CHECKING:
@@ -154,6 +163,38 @@ async def test_writers_nests() -> None:
     assert value == 1
 
 
+@pytest.mark.anyio
+async def test_write_generation() -> None:
+    async with DBConnection(2) as db_wrapper:
+        await setup_table(db_wrapper)
+        generation = db_wrapper.write_generation
+
+        async with db_wrapper.reader() as conn:
+            async with conn.execute("SELECT value FROM counter") as cursor:
+                await get_value(cursor)
+        assert db_wrapper.write_generation == generation
+
+        # nested transactions only count once, when the top level transaction ends
+        async with db_wrapper.writer() as conn:
+            await conn.execute("UPDATE counter SET value = 1")
+            async with db_wrapper.writer_maybe_transaction() as conn:
+                await conn.execute("UPDATE counter SET value = 2")
+            async with db_wrapper.writer() as conn:
+                await conn.execute("UPDATE counter SET value = 3")
+            assert db_wrapper.write_generation == generation
+        assert db_wrapper.write_generation == generation + 1
+
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("UPDATE counter SET value = 4")
+        assert db_wrapper.write_generation == generation + 2
+
+        with pytest.raises(UniqueError):
+            async with db_wrapper.writer() as conn:
+                await conn.execute("UPDATE counter SET value = 5")
+                raise UniqueError()
+        assert db_wrapper.write_generation == generation + 3
+
+
 @pytest.mark.anyio
 async def test_writer_journal_mode_wal() -> None:
     async with PathDBConnection(2) as db_wrapper:
@@ -564,3 +605,166 @@ async def test_delayed_foreign_key_request_fails_when_nested(initial: bool) -> N
             with pytest.raises(NestedForeignKeyDelayedRequestError):
                 async with db_wrapper.writer(foreign_key_enforcement_enabled=True):
                     pass  # pragma: no cover
+
+
+@pytest.mark.anyio
+async def test_long_query_lane_does_not_block_short_reads() -> None:
+    async with DBWrapper2.managed(
+        database=generate_in_memory_db_uri(), uri=True, reader_count=1, long_reader_count=1, db_version=2
+    ) as db_wrapper:
+        await setup_table(db_wrapper)
+
+        long_acquired = asyncio.Event()
+        release_long = asyncio.Event()
+
+        async def long_read() -> None:
+            async with db_wrapper.reader_no_transaction(call_site="long", long_query=True) as connection:
+                long_acquired.set()
+                await query_value(connection)
+                await release_long.wait()
+
+        long_task = create_referenced_task(long_read())
+        await long_acquired.wait()
+
+        # the only regular reader is still free while the long lane is busy
+        async with db_wrapper.reader_no_transaction(call_site="short") as connection:
+            assert await query_value(connection) == 0
+
+        release_long.set()
+        await long_task
+
+        stats = db_wrapper.reader_stats()
+        assert stats["reader_count"] == 1
+        assert stats["long_reader_count"] == 1
+        assert stats["call_sites"]["long"]["execution"]["count"] == 1
+        assert stats["call_sites"]["short"]["queue_wait"]["count"] == 1
+
+
+@pytest.mark.anyio
+async def test_reader_pool_grows_up_to_max() -> None:
+    async with DBWrapper2.managed(
+        database=generate_in_memory_db_uri(), uri=True, reader_count=1, max_reader_count=3, db_version=2
+    ) as db_wrapper:
+        await setup_table(db_wrapper)
+
+        all_acquired = asyncio.Event()
+        release = asyncio.Event()
+        acquired = 0
+
+        async def hold_reader() -> None:
+            nonlocal acquired
+            async with db_wrapper.reader_no_transaction() as connection:
+                await query_value(connection)
+                acquired += 1
+                if acquired == 3:
+                    all_acquired.set()
+                await release.wait()
+
+        tasks = [create_referenced_task(hold_reader()) for _ in range(5)]
+        await asyncio.wait_for(all_acquired.wait(), timeout=10)
+        assert db_wrapper.reader_stats()["reader_count"] == 3
+        release.set()
+        await asyncio.gather(*tasks)
+
+        stats = db_wrapper.reader_stats()
+        assert stats["reader_count"] == 3
+        assert stats["idle_readers"] == 3
+        assert stats["call_sites"]["unspecified"]["execution"]["count"] == 5
+
+
+@pytest.mark.anyio
+async def test_long_query_lane_grows_up_to_max() -> None:
+    async with DBWrapper2.managed(
+        database=generate_in_memory_db_uri(),
+        uri=True,
+        reader_count=1,
+        long_reader_count=1,
+        max_long_reader_count=3,
+        db_version=2,
+    ) as db_wrapper:
+        await setup_table(db_wrapper)
+
+        all_acquired = asyncio.Event()
+        release = asyncio.Event()
+        acquired = 0
+
+        async def hold_long_reader() -> None:
+            nonlocal acquired
+            async with db_wrapper.reader_no_transaction(long_query=True) as connection:
+                await query_value(connection)
+                acquired += 1
+                if acquired == 3:
+                    all_acquired.set()
+                await release.wait()
+
+        tasks = [create_referenced_task(hold_long_reader()) for _ in range(5)]
+        await asyncio.wait_for(all_acquired.wait(), timeout=10)
+        # the regular pool is left alone
+        stats = db_wrapper.reader_stats()
+        assert stats["long_reader_count"] == 3
+        assert stats["reader_count"] == 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+        stats = db_wrapper.reader_stats()
+        assert stats["long_reader_count"] == 3
+        assert stats["idle_long_readers"] == 3
+        assert stats["call_sites"]["unspecified"]["execution"]["count"] == 5
+
+
+@pytest.mark.anyio
+async def test_slow_reads_are_counted(caplog: pytest.LogCaptureFixture) -> None:
+    async with DBWrapper2.managed(
+        database=generate_in_memory_db_uri(), uri=True, reader_count=1, slow_query_threshold=0, db_version=2
+    ) as db_wrapper:
+        await setup_table(db_wrapper)
+
+        async with db_wrapper.reader(call_site="slow") as connection:
+            await query_value(connection)
+
+        assert db_wrapper.reader_stats()["call_sites"]["slow"]["slow_queries"] == 1
+        assert "slow database read from slow" in caplog.text
+
+        db_wrapper.reset_reader_stats()
+        assert db_wrapper.reader_stats()["call_sites"] == {}
+
+
+@pytest.mark.anyio
+async def test_key_set_query_binds_large_sets() -> None:
+    async with DBConnection(2) as db_wrapper:
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("CREATE TABLE numbers(value INTEGER NOT NULL, name BLOB NOT NULL)")
+            await conn.executemany(
+                "INSERT INTO numbers(value, name) VALUES(?, ?)",
+                [(value, value.to_bytes(4 if value % 3 == 0 else 32, "big")) for value in range(70000)],
+            )
+
+        # more keys than host parameters, looked up on a query_only reader
+        keys = list(range(0, 70000, 2))
+        assert len(keys) > SQLITE_MAX_VARIABLE_NUMBER
+        async with db_wrapper.reader_no_transaction() as conn:
+            rows = await execute_key_set_query(
+                conn, "SELECT value FROM numbers WHERE value IN ({in_list}) AND value < ?", keys, (1000,)
+            )
+            assert sorted(row[0] for row in rows) == list(range(0, 1000, 2))
+
+            # byte string keys of different sizes
+            names = [value.to_bytes(4 if value % 3 == 0 else 32, "big") for value in keys]
+            rows = await execute_key_set_query(conn, "SELECT value FROM numbers WHERE name IN ({in_list})", names)
+            assert sorted(row[0] for row in rows) == keys
+
+            rows = await execute_key_set_query(
+                conn, "SELECT value FROM numbers WHERE name IN ({in_list}) LIMIT ?", names, limit=150
+            )
+            assert len(rows) == 150
+            assert {row[0] for row in rows} <= set(keys)
+
+            assert await execute_key_set_query(conn, "SELECT value FROM numbers WHERE value IN ({in_list})", []) == []
+
+
+@pytest.mark.anyio
+async def test_readers_are_query_only() -> None:
+    async with DBConnection(2) as db_wrapper:
+        async with db_wrapper.reader_no_transaction() as conn:
+            with pytest.raises(sqlite3.OperationalError, match="readonly database"):
+                await conn.execute("CREATE TEMP TABLE keys(key BLOB PRIMARY KEY)")
@@ -8,11 +8,12 @@ from pathlib import Path
 
 import pytest
 
-from chia._tests.util.full_sync import run_sync_test
+from chia._tests.util.full_sync import run_sync_benchmark, run_sync_test
 
 
+@pytest.mark.parametrize("multiprocess_validation", [True, False])
 @pytest.mark.parametrize("keep_up", [True, False])
-def test_full_sync_test(keep_up: bool) -> None:
+def test_full_sync_test(keep_up: bool, multiprocess_validation: bool, tmp_path: Path) -> None:
     file_path = os.path.realpath(__file__)
     db_file = Path(file_path).parent / "test-blockchain-db.sqlite"
     asyncio.run(
@@ -26,5 +27,37 @@ def test_full_sync_test(keep_up: bool) -> None:
             db_sync="off",
             node_profiler=False,
             start_at_checkpoint=None,
+            multiprocess_validation=multiprocess_validation,
+            log_file=tmp_path / "test-full-sync.log",
         )
     )
+
+
+@pytest.mark.parametrize("multiprocess_validation", [True, False])
+def test_full_sync_benchmark(multiprocess_validation: bool) -> None:
+    file_path = os.path.realpath(__file__)
+    db_file = Path(file_path).parent / "test-blockchain-db.sqlite"
+    report = asyncio.run(
+        run_sync_benchmark(
+            db_file,
+            db_version=2,
+            single_thread=False,
+            test_constants=False,
+            db_sync="off",
+            start_at_checkpoint=None,
+            multiprocess_validation=multiprocess_validation,
+        )
+    )
+    assert report["start_height"] == 0
+    assert report["blocks"] == report["end_height"] + 1
+    assert report["blocks_per_second"] > 0
+    assert report["peak_rss"] > 0
+    assert report["stages"].keys() == {
+        "fetch",
+        "pre_validate",
+        "add_block",
+        "coin_store",
+        "hint_store",
+        "height_map_flush",
+    }
+    assert report["stages"]["add_block"]["calls"] == report["blocks"]
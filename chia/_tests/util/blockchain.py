@@ -3,6 +3,7 @@ from __future__ import annotations
 import contextlib
 import os
 import pickle
+import tempfile
 from collections.abc import AsyncIterator
 from pathlib import Path
 from typing import Optional
@@ -26,12 +27,15 @@ async def create_blockchain(
     async with DBWrapper2.managed(database=db_uri, uri=True, reader_count=1, db_version=db_version) as wrapper:
         coin_store = await CoinStore.create(wrapper)
         store = await BlockStore.create(wrapper)
-        bc1 = await Blockchain.create(coin_store, store, constants, Path("."), 2, single_threaded=True, log_coins=True)
-        try:
-            assert bc1.get_peak() is None
-            yield bc1, wrapper
-        finally:
-            bc1.shut_down()
+        with tempfile.TemporaryDirectory() as blockchain_dir:
+            bc1 = await Blockchain.create(
+                coin_store, store, constants, Path(blockchain_dir), 2, single_threaded=True, log_coins=True
+            )
+            try:
+                assert bc1.get_peak() is None
+                yield bc1, wrapper
+            finally:
+                bc1.shut_down()
 
 
 def persistent_blocks(
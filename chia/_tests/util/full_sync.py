@@ -1,20 +1,26 @@
 from __future__ import annotations
 
 import cProfile
+import functools
+import inspect
 import logging
 import shutil
+import sys
 import tempfile
+import threading
 import time
 from collections.abc import Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Callable, Optional, cast
+from typing import Any, Callable, Optional, cast
 
 import aiosqlite
+import psutil
 import zstd
-from chia_rs import FullBlock
+from chia_rs import BlockRecord, ConsensusConstants, FullBlock, SubEpochSummary
 from chia_rs.sized_bytes import bytes32
-from chia_rs.sized_ints import uint16
+from chia_rs.sized_ints import uint16, uint32
 
 from chia._tests.util.constants import test_constants as TEST_CONSTANTS
 from chia.cmds.init_funcs import chia_init
@@ -23,7 +29,9 @@ from chia.consensus.block_body_validation import ForkInfo
 from chia.consensus.constants import replace_str_to_bytes
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
+from chia.full_node.block_height_map import BlockHeightMap
 from chia.full_node.full_node import FullNode
+from chia.protocols.full_node_protocol import RequestBlocks, RespondBlocks
 from chia.protocols.outbound_message import Message, NodeType
 from chia.server.server import ChiaServer
 from chia.server.ws_connection import ConnectionCallback, WSChiaConnection
@@ -31,6 +39,7 @@ from chia.simulator.block_tools import make_unfinished_block
 from chia.types.peer_info import PeerInfo
 from chia.types.validation_state import ValidationState
 from chia.util.config import load_config
+from chia.util.hash import std_hash
 
 
 class ExitOnError(logging.Handler):
@@ -109,6 +118,18 @@ class FakePeer:
         return None
 
 
+def init_node_root(root_path: Path, db_version: int, test_constants: bool) -> tuple[dict[str, Any], ConsensusConstants]:
+    chia_init(root_path, should_check_keys=False, v1_db=(db_version == 1))
+    config = load_config(root_path, "config.yaml")
+
+    if test_constants:
+        constants = TEST_CONSTANTS
+    else:
+        overrides = config["network_overrides"]["constants"][config["selected_network"]]
+        constants = replace_str_to_bytes(DEFAULT_CONSTANTS, **overrides)
+    return config, constants
+
+
 async def run_sync_test(
     file: Path,
     db_version: int,
@@ -119,10 +140,12 @@ async def run_sync_test(
     db_sync: str,
     node_profiler: bool,
     start_at_checkpoint: Optional[str],
+    multiprocess_validation: bool = False,
+    log_file: Path = Path("test-full-sync.log"),
 ) -> None:
     logger = logging.getLogger()
     logger.setLevel(logging.WARNING)
-    handler = logging.FileHandler("test-full-sync.log")
+    handler = logging.FileHandler(log_file)
     handler.setFormatter(
         logging.Formatter(
             "%(levelname)-8s %(message)s",
@@ -138,16 +161,10 @@ async def run_sync_test(
         if start_at_checkpoint is not None:
             shutil.copytree(start_at_checkpoint, root_path)
 
-        chia_init(root_path, should_check_keys=False, v1_db=(db_version == 1))
-        config = load_config(root_path, "config.yaml")
-
-        if test_constants:
-            constants = TEST_CONSTANTS
-        else:
-            overrides = config["network_overrides"]["constants"][config["selected_network"]]
-            constants = replace_str_to_bytes(DEFAULT_CONSTANTS, **overrides)
+        config, constants = init_node_root(root_path, db_version, test_constants)
         if single_thread:
             config["full_node"]["single_threaded"] = True
+        config["full_node"]["multiprocess_validation"] = multiprocess_validation
         config["full_node"]["db_sync"] = db_sync
         config["full_node"]["enable_profiler"] = node_profiler
         full_node = await FullNode.create(
@@ -254,3 +271,258 @@ async def run_sync_test(
                 logger.warning(f"end-height: {height}")
             if node_profiler:
                 (root_path / "profile-node").rename("./profile-node")
+
+
+class StageTimer:
+    """
+    Accumulates the time spent in each stage of the sync pipeline, by wrapping
+    the functions implementing the stages. The stages run concurrently, and
+    some are nested in others (e.g. the coin store updates are part of
+    add_block), so the stage times don't add up to the duration of the sync.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._restore: list[Callable[[], None]] = []
+
+    def record(self, stage: str, elapsed: float) -> None:
+        # this is also called from the validation worker threads
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + elapsed
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def instrument(self, obj: object, name: str, stage: str) -> None:
+        """
+        Replaces the method name on obj (an instance or a class) with one that
+        records its time under stage, until restore() is called
+        """
+        original = getattr(obj, name)
+        wrapper: Callable[..., Any]
+        if inspect.iscoroutinefunction(original):
+
+            @functools.wraps(original)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.measure(stage):
+                    return await original(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(original)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.measure(stage):
+                    return original(*args, **kwargs)
+
+        self._replace(obj, name, wrapper)
+
+    def instrument_pool(self, pool: Executor, stage: str) -> None:
+        """
+        Records the time of the jobs submitted to pool under stage. Jobs run in
+        threads are timed while they run. Jobs run in other processes are timed
+        from when they're submitted until they complete, since the job itself
+        has to be pickled.
+        """
+        submit = pool.submit
+
+        def timed_submit(fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future[Any]:
+            if isinstance(pool, ProcessPoolExecutor):
+                start = time.perf_counter()
+                future = submit(fn, *args, **kwargs)
+                future.add_done_callback(lambda _: self.record(stage, time.perf_counter() - start))
+                return future
+
+            def timed_fn() -> Any:
+                with self.measure(stage):
+                    return fn(*args, **kwargs)
+
+            return submit(timed_fn)
+
+        self._replace(pool, "submit", timed_submit)
+
+    def _replace(self, obj: object, name: str, value: Any) -> None:
+        if name in vars(obj):
+            original = vars(obj)[name]
+            self._restore.append(lambda: setattr(obj, name, original))
+        else:
+            self._restore.append(lambda: delattr(obj, name))
+        setattr(obj, name, value)
+
+    def restore(self) -> None:
+        while len(self._restore) > 0:
+            self._restore.pop()()
+
+
+class ReplayPeer(FakePeer):
+    """
+    A local stand-in for a full node peer, responding to request_blocks with
+    the main chain blocks from an existing blockchain database (in v2 format)
+    """
+
+    peer_node_id: bytes32
+
+    def __init__(self, db: aiosqlite.Connection, index: int, timer: StageTimer) -> None:
+        super().__init__()
+        self.db = db
+        self.timer = timer
+        self.peer_node_id = std_hash(index.to_bytes(4, "big"))
+        self.peer_info = PeerInfo("127.0.0.1", uint16(8444 + index))
+        self.closed = False
+
+    async def call_api(self, request_method: Callable[..., Any], message: Any, timeout: int = 60) -> Any:
+        assert isinstance(message, RequestBlocks)
+        with self.timer.measure("fetch"):
+            rows = await self.db.execute_fetchall(
+                "SELECT block FROM full_blocks WHERE in_main_chain=1 AND height>=? AND height<=? ORDER BY height",
+                (message.start_height, message.end_height),
+            )
+            blocks = [FullBlock.from_bytes(zstd.decompress(r[0])) for r in rows]
+        return RespondBlocks(message.start_height, message.end_height, blocks)
+
+    async def close(self, ban_time: int = 0) -> None:
+        self.closed = True
+
+
+class ReplayServer(FakeServer):
+    def __init__(self, peers: list[ReplayPeer]) -> None:
+        self.all_connections = {peer.peer_node_id: peer for peer in peers}
+
+
+def peak_rss() -> tuple[int, int]:
+    """
+    Returns the peak resident set size, in bytes, of this process and of the
+    largest of its (terminated) child processes
+    """
+    if sys.platform == "win32":
+        return psutil.Process().memory_info().peak_wset, 0
+
+    import resource
+
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+async def run_sync_benchmark(
+    file: Path,
+    db_version: int,
+    single_thread: bool,
+    test_constants: bool,
+    db_sync: str,
+    start_at_checkpoint: Optional[str],
+    multiprocess_validation: bool = False,
+    num_peers: int = 4,
+) -> dict[str, Any]:
+    """
+    Replays the main chain of the blockchain database file through the full
+    node's sync pipeline (sync_from_fork_point()), with num_peers local peers
+    serving the blocks. Returns a report of the sync, with the time spent in
+    each stage of the pipeline, suitable for serializing as JSON.
+    """
+    logger = logging.getLogger()
+    logger.setLevel(logging.WARNING)
+    check_log = ExitOnError()
+    logger.addHandler(check_log)
+
+    timer = StageTimer()
+    with tempfile.TemporaryDirectory() as root_dir:
+        root_path = Path(root_dir, "root")
+        if start_at_checkpoint is not None:
+            shutil.copytree(start_at_checkpoint, root_path)
+
+        config, constants = init_node_root(root_path, db_version, test_constants)
+        config["full_node"]["single_threaded"] = single_thread
+        config["full_node"]["multiprocess_validation"] = multiprocess_validation
+        config["full_node"]["db_sync"] = db_sync
+        full_node = await FullNode.create(
+            config["full_node"],
+            root_path=root_path,
+            consensus_constants=constants,
+        )
+
+        async with aiosqlite.connect(file) as in_db:
+            await in_db.execute("pragma query_only")
+            rows = list(
+                await in_db.execute_fetchall(
+                    "SELECT header_hash, height, block_record FROM full_blocks "
+                    "WHERE in_main_chain=1 ORDER BY height DESC LIMIT 1"
+                )
+            )
+            if len(rows) == 0:
+                raise ValueError(f"no blocks in {file}")
+            target_hash = bytes32(rows[0][0])
+            target_height = uint32(rows[0][1])
+            target_record = BlockRecord.from_bytes(rows[0][2])
+            summaries = [
+                SubEpochSummary.from_bytes(r[0])
+                for r in await in_db.execute_fetchall(
+                    "SELECT sub_epoch_summary FROM full_blocks "
+                    "WHERE in_main_chain=1 AND sub_epoch_summary IS NOT NULL ORDER BY height"
+                )
+            ]
+
+            peers = [ReplayPeer(in_db, i, timer) for i in range(num_peers)]
+            full_node.set_server(cast(ChiaServer, ReplayServer(peers)))
+            async with full_node.manage():
+                peak = full_node.blockchain.get_peak()
+                # syncing starts at the peak, but skips the blocks we already have
+                start_height = 0 if peak is None else int(peak.height)
+                num_blocks = int(target_height) - (-1 if peak is None else int(peak.height))
+                for peer in peers:
+                    full_node.sync_store.peer_has_block(
+                        target_hash, peer.peer_node_id, target_record.weight, target_height, True
+                    )
+
+                blockchain = full_node.blockchain
+                timer.instrument_pool(blockchain.pool, "pre_validate")
+                if blockchain.validation_pool is not blockchain.pool:
+                    timer.instrument_pool(blockchain.validation_pool, "pre_validate")
+                timer.instrument(blockchain, "add_block", "add_block")
+                timer.instrument(blockchain.coin_store, "new_block", "coin_store")
+                timer.instrument(full_node.hint_store, "add_hints", "hint_store")
+                timer.instrument(BlockHeightMap, "maybe_flush", "height_map_flush")
+                try:
+                    start_time = time.monotonic()
+                    await full_node.sync_from_fork_point(uint32(start_height), target_height, target_hash, summaries)
+                    duration = time.monotonic() - start_time
+                finally:
+                    timer.restore()
+
+                peak = full_node.blockchain.get_peak()
+                if peak is None or peak.header_hash != target_hash:
+                    raise RuntimeError("failed to sync to the peak of the blockchain database")
+                if check_log.exit_with_failure:
+                    raise RuntimeError("error printed to log")
+
+    rss, rss_workers = peak_rss()
+    return {
+        "file": str(file),
+        "options": {
+            "db_version": db_version,
+            "single_thread": single_thread,
+            "multiprocess_validation": multiprocess_validation,
+            "db_sync": db_sync,
+            "peers": num_peers,
+        },
+        "start_height": start_height,
+        "end_height": int(target_height),
+        "blocks": num_blocks,
+        "duration": duration,
+        "blocks_per_second": num_blocks / duration,
+        "peak_rss": rss,
+        "peak_rss_workers": rss_workers,
+        "stages": {
+            stage: {"seconds": seconds, "calls": timer.calls[stage]} for stage, seconds in sorted(timer.seconds.items())
+        },
+    }
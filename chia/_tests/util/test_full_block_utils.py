@@ -29,6 +29,7 @@ from chia_rs.sized_ints import uint8, uint32, uint64, uint128
 from chia._tests.util.benchmarks import rand_bytes, rand_g1, rand_g2, rand_hash, rand_vdf, rand_vdf_proof, rewards
 from chia.consensus.generator_tools import get_block_header
 from chia.full_node.full_block_utils import (
+    FullBlockView,
     block_info_from_block,
     generator_from_block,
     get_height_and_tx_status_from_block,
@@ -274,6 +275,22 @@ async def test_parser():
         assert block.transactions_generator == bi.transactions_generator
         assert block.prev_header_hash == bi.prev_header_hash
         assert block.transactions_generator_ref_list == bi.transactions_generator_ref_list
+
+        view = FullBlockView(block_bytes)
+        assert view.header_hash == block.header_hash
+        assert view.prev_header_hash == block.prev_header_hash
+        assert view.height == block.height
+        assert view.weight == block.weight
+        assert view.total_iters == block.total_iters
+        assert view.is_transaction_block() == block.is_transaction_block()
+        assert view.foliage_transaction_block == block.foliage_transaction_block
+        assert view.transactions_info == block.transactions_info
+        assert view.transactions_generator == block.transactions_generator
+        assert view.transactions_generator_ref_list == block.transactions_generator_ref_list
+        # the fields can be accessed in any order
+        view = FullBlockView(block_bytes)
+        assert view.transactions_generator_ref_list == block.transactions_generator_ref_list
+        assert view.reward_chain_block == block.reward_chain_block
         # this doubles the run-time of this test, with questionable utility
         # assert gen == FullBlock.from_bytes(block_bytes).transactions_generator
 
@@ -12,6 +12,7 @@ from chia.consensus.default_constants import DEFAULT_CONSTANTS
 from chia.types.blockchain_format.coin import Coin
 from chia.util.hash import std_hash
 from chia.wallet.coin_selection import (
+    branch_and_bound_coin_algorithm,
     check_for_exact_match,
     knapsack_coin_algorithm,
     select_coins,
@@ -67,6 +68,63 @@ class TestCoinSelection:
             selected_sum = sum(coin.amount for coin in list(knapsack))
             assert 265 <= selected_sum <= 281  # Selects a set of coins which does exceed by too much
 
+    def test_branch_and_bound_coin_selection(self, a_hash: bytes32) -> None:
+        amounts = [90, 60, 50, 50, 50, 40, 7, 3]
+        coin_list = [Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(a)) for i, a in enumerate(amounts)]
+        deadline = time.monotonic() + 10
+
+        # the largest coins are tried first
+        result = branch_and_bound_coin_algorithm(coin_list, uint128(100), 500, deadline)
+        assert result == {coin_list[0], coin_list[6], coin_list[7]}
+        result = branch_and_bound_coin_algorithm(coin_list, uint128(200), 500, deadline)
+        assert result is not None and sum(coin.amount for coin in result) == 200
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(350), 500, deadline) == set(coin_list)
+        # there's no combination adding up to these
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(2), 500, deadline) is None
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(351), 500, deadline) is None
+        # or not with few enough coins
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(150), 2, deadline) == {coin_list[0], coin_list[1]}
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(160), 2, deadline) is None
+        result = branch_and_bound_coin_algorithm(coin_list, uint128(160), 3, deadline)
+        assert result is not None and sum(coin.amount for coin in result) == 160
+
+    def test_branch_and_bound_deadline(self, a_hash: bytes32) -> None:
+        # all amounts are even, so this would take a very long time to rule out an odd target
+        coin_list = [Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(2 * (100000 - i))) for i in range(100000)]
+        start = time.monotonic()
+        assert branch_and_bound_coin_algorithm(coin_list, uint128(1000001), 500, start + 0.2) is None
+        assert time.monotonic() - start < 5
+
+    @pytest.mark.anyio
+    async def test_coin_selection_time_budget(self, a_hash: bytes32) -> None:
+        coin_list: list[WalletCoinRecord] = [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(2 * (20000 - i))),
+                uint32(1),
+                uint32(1),
+                False,
+                True,
+                WalletType(0),
+                1,
+            )
+            for i in range(20000)
+        ]
+        spendable_amount = uint128(sum(record.coin.amount for record in coin_list))
+        start = time.monotonic()
+        result = await select_coins(
+            spendable_amount,
+            DEFAULT_COIN_SELECTION_CONFIG,
+            coin_list,
+            {},
+            logging.getLogger("test"),
+            uint128(1000001),
+            time_budget=0.5,
+        )
+        # there's no exact match, and a full knapsack search would take much longer than the budget
+        assert sum(coin.amount for coin in result) >= 1000001
+        assert len(result) <= 500
+        assert time.monotonic() - start < 10
+
     @pytest.mark.anyio
     async def test_coin_selection_randomly(self, a_hash: bytes32) -> None:
         coin_base_amounts = [3, 6, 20, 40, 80, 150, 160, 203, 202, 201, 320]
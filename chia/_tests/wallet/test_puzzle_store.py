@@ -130,3 +130,106 @@ async def test_delete_wallet(seeded_random: random.Random) -> None:
         assert await db.get_last_derivation_path() is None
         assert db.last_derivation_index is None
         assert len(db.last_wallet_derivation_index) == 0
+
+
+@pytest.mark.anyio
+async def test_wallet_identifier_index(seeded_random: random.Random) -> None:
+    dummy_records = DummyDerivationRecords(seeded_random=seeded_random)
+    dummy_records.generate(1, 10)
+    dummy_records.generate(2, 10)
+    # a puzzle hash that belongs to both wallets
+    shared = dummy_records.records_per_wallet[1][0]
+    dummy_records.records_per_wallet[2].append(
+        DerivationRecord(uint32(10), shared.puzzle_hash, shared.pubkey, WalletType.STANDARD_WALLET, uint32(2), False)
+    )
+    unknown = bytes32.random(seeded_random)
+    async with DBConnection(1) as wrapper:
+        db = await WalletPuzzleStore.create(wrapper)
+        for records in dummy_records.records_per_wallet.values():
+            await db.add_derivation_paths(records)
+
+        # the index is rebuilt from the database when the store is created
+        reloaded = await WalletPuzzleStore.create(wrapper)
+        assert reloaded.wallet_identifiers == db.wallet_identifiers
+        assert len(db.wallet_identifiers) == 20
+
+        for store in (db, reloaded):
+            assert await store.puzzle_hash_exists(shared.puzzle_hash)
+            assert not await store.puzzle_hash_exists(unknown)
+            assert await store.get_wallet_identifier_for_puzzle_hash(unknown) is None
+            assert await store.record_for_puzzle_hash(unknown) is None
+            assert await store.get_derivation_record_for_puzzle_hash(unknown) is None
+            assert await store.index_for_puzzle_hash(unknown) is None
+            assert await store.get_all_puzzle_hashes() == set(db.wallet_identifiers)
+
+        await db.delete_wallet(uint32(1))
+        # the shared puzzle hash now belongs to the remaining wallet
+        assert await db.get_wallet_identifier_for_puzzle_hash(shared.puzzle_hash) == WalletIdentifier(
+            uint32(2), WalletType.STANDARD_WALLET
+        )
+        assert await db.get_all_puzzle_hashes() == {
+            record.puzzle_hash for record in dummy_records.records_per_wallet[2]
+        }
+        for record in dummy_records.records_per_wallet[1][1:]:
+            assert not await db.puzzle_hash_exists(record.puzzle_hash)
+
+
+@pytest.mark.anyio
+async def test_wallet_identifier_rollback(seeded_random: random.Random) -> None:
+    dummy_records = DummyDerivationRecords(seeded_random=seeded_random)
+    dummy_records.generate(1, 10)
+    dummy_records.generate(2, 10)
+    async with DBConnection(1) as wrapper:
+        db = await WalletPuzzleStore.create(wrapper)
+        await db.add_derivation_paths(dummy_records.records_per_wallet[1])
+
+        # puzzle hashes added in a transaction that's rolled back are dropped
+        # from the index again
+        with pytest.raises(RuntimeError, match="rollback"):
+            async with wrapper.writer():
+                await db.add_derivation_paths(dummy_records.records_per_wallet[2])
+                assert len(db.wallet_identifiers) == 20
+                raise RuntimeError("rollback")
+        await db.rollback_wallet_identifiers()
+
+        assert len(db.wallet_identifiers) == 10
+        for record in dummy_records.records_per_wallet[1]:
+            assert await db.puzzle_hash_exists(record.puzzle_hash)
+        for record in dummy_records.records_per_wallet[2]:
+            assert not await db.puzzle_hash_exists(record.puzzle_hash)
+        reloaded = await WalletPuzzleStore.create(wrapper)
+        assert reloaded.wallet_identifiers == db.wallet_identifiers
+
+
+@pytest.mark.anyio
+async def test_wallet_identifier_rollback_delete_wallet(seeded_random: random.Random) -> None:
+    dummy_records = DummyDerivationRecords(seeded_random=seeded_random)
+    dummy_records.generate(1, 10)
+    dummy_records.generate(2, 10)
+    dummy_records.generate(3, 10)
+    async with DBConnection(1) as wrapper:
+        db = await WalletPuzzleStore.create(wrapper)
+        await db.add_derivation_paths(dummy_records.records_per_wallet[1])
+        await db.add_derivation_paths(dummy_records.records_per_wallet[2])
+
+        # a wallet deleted in a transaction that's rolled back is restored in
+        # the index, and the puzzle hashes added after it are dropped
+        with pytest.raises(RuntimeError, match="rollback"):
+            async with wrapper.writer():
+                await db.delete_wallet(uint32(2))
+                await db.add_derivation_paths(dummy_records.records_per_wallet[3])
+                assert len(db.wallet_identifiers) == 20
+                raise RuntimeError("rollback")
+        await db.rollback_wallet_identifiers()
+
+        assert len(db.wallet_identifiers) == 20
+        for wallet_id in (1, 2):
+            for record in dummy_records.records_per_wallet[wallet_id]:
+                assert await db.puzzle_hash_exists(record.puzzle_hash)
+                assert await db.get_wallet_identifier_for_puzzle_hash(record.puzzle_hash) == WalletIdentifier(
+                    uint32(wallet_id), record.wallet_type
+                )
+        for record in dummy_records.records_per_wallet[3]:
+            assert not await db.puzzle_hash_exists(record.puzzle_hash)
+        reloaded = await WalletPuzzleStore.create(wrapper)
+        assert reloaded.wallet_identifiers == db.wallet_identifiers
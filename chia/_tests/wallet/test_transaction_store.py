@@ -319,6 +319,59 @@ async def test_transaction_count_for_wallet(seeded_random: random.Random) -> Non
         )
 
 
+@pytest.mark.anyio
+async def test_transaction_count_cache(seeded_random: random.Random) -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletTransactionStore.create(db_wrapper)
+        outgoing = TransactionTypeFilter.include([TransactionType.OUTGOING_TX])
+
+        await store.add_transaction_record(tr1)
+        assert await store.get_transaction_count_for_wallet(1) == 1
+        assert await store.get_transaction_count_for_wallet(1, type_filter=outgoing) == 1
+        assert len(store.count_cache.cache) == 2
+
+        # any write invalidates the cached counts
+        await store.add_transaction_record(dataclasses.replace(tr1, name=bytes32.random(seeded_random)))
+        assert await store.get_transaction_count_for_wallet(1) == 2
+        assert await store.get_transaction_count_for_wallet(1, type_filter=outgoing) == 2
+
+        # a writer sees its own changes, but they're not cached until they're committed
+        async with db_wrapper.writer():
+            await store.delete_transaction_record(tr1.name)
+            assert await store.get_transaction_count_for_wallet(1) == 1
+            assert await store.get_transaction_count_for_wallet(1, type_filter=outgoing) == 1
+        assert await store.get_transaction_count_for_wallet(1) == 1
+        assert await store.get_transaction_count_for_wallet(1, type_filter=outgoing) == 1
+
+
+@pytest.mark.anyio
+async def test_transaction_listing_uses_covering_indexes() -> None:
+    async with DBConnection(1) as db_wrapper:
+        await WalletTransactionStore.create(db_wrapper)
+        async with db_wrapper.reader() as conn:
+            for index, order in [
+                ("tx_wallet_confirmed_at_height", "ORDER BY confirmed_at_height DESC, rowid"),
+                (
+                    "tx_wallet_relevance",
+                    "ORDER BY confirmed ASC, confirmed_at_height DESC, created_at_time DESC, rowid",
+                ),
+            ]:
+                plan = list(
+                    await conn.execute_fetchall(
+                        f"EXPLAIN QUERY PLAN SELECT rowid FROM transaction_record INDEXED BY {index}"
+                        f" WHERE wallet_id=1 AND type IN (1,2) AND confirmed=1 {order} LIMIT 0, 50"
+                    )
+                )
+                assert f"USING COVERING INDEX {index}" in plan[0][3]
+            plan = list(
+                await conn.execute_fetchall(
+                    "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM transaction_record INDEXED BY tx_wallet_type"
+                    " WHERE wallet_id=1 AND type NOT IN (1,2) AND confirmed=0"
+                )
+            )
+            assert "USING COVERING INDEX tx_wallet_type" in plan[0][3]
+
+
 @pytest.mark.anyio
 async def test_all_transactions_for_wallet(seeded_random: random.Random) -> None:
     async with DBConnection(1) as db_wrapper:
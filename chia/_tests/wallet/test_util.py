@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import multiprocessing
 from typing import Any
 
 import pytest
+from chia_rs import AugSchemeMPL
 from chia_rs.sized_bytes import bytes32, bytes48
-from chia_rs.sized_ints import uint64
+from chia_rs.sized_ints import uint32, uint64
 
 from chia._tests.util.misc import CoinGenerator, coin_creation_args
 from chia.consensus.default_constants import DEFAULT_CONSTANTS
@@ -12,9 +14,12 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.program import Program
 from chia.types.coin_spend import make_spend
 from chia.util.errors import ValidationError
+from chia.wallet.derive_keys import master_pk_to_wallet_pk_unhardened, master_pk_to_wallet_pk_unhardened_intermediate
 from chia.wallet.lineage_proof import LineageProof, LineageProofField
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
 from chia.wallet.util.compute_hints import HintedCoin, compute_spend_hints_and_additions
 from chia.wallet.util.merkle_utils import list_to_binary_tree
+from chia.wallet.util.puzzle_hash_derivation import derive_unhardened_keys
 from chia.wallet.util.tx_config import (
     DEFAULT_COIN_SELECTION_CONFIG,
     DEFAULT_TX_CONFIG,
@@ -183,3 +188,25 @@ def test_lineage_proof_errors() -> None:
 def test_wallet_type_to_json() -> None:
     for w in WalletType:
         assert w.to_json_dict() == w.name
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("num_workers,min_pool_size", [(0, 0), (2, 100), (3, 0)])
+async def test_derive_unhardened_keys(num_workers: int, min_pool_size: int) -> None:
+    master_pk = AugSchemeMPL.key_gen(bytes([1] * 32)).get_g1()
+    intermediate_pk = master_pk_to_wallet_pk_unhardened_intermediate(master_pk)
+
+    keys = await derive_unhardened_keys(
+        intermediate_pk,
+        10,
+        30,
+        num_workers=num_workers,
+        min_pool_size=min_pool_size,
+        multiprocessing_context=multiprocessing.get_context("spawn"),
+    )
+    assert len(keys) == 20
+    for index, (pk, puzzle_hash) in enumerate(keys, start=10):
+        assert pk == master_pk_to_wallet_pk_unhardened(master_pk, uint32(index))
+        assert puzzle_hash == puzzle_hash_for_pk(pk)
+
+    assert await derive_unhardened_keys(intermediate_pk, 10, 10, num_workers=2, min_pool_size=0) == []
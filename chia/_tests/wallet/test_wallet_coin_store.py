@@ -265,6 +265,49 @@ async def test_get_unspent_coins_for_wallet() -> None:
         assert await store.get_unspent_coins_for_wallet(1, coin_type=CoinType.CLAWBACK) == {record_8}
 
 
+@pytest.mark.anyio
+async def test_get_unspent_coins_for_wallet_by_amount() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletCoinStore.create(db_wrapper)
+        records = [
+            WalletCoinRecord(
+                Coin(bytes32([i] * 32), bytes32([i] * 32), uint64(amount)),
+                uint32(1),
+                uint32(0),
+                False,
+                False,
+                WalletType.STANDARD_WALLET,
+                1,
+            )
+            for i, amount in enumerate([5, 100, 1, 50])
+        ]
+        for record in records:
+            await store.add_coin_record(record)
+        by_amount = [records[1], records[3], records[0], records[2]]
+
+        assert await store.get_unspent_coins_for_wallet_by_amount(1) == by_amount
+        assert await store.get_unspent_coins_for_wallet(1) == set(by_amount)
+        generation = db_wrapper.write_generation
+        assert store.unspent_by_amount[(1, CoinType.NORMAL)] == (generation, by_amount)
+
+        # a writer sees its own changes, and those don't end up in the index until they're committed
+        async with db_wrapper.writer():
+            await store.set_spent(records[1].name(), uint32(2))
+            assert await store.get_unspent_coins_for_wallet_by_amount(1) == by_amount[1:]
+            assert store.unspent_by_amount[(1, CoinType.NORMAL)] == (generation, by_amount)
+        assert await store.get_unspent_coins_for_wallet_by_amount(1) == by_amount[1:]
+
+        # nor do changes that are rolled back
+        with pytest.raises(RuntimeError):
+            async with db_wrapper.writer():
+                await store.set_spent(records[3].name(), uint32(3))
+                raise RuntimeError()
+        assert await store.get_unspent_coins_for_wallet_by_amount(1) == by_amount[1:]
+
+        await store.rollback_to_block(1)
+        assert await store.get_unspent_coins_for_wallet_by_amount(1) == by_amount
+
+
 @pytest.mark.anyio
 async def test_get_all_unspent_coins() -> None:
     async with DBConnection(1) as db_wrapper:
@@ -492,7 +492,10 @@ async def test_unique_puzzle_hash_subscriptions(simulator_and_wallet: OldSimulat
 @pytest.mark.anyio
 @pytest.mark.standard_block_tools
 async def test_get_balance(
-    simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str, default_400_blocks: list[FullBlock]
+    simulator_and_wallet: OldSimulatorsAndWallets,
+    self_hostname: str,
+    default_400_blocks: list[FullBlock],
+    monkeypatch: pytest.MonkeyPatch,
 ) -> None:
     [full_node_api], [(wallet_node, wallet_server)], _bt = simulator_and_wallet
     full_node_server = full_node_api.full_node.server
@@ -564,6 +567,24 @@ async def test_get_balance(
     # Restart one more time and make sure the balance is still correct after start
     await restart_with_fingerprint(initial_fingerprint)
     assert await wallet_node.get_balance(wallet_id) == expected_more_balance
+    # As long as nothing is written to the wallet DB, the cached balance is returned without recomputing it
+    update_balance_cache = wallet_node._update_balance_cache
+    updates: list[uint32] = []
+
+    async def record_update_balance_cache(wallet_id: uint32) -> None:
+        updates.append(wallet_id)
+        await update_balance_cache(wallet_id)
+
+    with monkeypatch.context() as m:
+        m.setattr(wallet_node, "_update_balance_cache", record_update_balance_cache)
+        assert await wallet_node.get_balance(wallet_id) == expected_more_balance
+        assert await wallet_node.get_balance(wallet_id) == expected_more_balance
+        assert updates == []
+        async with wallet_node.wallet_state_manager.db_wrapper.writer():
+            pass
+        assert await wallet_node.get_balance(wallet_id) == expected_more_balance
+        assert await wallet_node.get_balance(wallet_id) == expected_more_balance
+        assert updates == [wallet_id]
 
 
 @pytest.mark.anyio
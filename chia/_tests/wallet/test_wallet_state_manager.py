@@ -22,6 +22,7 @@ from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.derive_keys import master_sk_to_wallet_sk, master_sk_to_wallet_sk_unhardened
 from chia.wallet.transaction_record import TransactionRecord
 from chia.wallet.util.transaction_type import TransactionType
+from chia.wallet.util.tx_config import DEFAULT_TX_CONFIG
 from chia.wallet.util.wallet_types import WalletType
 from chia.wallet.wallet_spend_bundle import WalletSpendBundle
 from chia.wallet.wallet_state_manager import WalletStateManager
@@ -106,6 +107,54 @@ async def test_determine_coin_type(simulator_and_wallet: OldSimulatorsAndWallets
     )
 
 
+@pytest.mark.anyio
+async def test_prefetch_for_coin_states(simulator_and_wallet: OldSimulatorsAndWallets, self_hostname: str) -> None:
+    [full_node_api], [(wallet_node, wallet_server)], _ = simulator_and_wallet
+    await wallet_server.start_client(PeerInfo(self_hostname, full_node_api.full_node.server.get_port()), None)
+    wallet_state_manager: WalletStateManager = wallet_node.wallet_state_manager
+    wallet = wallet_state_manager.main_wallet
+    peer = wallet_node.server.get_connections(NodeType.FULL_NODE)[0]
+    await full_node_api.farm_blocks_to_wallet(2, wallet)
+
+    # send a coin to someone else, so its parent is one of our (spent) coins
+    async with wallet_state_manager.new_action_scope(DEFAULT_TX_CONFIG, push=True) as action_scope:
+        await wallet.generate_signed_transaction([uint64(1000)], [bytes32([2] * 32)], action_scope)
+    await full_node_api.process_transaction_records(action_scope.side_effects.transactions)
+    await full_node_api.wait_for_wallet_synced(wallet_node)
+    [their_coin] = [
+        coin
+        for tx in action_scope.side_effects.transactions
+        for coin in tx.additions
+        if coin.puzzle_hash == bytes32([2] * 32)
+    ]
+    [their_state, our_state] = await wallet_node.get_coin_state([their_coin.name(), their_coin.parent_coin_info], peer)
+    if their_state.coin != their_coin:
+        their_state, our_state = our_state, their_state
+    coin_names = [their_coin.name(), our_state.coin.name()]
+
+    prefetched = await wallet_state_manager.prefetch_for_coin_states(
+        coin_names, [their_state, our_state], {}, peer, None
+    )
+    # the parent of the coin we don't know, and the children of our spent coin
+    assert list(prefetched.parents) == [our_state.coin.name()]
+    parent_state, parent_spend = prefetched.parents[our_state.coin.name()]
+    assert parent_state == our_state
+    assert parent_spend.coin == our_state.coin
+    assert their_state in prefetched.children[our_state.coin.name()]
+    assert await wallet_state_manager.determine_coin_type(
+        peer, their_state, None, prefetched.parents[our_state.coin.name()]
+    ) == await wallet_state_manager.determine_coin_type(peer, their_state, None)
+
+    # nothing is requested for coins we already have in this state
+    our_record = await wallet_state_manager.coin_store.get_coin_record(our_state.coin.name())
+    assert our_record is not None
+    prefetched = await wallet_state_manager.prefetch_for_coin_states(
+        coin_names[1:], [our_state], {our_state.coin.name(): our_record}, peer, None
+    )
+    assert prefetched.parents == {}
+    assert prefetched.children == {}
+
+
 @pytest.mark.parametrize(
     "wallet_environments",
     [{"num_environments": 1, "blocks_needed": [1], "trusted": True, "reuse_puzhash": True}],
@@ -1,15 +1,24 @@
 from __future__ import annotations
 
+import asyncio
 from collections.abc import Collection
-from typing import Optional
+from typing import Any, Optional, cast
 
 import pytest
 from chia_rs import Coin, CoinState
 from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint32, uint64
 
+from chia.protocols.wallet_protocol import PuzzleSolutionResponse, RequestPuzzleSolution, RespondPuzzleSolution
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.serialized_program import SerializedProgram
 from chia.wallet.util.peer_request_cache import PeerRequestCache
-from chia.wallet.util.wallet_sync_utils import sort_coin_states
+from chia.wallet.util.wallet_sync_utils import (
+    PeerRequestException,
+    fetch_coin_spend,
+    process_in_order,
+    sort_coin_states,
+)
 
 coin_states = [
     CoinState(Coin(bytes32(b"\00" * 32), bytes32(b"\00" * 32), uint64(1)), None, None),
@@ -154,3 +163,105 @@ def test_rollback_race_cache() -> None:
     cache.rollback_race_cache(fork_height=-1)
     expected_race_cache.clear()
     assert_race_cache(cache, expected_race_cache)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("max_in_flight", [1, 3, 100])
+async def test_process_in_order(max_in_flight: int) -> None:
+    started: list[int] = []
+    running = 0
+    max_running = 0
+
+    async def request(i: int) -> int:
+        nonlocal running, max_running
+        started.append(i)
+        running += 1
+        max_running = max(max_running, running)
+        # later requests finish first
+        await asyncio.sleep(0.001 * (10 - i))
+        running -= 1
+        return i
+
+    processed: list[int] = []
+
+    async def process(i: int) -> bool:
+        processed.append(i)
+        return True
+
+    assert await process_in_order((request(i) for i in range(10)), process, max_in_flight)
+    assert processed == list(range(10))
+    assert started == list(range(10))
+    assert max_running == min(max_in_flight, 10)
+
+
+@pytest.mark.anyio
+async def test_process_in_order_abort() -> None:
+    started: list[int] = []
+    finished: list[int] = []
+
+    async def request(i: int) -> int:
+        started.append(i)
+        await asyncio.sleep(0.01)
+        finished.append(i)
+        return i
+
+    async def process(i: int) -> bool:
+        return i < 2
+
+    assert not await process_in_order((request(i) for i in range(10)), process, 3)
+    # we stop at the first failure, and cancel the requests that were still in flight
+    assert started[:3] == [0, 1, 2]
+    assert len(started) <= 5
+    assert finished == [0, 1, 2]
+
+
+@pytest.mark.anyio
+async def test_fetch_coin_spend_cache() -> None:
+    puzzle = SerializedProgram.to(1)
+    solution = SerializedProgram.to([])
+    coin = Coin(bytes32(b"\00" * 32), puzzle.get_tree_hash(), uint64(1))
+    requests: list[RequestPuzzleSolution] = []
+    fail = True
+
+    class FakePeer:
+        async def call_api(
+            self, request_method: Any, message: RequestPuzzleSolution
+        ) -> Optional[RespondPuzzleSolution]:
+            requests.append(message)
+            await asyncio.sleep(0.01)
+            if fail:
+                return None
+            return RespondPuzzleSolution(PuzzleSolutionResponse(message.coin_name, message.height, puzzle, solution))
+
+    peer = cast(WSChiaConnection, FakePeer())
+    cache = PeerRequestCache()
+
+    # concurrent lookups share a single request, failures included
+    results = await asyncio.gather(
+        *(fetch_coin_spend(uint32(10), coin, peer, cache) for _ in range(5)), return_exceptions=True
+    )
+    assert len(requests) == 1
+    assert all(isinstance(result, PeerRequestException) for result in results)
+
+    # a failed request is not reused
+    fail = False
+    spends = await asyncio.gather(*(fetch_coin_spend(uint32(10), coin, peer, cache) for _ in range(5)))
+    assert len(requests) == 2
+    assert all(spend == spends[0] for spend in spends)
+    assert spends[0].coin == coin
+    assert await fetch_coin_spend(uint32(10), coin, peer, cache) == spends[0]
+    assert len(requests) == 2
+
+    # a different spent height (after a reorg) is another request, and so is a lookup without the cache
+    await fetch_coin_spend(uint32(11), coin, peer, cache)
+    assert len(requests) == 3
+    await fetch_coin_spend(uint32(11), coin, peer)
+    assert len(requests) == 4
+
+    # rolling back past the spent height drops the entry
+    cache.clear_after_height(10)
+    await fetch_coin_spend(uint32(11), coin, peer, cache)
+    assert len(requests) == 5
+    cache.clear_after_height(9)
+    await fetch_coin_spend(uint32(10), coin, peer, cache)
+    assert len(requests) == 6
@@ -5,8 +5,11 @@ import dataclasses
 import enum
 import logging
 import traceback
-from concurrent.futures import Executor, ThreadPoolExecutor
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from enum import Enum
+from multiprocessing.context import BaseContext
 from pathlib import Path
 from typing import TYPE_CHECKING, ClassVar, Optional, cast
 
@@ -29,7 +32,7 @@ from chia.consensus.block_body_validation import ForkInfo, validate_block_body
 from chia.consensus.block_header_validation import validate_unfinished_header_block
 from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
-from chia.consensus.find_fork_point import lookup_fork_chain
+from chia.consensus.find_fork_point import get_skip_height, lookup_fork_chain
 from chia.consensus.full_block_to_block_record import block_to_block_record
 from chia.consensus.generator_tools import get_block_header
 from chia.consensus.get_block_generator import get_block_generator
@@ -48,6 +51,7 @@ from chia.util.errors import Err
 from chia.util.hash import std_hash
 from chia.util.inline_executor import InlineExecutor
 from chia.util.priority_mutex import PriorityMutex
+from chia.util.setproctitle import getproctitle, setproctitle
 
 log = logging.getLogger(__name__)
 
@@ -97,8 +101,20 @@ class Blockchain:
     _peak_height: Optional[uint32]
     # All blocks in peak path are guaranteed to be included, can include orphan blocks
     __block_records: dict[bytes32, BlockRecord]
-    # all hashes of blocks in block_record by height, used for garbage collection
-    __heights_in_cache: dict[uint32, set[bytes32]]
+    # the hash of the first block in block_record at each height, used for
+    # garbage collection. Almost every height only has a single block, so this
+    # avoids keeping a set per height
+    __heights_in_cache: dict[uint32, bytes32]
+    # hashes of any additional blocks in block_record at the same height (orphans
+    # and forks), used together with __heights_in_cache for garbage collection
+    __forks_in_cache: dict[uint32, set[bytes32]]
+    # heights whose blocks were all removed by remove_block_record(). The
+    # garbage collection walks down the heights until it finds one that was
+    # never in the cache, so these must not end it early
+    __emptied_heights: set[uint32]
+    # the ancestor skip-list link (see get_skip_height()) of each block in
+    # block_record, as (height, header hash) of the ancestor
+    __skip_links: dict[bytes32, tuple[uint32, bytes32]]
     # maps block height (of the current heaviest chain) to block hash and sub
     # epoch summaries
     __height_map: BlockHeightMap
@@ -108,15 +124,26 @@ class Blockchain:
     block_store: BlockStore
     # Used to verify blocks in parallel
     pool: Executor
+    # Used to pre-validate blocks. This is either the same as pool, or a
+    # process pool when multiprocess_validation is enabled
+    validation_pool: Executor
     # Set holding seen compact proofs, in order to avoid duplicates.
     _seen_compact_proofs: set[tuple[VDFInfo, uint32]]
 
     # Whether blockchain is shut down or not
     _shut_down: bool
 
+    # where the height-to-hash cache files are kept, and for which network.
+    # Needed to reload the chain state if a batch commit fails
+    _blockchain_dir: Path
+    _selected_network: Optional[str]
+    # set while inside batch_commit()
+    _batch_commit: bool
+    # the header hashes of the blocks added in the current batch_commit()
+    _batch_blocks: list[bytes32]
+
     # Lock to prevent simultaneous reads and writes
     priority_mutex: PriorityMutex[BlockchainMutexPriority]
-    compact_proof_lock: asyncio.Lock
 
     _log_coins: bool
 
@@ -129,6 +156,8 @@ class Blockchain:
         reserved_cores: int,
         *,
         single_threaded: bool = False,
+        multiprocess_validation: bool = False,
+        multiprocessing_context: Optional[BaseContext] = None,
         log_coins: bool = False,
         selected_network: Optional[str] = None,
     ) -> Blockchain:
@@ -142,9 +171,9 @@ class Blockchain:
         # Blocks are validated under high priority, and transactions under low priority. This guarantees blocks will
         # be validated first.
         self.priority_mutex = PriorityMutex.create(priority_type=BlockchainMutexPriority)
-        self.compact_proof_lock = asyncio.Lock()
         if single_threaded:
             self.pool = InlineExecutor()
+            self.validation_pool = self.pool
         else:
             cpu_count = available_logical_cores()
             num_workers = max(cpu_count - reserved_cores, 1)
@@ -152,12 +181,27 @@ class Blockchain:
                 max_workers=num_workers,
                 thread_name_prefix="block-validation-",
             )
+            if multiprocess_validation:
+                # pre-validating blocks holds the GIL for parts of the work, so
+                # a process pool can make use of more cores when syncing
+                self.validation_pool = ProcessPoolExecutor(
+                    max_workers=num_workers,
+                    mp_context=multiprocessing_context,
+                    initializer=setproctitle,
+                    initargs=(f"{getproctitle()}_block_validation",),
+                )
+            else:
+                self.validation_pool = self.pool
             log.info(f"Started {num_workers} processes for block validation")
 
         self.constants = consensus_constants
         self.coin_store = coin_store
         self.block_store = block_store
         self._shut_down = False
+        self._blockchain_dir = blockchain_dir
+        self._selected_network = selected_network
+        self._batch_commit = False
+        self._batch_blocks = []
         await self._load_chain_from_store(blockchain_dir, selected_network)
         self._seen_compact_proofs = set()
         return self
@@ -165,6 +209,9 @@ class Blockchain:
     def shut_down(self) -> None:
         self._shut_down = True
         self.pool.shutdown(wait=True)
+        if self.validation_pool is not self.pool:
+            self.validation_pool.shutdown(wait=True)
+        self.__height_map.close()
 
     async def _load_chain_from_store(self, blockchain_dir: Path, selected_network: Optional[str] = None) -> None:
         """
@@ -173,6 +220,9 @@ class Blockchain:
         self.__height_map = await BlockHeightMap.create(blockchain_dir, self.block_store.db_wrapper, selected_network)
         self.__block_records = {}
         self.__heights_in_cache = {}
+        self.__forks_in_cache = {}
+        self.__emptied_heights = set()
+        self.__skip_links = {}
         block_records, peak = await self.block_store.get_block_records_close_to_peak(self.constants.BLOCKS_CACHE_SIZE)
         for block in block_records.values():
             self.add_block_record(block)
@@ -187,6 +237,45 @@ class Blockchain:
         assert self.__height_map.contains_height(self._peak_height)
         assert not self.__height_map.contains_height(uint32(self._peak_height + 1))
 
+    @asynccontextmanager
+    async def batch_commit(self) -> AsyncIterator[None]:
+        """
+        This method must be called under the blockchain lock
+        Commits all blocks added by add_block() within this context in a single
+        DB transaction, rather than one transaction per block. The height map
+        is flushed once, after the transaction is committed. Nested calls join
+        the outermost batch.
+        The in-memory state is updated as blocks are added, so if the
+        transaction fails, the batch's blocks are evicted from the block store
+        caches and the block records and height map are reloaded from the
+        database.
+        Since the peak and the height map move ahead of the transaction, tasks
+        not holding the blockchain lock may see blocks that aren't visible on
+        the reader connections yet. This is only meant for long sync.
+        """
+        if self._batch_commit:
+            yield
+            return
+
+        self._batch_commit = True
+        try:
+            async with self.block_store.db_wrapper.writer():
+                yield
+        except BaseException:
+            log.warning("batch commit failed, reloading the blockchain state from the database")
+            for header_hash in self._batch_blocks:
+                self.block_store.rollback_cache_block(header_hash)
+            # the height map keeps its updates in memory until they're flushed,
+            # so the file is still in sync with the database
+            self.__height_map.close()
+            await self._load_chain_from_store(self._blockchain_dir, self._selected_network)
+            raise
+        finally:
+            self._batch_commit = False
+            self._batch_blocks = []
+
+        await self.__height_map.maybe_flush()
+
     def get_peak(self) -> Optional[BlockRecord]:
         """
         Return the peak of the blockchain
@@ -434,6 +523,8 @@ class Blockchain:
 
             # there's a suspension point here, as we leave the async context
             # manager
+            if self._batch_commit:
+                self._batch_blocks.append(header_hash)
 
             # make sure to update _peak_height after the transaction is committed,
             # otherwise other tasks may go look for this block before it's available
@@ -466,8 +557,10 @@ class Blockchain:
             )
             raise
 
-        # This is done outside the try-except in case it fails, since we do not want to revert anything if it does
-        await self.__height_map.maybe_flush()
+        # This is done outside the try-except in case it fails, since we do not want to revert anything if it does.
+        # When adding a batch of blocks, it's done once the whole batch is committed
+        if not self._batch_commit:
+            await self.__height_map.maybe_flush()
 
         if state_change_summary is not None:
             # new coin records added
@@ -846,16 +939,20 @@ class Blockchain:
             height = self._peak_height - self.constants.BLOCKS_CACHE_SIZE
         if height < 0:
             return None
-        blocks_to_remove = self.__heights_in_cache.get(uint32(height), None)
-        while blocks_to_remove is not None and height >= 0:
-            for header_hash in blocks_to_remove:
-                del self.__block_records[header_hash]  # remove from blocks
-            del self.__heights_in_cache[uint32(height)]  # remove height from heights in cache
-
-            if height == 0:
+        while height >= 0:
+            block_to_remove = self.__heights_in_cache.pop(uint32(height), None)
+            if block_to_remove is not None:
+                self.__emptied_heights.discard(uint32(height))
+                del self.__block_records[block_to_remove]  # remove from blocks
+                self.__skip_links.pop(block_to_remove, None)
+                for header_hash in self.__forks_in_cache.pop(uint32(height), ()):
+                    del self.__block_records[header_hash]
+                    self.__skip_links.pop(header_hash, None)
+            elif uint32(height) in self.__emptied_heights:
+                self.__emptied_heights.remove(uint32(height))
+            else:
                 break
             height -= 1
-            blocks_to_remove = self.__heights_in_cache.get(uint32(height), None)
 
     def clean_block_records(self) -> None:
         """
@@ -986,7 +1083,19 @@ class Blockchain:
     def remove_block_record(self, header_hash: bytes32) -> None:
         sbr = self.block_record(header_hash)
         del self.__block_records[header_hash]
-        self.__heights_in_cache[sbr.height].remove(header_hash)
+        self.__skip_links.pop(header_hash, None)
+        forks = self.__forks_in_cache.get(sbr.height)
+        if self.__heights_in_cache[sbr.height] == header_hash:
+            if forks is None:
+                del self.__heights_in_cache[sbr.height]
+                self.__emptied_heights.add(sbr.height)
+                return
+            self.__heights_in_cache[sbr.height] = forks.pop()
+        else:
+            assert forks is not None
+            forks.remove(header_hash)
+        if len(forks) == 0:
+            del self.__forks_in_cache[sbr.height]
 
     def add_block_record(self, block_record: BlockRecord) -> None:
         """
@@ -994,9 +1103,55 @@ class Blockchain:
         """
 
         self.__block_records[block_record.header_hash] = block_record
-        if block_record.height not in self.__heights_in_cache.keys():
-            self.__heights_in_cache[block_record.height] = set()
-        self.__heights_in_cache[block_record.height].add(block_record.header_hash)
+        first_hash = self.__heights_in_cache.setdefault(block_record.height, block_record.header_hash)
+        if first_hash != block_record.header_hash:
+            self.__forks_in_cache.setdefault(block_record.height, set()).add(block_record.header_hash)
+
+        if block_record.height > 0:
+            skip_height = get_skip_height(block_record.height)
+            height, header_hash = self._walk_to_ancestor(block_record.height - 1, block_record.prev_hash, skip_height)
+            if height == skip_height:
+                self.__skip_links[block_record.header_hash] = (uint32(height), header_hash)
+
+    def _walk_to_ancestor(self, height: int, header_hash: bytes32, target_height: int) -> tuple[int, bytes32]:
+        """
+        Walks from the block header_hash (at height) towards its ancestor at
+        target_height, without touching the database. Once the walk reaches the
+        main chain, the ancestor is looked up in the height map. Otherwise it
+        follows the skip-list links and previous hashes of the block records in
+        the cache. Returns the height and header hash of the lowest block it
+        reached, which is the ancestor if the height is target_height.
+        """
+        while height > target_height:
+            if self.height_to_hash(uint32(height)) == header_hash:
+                main_chain_hash = self.height_to_hash(uint32(target_height))
+                assert main_chain_hash is not None
+                return target_height, main_chain_hash
+            link = self.__skip_links.get(header_hash)
+            if link is not None and link[0] >= target_height:
+                height, header_hash = link
+                continue
+            block_record = self.__block_records.get(header_hash)
+            if block_record is None:
+                break
+            height -= 1
+            header_hash = block_record.prev_hash
+        return height, header_hash
+
+    async def get_ancestor(self, header_hash: bytes32, height: int, target_height: int) -> bytes32:
+        """
+        Returns the header hash of the ancestor, at target_height, of the block
+        header_hash at height. This takes O(log n) steps for blocks in the
+        cache or on the main chain, and falls back to looking up previous
+        hashes in the database one at a time for other blocks.
+        """
+        assert 0 <= target_height <= height
+        while True:
+            height, header_hash = self._walk_to_ancestor(height, header_hash, target_height)
+            if height == target_height:
+                return header_hash
+            header_hash = await self.block_store.get_prev_hash(header_hash)
+            height -= 1
 
     async def persist_sub_epoch_challenge_segments(
         self, ses_block_hash: bytes32, segments: list[SubEpochChallengeSegment]
@@ -1053,26 +1208,25 @@ class Blockchain:
         peak_block = await self.get_block_record_from_db(header_hash)
         assert peak_block is not None
         if self.height_to_hash(peak_block.height) != header_hash:
-            peak: Optional[BlockRecord] = self.get_peak()
-            assert peak is not None
-            reorg_chain: dict[uint32, bytes32]
-            # Then we look up blocks up to fork point one at a time, backtracking
-            reorg_chain, _ = await lookup_fork_chain(
-                self,
-                (peak.height, peak.header_hash),
-                (peak_block.height, peak_block.header_hash),
-                self.constants,
-            )
-
+            # Then we look up the ancestor at each referenced height, through
+            # the skip-list. We walk down from the highest reference, so the
+            # walk only covers the fork once. Once we reach the main chain,
+            # we're below the fork point and the remaining references are
+            # looked up in the main chain
             remaining_refs = set()
-            for ref_height in generator_refs:
-                if ref_height in reorg_chain:
-                    gen = await self.block_store.get_generator(reorg_chain[ref_height])
-                    if gen is None:
-                        raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
-                    generators[ref_height] = gen
-                else:
+            height, ancestor = int(peak_block.height), header_hash
+            for ref_height in sorted(generator_refs, reverse=True):
+                if ref_height > peak_block.height or self.height_to_hash(uint32(height)) == ancestor:
+                    remaining_refs.add(ref_height)
+                    continue
+                height, ancestor = ref_height, await self.get_ancestor(ancestor, height, ref_height)
+                if self.height_to_hash(ref_height) == ancestor:
                     remaining_refs.add(ref_height)
+                    continue
+                gen = await self.block_store.get_generator(ancestor)
+                if gen is None:
+                    raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
+                generators[ref_height] = gen
         else:
             remaining_refs = generator_refs
 
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Union
+from typing import Optional, Union
 
 from chia_rs import BlockRecord, ConsensusConstants, HeaderBlock
 from chia_rs.sized_bytes import bytes32
@@ -9,6 +9,67 @@ from chia_rs.sized_ints import uint32
 from chia.consensus.blockchain_interface import BlockRecordsProtocol
 
 
+def get_skip_height(height: int) -> int:
+    """
+    Returns the height of the ancestor a block at the specified height links
+    to in the ancestor skip-list. This is the same scheme as Bitcoin's pskip:
+    by following these links (and previous-block links where they would
+    overshoot), any ancestor can be reached in O(log n) steps.
+    """
+    if height < 2:
+        return 0
+
+    # clears the lowest set bit
+    def invert_lowest_one(n: int) -> int:
+        return n & (n - 1)
+
+    if height & 1:
+        return invert_lowest_one(invert_lowest_one(height - 1)) + 1
+    return invert_lowest_one(height)
+
+
+def _on_main_chain(blocks: BlockRecordsProtocol, header_hash: bytes32, height: int) -> bool:
+    return (
+        height >= 0 and blocks.contains_height(uint32(height)) and blocks.height_to_hash(uint32(height)) == header_hash
+    )
+
+
+def _main_chain_hash(blocks: BlockRecordsProtocol, height: int) -> bytes32:
+    header_hash = blocks.height_to_hash(uint32(height))
+    assert header_hash is not None
+    return header_hash
+
+
+async def _walk_to_main_chain(
+    blocks: BlockRecordsProtocol,
+    height: int,
+    header_hash: bytes32,
+    max_height: int,
+    chain: Optional[dict[uint32, bytes32]] = None,
+) -> tuple[int, bytes32]:
+    """
+    Walks down from the block header_hash at height until it joins the main
+    chain of blocks, and returns the height and header hash of the main chain
+    block at that point, but no higher than max_height. If chain is passed in,
+    the blocks above that are added to it. If the chain never joins the main
+    chain, returns height -1 and the hash preceding the genesis block.
+    """
+    while height >= 0:
+        if _on_main_chain(blocks, header_hash, height):
+            # from here on down, the chain is the main chain
+            if chain is not None:
+                for main_chain_height in range(height, max_height, -1):
+                    chain[uint32(main_chain_height)] = _main_chain_hash(blocks, main_chain_height)
+            if height > max_height:
+                height, header_hash = max_height, _main_chain_hash(blocks, max_height)
+            break
+        if chain is not None:
+            chain[uint32(height)] = header_hash
+        [header_hash] = await blocks.prev_block_hash([header_hash])
+        height -= 1
+    return height, header_hash
+
+
 async def find_fork_point_in_chain(
     blocks: BlockRecordsProtocol,
     block_1: Union[BlockRecord, HeaderBlock],
@@ -18,12 +79,22 @@ async def find_fork_point_in_chain(
     are all included in chain)
     Returns -1 if chains have no common ancestor
     * assumes the fork point is loaded in blocks
+    If either block is on the main chain, only the other chain is walked, until
+    it joins the main chain. The ancestors of the main chain block are looked
+    up by height.
     """
     height_1 = int(block_1.height)
     height_2 = int(block_2.height)
     bh_1 = block_1.header_hash
     bh_2 = block_2.header_hash
 
+    if _on_main_chain(blocks, bh_1, height_1):
+        fork_height, _ = await _walk_to_main_chain(blocks, height_2, bh_2, height_1)
+        return fork_height
+    if _on_main_chain(blocks, bh_2, height_2):
+        fork_height, _ = await _walk_to_main_chain(blocks, height_1, bh_1, height_2)
+        return fork_height
+
     # special case for first level, since we actually already know the previous
     # hash
     if height_1 > height_2:
@@ -75,6 +146,8 @@ async def lookup_fork_chain(
     there is a block hash (GENESIS_CHALLENGE).
     We never include the fork point in the returned height to hash map, so its
     key is unsigned
+    If either block is on the main chain, only the other chain is walked, as in
+    find_fork_point_in_chain()
     """
     height_1 = block_1[0]
     bh_1 = block_1[1]
@@ -83,6 +156,15 @@ async def lookup_fork_chain(
 
     ret: dict[uint32, bytes32] = {}
 
+    if _on_main_chain(blocks, bh_1, height_1):
+        fork_height, fork_hash = await _walk_to_main_chain(blocks, height_2, bh_2, height_1, ret)
+        return (ret, fork_hash if fork_height >= 0 else constants.GENESIS_CHALLENGE)
+    if _on_main_chain(blocks, bh_2, height_2):
+        fork_height, fork_hash = await _walk_to_main_chain(blocks, height_1, bh_1, height_2)
+        for height in range(fork_height + 1, height_2 + 1):
+            ret[uint32(height)] = _main_chain_hash(blocks, height)
+        return (ret, fork_hash if fork_height >= 0 else constants.GENESIS_CHALLENGE)
+
     while height_1 > height_2:
         [bh_1] = await blocks.prev_block_hash([bh_1])
         height_1 -= 1
@@ -5,9 +5,10 @@ import copy
 import logging
 import time
 import traceback
-from collections.abc import Awaitable, Collection
-from concurrent.futures import Executor
+from collections.abc import Awaitable, Collection, Mapping, Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
 from typing import Optional
 
 from chia_rs import (
@@ -35,11 +36,16 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.proof_of_space import verify_and_get_quality_string
 from chia.types.generator_types import BlockGenerator
 from chia.types.validation_state import ValidationState
+from chia.util.block_cache import BlockCache
 from chia.util.errors import Err
 from chia.util.streamable import Streamable, streamable
 
 log = logging.getLogger(__name__)
 
+# the challenge a proof of space was checked against, and the resulting quality
+# string (None if the proof is invalid)
+PoSpaceCheck = tuple[bytes32, Optional[bytes32]]
+
 
 @streamable
 @dataclass(frozen=True)
@@ -154,6 +160,294 @@ def _pre_validate_block(
         return PreValidationResult(uint16(Err.UNKNOWN.value), None, None, uint32(validation_time * 1000))
 
 
+class _BlockRecordsView(BlockCache):
+    """
+    The block records passed to a validation worker process. It only holds the
+    records leading up to the block being validated, so it keeps track of
+    whether validation looked for a record or height beyond those. Unless the
+    records go all the way back to the genesis block, a miss may just mean the
+    record wasn't passed in, rather than that it doesn't exist.
+    """
+
+    reaches_genesis: bool = False
+    incomplete: bool = False
+
+    def _miss(self) -> None:
+        if not self.reaches_genesis:
+            self.incomplete = True
+
+    def try_block_record(self, header_hash: bytes32) -> Optional[BlockRecord]:
+        block_record = super().try_block_record(header_hash)
+        if block_record is None:
+            self._miss()
+        return block_record
+
+    def block_record(self, header_hash: bytes32) -> BlockRecord:
+        block_record = self.try_block_record(header_hash)
+        if block_record is None:
+            raise KeyError(f"block record {header_hash.hex()} not passed to worker process")
+        return block_record
+
+    def height_to_hash(self, height: uint32) -> Optional[bytes32]:
+        header_hash = super().height_to_hash(height)
+        if header_hash is None:
+            self._miss()
+        return header_hash
+
+    def contains_height(self, height: uint32) -> bool:
+        return self.height_to_hash(height) is not None
+
+
+def _block_records_view(
+    constants: ConsensusConstants,
+    blockchain: BlockRecordsProtocol,
+    block: FullBlock,
+    prev_ses_block_known: bool,
+) -> list[BlockRecord]:
+    """
+    Collects the block records validate_finished_header_block() looks at when
+    validating block: enough to find the previous transaction block, the
+    challenges of the last sub-slots and, unless the validation state already
+    has it, the block that included the last sub-epoch summary. If this turns
+    out not to be enough, the worker process reports it and the block is
+    validated in this process instead.
+    """
+    if block.height == 0:
+        return []
+    curr = blockchain.try_block_record(block.prev_header_hash)
+    if curr is None:
+        return []
+    overflow = is_overflow_block(constants, block.reward_chain_block.signage_point_index)
+    sub_slots_to_look_for = 3 if overflow else 2
+    sub_slots_found = 0
+    found_transaction_block = False
+    found_ses = prev_ses_block_known
+    records = [curr]
+    while curr.height > 0:
+        if curr.first_in_sub_slot:
+            assert curr.finished_challenge_slot_hashes is not None
+            sub_slots_found += len(curr.finished_challenge_slot_hashes)
+        found_transaction_block |= curr.is_transaction_block
+        found_ses |= curr.sub_epoch_summary_included is not None
+        if found_transaction_block and found_ses and sub_slots_found >= sub_slots_to_look_for:
+            break
+        prev = blockchain.try_block_record(curr.prev_hash)
+        if prev is None:
+            break
+        curr = prev
+        records.append(curr)
+    return records
+
+
+def _pre_validate_block_shared(
+    constants: ConsensusConstants,
+    shm_name: str,
+    block_size: int,
+    total_size: int,
+    prev_generators: Optional[list[bytes]],
+    conds_bytes: Optional[bytes],
+    ssi: uint64,
+    difficulty: uint64,
+    prev_ses_block_bytes: Optional[bytes],
+) -> Optional[bytes]:
+    """
+    Runs _pre_validate_block() in a worker process. The block and the block
+    records it's validated against are handed over in the shared memory
+    segment shm_name: the serialized block (block_size bytes) followed by the
+    serialized block records, total_size bytes in all. Chia types can't be
+    pickled, so the rest of the arguments and the result are serialized too.
+    Returns None if validation needed a block record that wasn't passed in.
+    """
+    shm = SharedMemory(name=shm_name)
+    try:
+        assert shm.buf is not None
+        buf = bytes(shm.buf[:total_size])
+    finally:
+        shm.close()
+
+    block = FullBlock.from_bytes_unchecked(buf[:block_size])
+    view = _BlockRecordsView({})
+    view.reaches_genesis = block.height == 0
+    records = memoryview(buf)[block_size:]
+    while len(records) > 0:
+        block_record, consumed = BlockRecord.parse_rust(records, True)
+        view.add_block(block_record)
+        view.reaches_genesis |= block_record.height == 0
+        records = records[consumed:]
+
+    conds = None if conds_bytes is None else SpendBundleConditions.from_bytes_unchecked(conds_bytes)
+    prev_ses_block = None if prev_ses_block_bytes is None else BlockRecord.from_bytes_unchecked(prev_ses_block_bytes)
+    result = _pre_validate_block(
+        constants,
+        view,
+        block,
+        prev_generators,
+        conds,
+        ValidationState(ssi, difficulty, prev_ses_block),
+    )
+    # an unexpected exception (e.g. an assert in the consensus code tripping
+    # over the partial view) is reported as Err.UNKNOWN. Validating the block
+    # again against the full chain gives the right result either way
+    if view.incomplete or result.error == Err.UNKNOWN.value:
+        return None
+    return bytes(result)
+
+
+def _pre_validate_block_in_process(
+    constants: ConsensusConstants,
+    blockchain: AugmentedBlockchain,
+    block: FullBlock,
+    pool: ProcessPoolExecutor,
+    prev_generators: Optional[list[bytes]],
+    conds: Optional[SpendBundleConditions],
+    vs: ValidationState,
+) -> Awaitable[PreValidationResult]:
+    """
+    Submits the validation of block to a process pool. The serialized block,
+    along with the block records leading up to it, is written to a shared
+    memory segment once, rather than being pickled through the pool's pipe.
+    The segment is released as soon as the worker is done with it.
+    """
+    block_bytes = bytes(block)
+    records_bytes = b"".join(
+        bytes(block_record)
+        for block_record in _block_records_view(constants, blockchain, block, vs.prev_ses_block is not None)
+    )
+    block_size = len(block_bytes)
+    total_size = block_size + len(records_bytes)
+    shm = SharedMemory(create=True, size=total_size)
+    try:
+        assert shm.buf is not None
+        shm.buf[:block_size] = block_bytes
+        shm.buf[block_size:total_size] = records_bytes
+        future: Future[Optional[bytes]] = pool.submit(
+            _pre_validate_block_shared,
+            constants,
+            shm.name,
+            block_size,
+            total_size,
+            prev_generators,
+            None if conds is None else bytes(conds),
+            vs.ssi,
+            vs.difficulty,
+            None if vs.prev_ses_block is None else bytes(vs.prev_ses_block),
+        )
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+
+    def release(_: Future[Optional[bytes]]) -> None:
+        shm.close()
+        shm.unlink()
+
+    future.add_done_callback(release)
+    expected_vs = copy.copy(vs)
+
+    async def result() -> PreValidationResult:
+        serialized = await asyncio.wrap_future(future)
+        if serialized is not None:
+            return PreValidationResult.from_bytes(serialized)
+        log.debug(f"validating block at height {block.height} needed more block records, validating in-process")
+        return await asyncio.to_thread(
+            _pre_validate_block, constants, blockchain, block, prev_generators, conds, expected_vs
+        )
+
+    return asyncio.ensure_future(result())
+
+
+def _check_pospace(constants: ConsensusConstants, block: FullBlock, challenge: bytes32) -> Optional[PoSpaceCheck]:
+    try:
+        if block.reward_chain_block.challenge_chain_sp_vdf is None:
+            cc_sp_hash: bytes32 = challenge
+        else:
+            cc_sp_hash = block.reward_chain_block.challenge_chain_sp_vdf.output.get_hash()
+        q_str: Optional[bytes32] = verify_and_get_quality_string(
+            block.reward_chain_block.proof_of_space, constants, challenge, cc_sp_hash, height=block.height
+        )
+        return challenge, q_str
+    except Exception:
+        # the proof will be checked again by pre_validate_block()
+        log.exception(f"failed to check proof of space of block at height {block.height}")
+        return None
+
+
+def _speculative_challenge(
+    constants: ConsensusConstants,
+    block: FullBlock,
+    recent_blocks: Mapping[bytes32, FullBlock],
+    blockchain: BlockRecordsProtocol,
+) -> Optional[bytes32]:
+    """
+    Mirrors get_block_challenge(), but walks back through FullBlocks that have
+    not been turned into BlockRecords yet (falling back to block records once
+    it leaves recent_blocks). Returns None if the walk can't be completed.
+    """
+    overflow = is_overflow_block(constants, block.reward_chain_block.signage_point_index)
+    if len(block.finished_sub_slots) > 0:
+        if overflow:
+            return block.finished_sub_slots[-1].challenge_chain.challenge_chain_end_of_slot_vdf.challenge
+        return block.finished_sub_slots[-1].challenge_chain.get_hash()
+    if block.height == 0:
+        return constants.GENESIS_CHALLENGE
+
+    challenges_to_look_for = 2 if overflow else 1
+    reversed_challenge_hashes: list[bytes32] = []
+    curr_hash = block.prev_header_hash
+    while True:
+        curr_block = recent_blocks.get(curr_hash)
+        if curr_block is not None:
+            height = curr_block.height
+            prev_hash = curr_block.prev_header_hash
+            finished_hashes: Optional[list[bytes32]] = [
+                sub_slot.challenge_chain.get_hash() for sub_slot in curr_block.finished_sub_slots
+            ]
+        else:
+            curr_rec = blockchain.try_block_record(curr_hash)
+            if curr_rec is None:
+                return None
+            height = curr_rec.height
+            prev_hash = curr_rec.prev_hash
+            finished_hashes = curr_rec.finished_challenge_slot_hashes if curr_rec.first_in_sub_slot else None
+        if finished_hashes:
+            reversed_challenge_hashes += reversed(finished_hashes)
+            if len(reversed_challenge_hashes) >= challenges_to_look_for:
+                break
+        if height == 0:
+            return None
+        curr_hash = prev_hash
+    return reversed_challenge_hashes[challenges_to_look_for - 1]
+
+
+def check_pospace_batch(
+    constants: ConsensusConstants,
+    blockchain: BlockRecordsProtocol,
+    blocks: Sequence[FullBlock],
+    recent_blocks: Mapping[bytes32, FullBlock],
+    pool: Executor,
+) -> list[Awaitable[Optional[PoSpaceCheck]]]:
+    """
+    Submits the proof of space checks of a batch of blocks to the executor, all
+    at once. The proof only depends on the block and its challenge, and the
+    challenge can be derived from the blocks themselves, so this doesn't need
+    to wait for the previous blocks to be validated. recent_blocks must include
+    the blocks in the batch and the blocks preceding it that aren't in
+    blockchain yet. The results are passed to pre_validate_block(), which only
+    uses them if the challenge matches the one it computes itself.
+    """
+    loop = asyncio.get_running_loop()
+    futures: list[Awaitable[Optional[PoSpaceCheck]]] = []
+    for block in blocks:
+        challenge = _speculative_challenge(constants, block, recent_blocks, blockchain)
+        if challenge is None:
+            future: asyncio.Future[Optional[PoSpaceCheck]] = loop.create_future()
+            future.set_result(None)
+            futures.append(future)
+        else:
+            futures.append(loop.run_in_executor(pool, _check_pospace, constants, block, challenge))
+    return futures
+
+
 async def pre_validate_block(
     constants: ConsensusConstants,
     blockchain: AugmentedBlockchain,
@@ -163,6 +457,7 @@ async def pre_validate_block(
     vs: ValidationState,
     *,
     wp_summaries: Optional[list[SubEpochSummary]] = None,
+    pospace: Optional[PoSpaceCheck] = None,
 ) -> Awaitable[PreValidationResult]:
     """
     This method must be called under the blockchain lock
@@ -186,7 +481,9 @@ async def pre_validate_block(
             for the next block. It includes subslot iterators, difficulty and
             the previous sub epoch summary (ses) block.
         wp_summaries:
-        validate_signatures:
+        pospace: The result of checking the block's proof of space ahead of
+            time (see check_pospace_batch()). It's only used if it was checked
+            against the same challenge as we compute here.
     """
     prev_b: Optional[BlockRecord] = None
 
@@ -211,9 +508,13 @@ async def pre_validate_block(
         cc_sp_hash: bytes32 = challenge
     else:
         cc_sp_hash = block.reward_chain_block.challenge_chain_sp_vdf.output.get_hash()
-    q_str: Optional[bytes32] = verify_and_get_quality_string(
-        block.reward_chain_block.proof_of_space, constants, challenge, cc_sp_hash, height=block.height
-    )
+    q_str: Optional[bytes32]
+    if pospace is not None and pospace[0] == challenge:
+        q_str = pospace[1]
+    else:
+        q_str = verify_and_get_quality_string(
+            block.reward_chain_block.proof_of_space, constants, challenge, cc_sp_hash, height=block.height
+        )
     if q_str is None:
         return return_error(Err.INVALID_POSPACE)
 
@@ -260,16 +561,20 @@ async def pre_validate_block(
     except ValueError:
         return return_error(Err.FAILED_GETTING_GENERATOR_MULTIPROCESSING)
 
-    future = asyncio.get_running_loop().run_in_executor(
-        pool,
-        _pre_validate_block,
-        constants,
-        blockchain,
-        block,
-        previous_generators,
-        conds,
-        copy.copy(vs),
-    )
+    future: Awaitable[PreValidationResult]
+    if isinstance(pool, ProcessPoolExecutor):
+        future = _pre_validate_block_in_process(constants, blockchain, block, pool, previous_generators, conds, vs)
+    else:
+        future = asyncio.get_running_loop().run_in_executor(
+            pool,
+            _pre_validate_block,
+            constants,
+            blockchain,
+            block,
+            previous_generators,
+            conds,
+            copy.copy(vs),
+        )
 
     if block_rec.sub_epoch_summary_included is not None:
         vs.prev_ses_block = block_rec
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import logging
+import mmap
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
@@ -31,9 +33,22 @@ class BlockHeightMap:
 
     # Defines the path from genesis to the peak, no orphan blocks
     # this buffer contains all block hashes that are part of the current peak
-    # ordered by height. i.e. __height_to_hash[0..32] is the genesis hash
-    # __height_to_hash[32..64] is the hash for height 1 and so on
-    __height_to_hash: bytearray
+    # ordered by height. i.e. bytes [0..32] is the genesis hash, [32..64] is
+    # the hash for height 1 and so on.
+    # The part that's already on disk is memory mapped read-only (and only
+    # paged in when accessed), hashes above that are kept in __tail until the
+    # next flush appends them to the file. Hashes updated in the mapped range
+    # (i.e. after a rollback) are kept in __updates until the next flush. This
+    # way nothing reaches the file before maybe_flush() is called, which
+    # happens once the blocks are committed to the DB
+    __height_to_hash: Optional[mmap.mmap]
+    __mapped_size: int
+    __tail: bytearray
+    __updates: dict[int, bytes32]
+
+    # the number of bytes (32 per height) of the map that are valid. The file
+    # may be longer than this, e.g. after a rollback
+    __size: int
 
     # All sub-epoch summaries that have been included in the blockchain from the beginning until and including the peak
     # (height_included, SubEpochSummary). Note: ONLY for the blocks in the path to the peak
@@ -44,10 +59,8 @@ class BlockHeightMap:
     # disk
     __counter: int
 
-    # this is the lowest height whose hash has been updated since the last flush
-    # to disk. When it's time to write to disk, we can start flushing from this
-    # offset
-    __first_dirty: int
+    # whether the sub epoch summaries changed since they were last written
+    __ses_dirty: bool
 
     # the file we're saving the height-to-hash cache to
     __height_to_hash_filename: Path
@@ -65,8 +78,12 @@ class BlockHeightMap:
         self.db = db
 
         self.__counter = 0
-        self.__first_dirty = 0
-        self.__height_to_hash = bytearray()
+        self.__ses_dirty = False
+        self.__height_to_hash = None
+        self.__mapped_size = 0
+        self.__tail = bytearray()
+        self.__updates = {}
+        self.__size = 0
         self.__sub_epoch_summaries = {}
         suffix = "" if (selected_network is None or selected_network == "mainnet") else f"-{selected_network}"
         self.__height_to_hash_filename = blockchain_dir / f"height-to-hash{suffix}"
@@ -89,8 +106,7 @@ class BlockHeightMap:
                     return self
 
         try:
-            async with aiofiles.open(self.__height_to_hash_filename, "rb") as f:
-                self.__height_to_hash = bytearray(await f.read())
+            self.__map_file()
         except Exception as e:
             # it's OK if this file doesn't exist, we can rebuild it
             log.info(f"Failed to load height-to-hash: {e}")
@@ -108,27 +124,21 @@ class BlockHeightMap:
         prev_hash: bytes32 = row[1]
         height = row[2]
 
-        # allocate memory for height to hash map
-        # this may also truncate it, if thie file on disk had an invalid size
+        # allocate memory for the heights that aren't on disk yet. If the file
+        # on disk is longer than the chain, the extra entries are just ignored
         new_size = (height + 1) * 32
-        size = len(self.__height_to_hash)
-        if size > new_size:
-            del self.__height_to_hash[new_size:]
-        else:
-            self.__height_to_hash += bytearray([0] * (new_size - size))
-
-        self.__first_dirty = height + 1
+        if new_size > self.__mapped_size:
+            self.__tail = bytearray(new_size - self.__mapped_size)
+        self.__size = new_size
 
         if self.get_hash(height) != peak:
             self.__set_hash(height, peak)
 
-        if row[3] is not None:
+        if row[3] is not None and self.__sub_epoch_summaries.get(height) != row[3]:
             self.__sub_epoch_summaries[height] = row[3]
+            self.__ses_dirty = True
 
-        log.info(
-            f"Loaded sub-epoch-summaries: {len(self.__sub_epoch_summaries)} "
-            f"height-to-hash: {len(self.__height_to_hash) // 32}"
-        )
+        log.info(f"Loaded sub-epoch-summaries: {len(self.__sub_epoch_summaries)} height-to-hash: {self.__size // 32}")
 
         # prepopulate the height -> hash mapping
         # run this unconditionally in to ensure both the height-to-hash and sub
@@ -142,35 +152,76 @@ class BlockHeightMap:
     def update_height(self, height: uint32, header_hash: bytes32, ses: Optional[SubEpochSummary]) -> None:
         # we're only updating the last hash. If we've reorged, we already rolled
         # back, making this the new peak
-        assert height * 32 <= len(self.__height_to_hash)
+        assert height * 32 <= self.__size
         self.__set_hash(height, header_hash)
         if ses is not None:
             self.__sub_epoch_summaries[height] = bytes(ses)
+            self.__ses_dirty = True
 
     async def maybe_flush(self) -> None:
         if self.__counter < 1000:
             return
 
-        assert (len(self.__height_to_hash) % 32) == 0
-        offset = self.__first_dirty * 32
-
-        ses_buf = bytes(SesCache([(k, v) for (k, v) in self.__sub_epoch_summaries.items()]))
-
         self.__counter = 0
 
-        try:
+        # new heights are appended to the end of the file
+        offset = self.__mapped_size
+        tail = bytes(self.__tail)
+        if len(tail) > 0:
+            try:
+                async with aiofiles.open(self.__height_to_hash_filename, "r+b") as f:
+                    await f.seek(offset)
+                    await f.write(tail)
+            except Exception:
+                # if the file doesn't exist, write the whole buffer
+                async with aiofiles.open(self.__height_to_hash_filename, "wb") as f:
+                    head = b"" if self.__height_to_hash is None else self.__height_to_hash[:offset]
+                    await f.write(head + tail)
+
+            # the appended hashes are now on disk, map them too. Anything that
+            # was set while we were writing is carried over
+            self.__map_file()
+            tail_now = self.__tail
+            flushed = min(len(tail_now), self.__mapped_size - offset)
+            for idx in range(0, flushed, 32):
+                if tail_now[idx : idx + 32] != tail[idx : idx + 32]:
+                    self.__updates[(offset + idx) // 32] = bytes32(tail_now[idx : idx + 32])
+            self.__tail = tail_now[self.__mapped_size - offset :]
+
+        # hashes updated in the mapped range are written in place, in runs of
+        # consecutive heights
+        updates = sorted(self.__updates.items())
+        if len(updates) > 0:
             async with aiofiles.open(self.__height_to_hash_filename, "r+b") as f:
-                map_buf = self.__height_to_hash[offset:].copy()
-                await f.seek(offset)
-                await f.write(map_buf)
-        except Exception:
-            # if the file doesn't exist, write the whole buffer
-            async with aiofiles.open(self.__height_to_hash_filename, "wb") as f:
-                map_buf = self.__height_to_hash.copy()
-                await f.write(map_buf)
-
-        self.__first_dirty = len(self.__height_to_hash) // 32
-        await write_file_async(self.__ses_filename, ses_buf)
+                start = 0
+                while start < len(updates):
+                    end = start + 1
+                    while end < len(updates) and updates[end][0] == updates[end - 1][0] + 1:
+                        end += 1
+                    await f.seek(updates[start][0] * 32)
+                    await f.write(b"".join(block_hash for _, block_hash in updates[start:end]))
+                    start = end
+            # anything that was set again while we were writing stays pending
+            for height, block_hash in updates:
+                if self.__updates.get(height) == block_hash:
+                    del self.__updates[height]
+
+        if self.__ses_dirty:
+            self.__ses_dirty = False
+            ses_buf = bytes(SesCache([(k, v) for (k, v) in self.__sub_epoch_summaries.items()]))
+            await write_file_async(self.__ses_filename, ses_buf)
+
+    def __map_file(self) -> None:
+        with open(self.__height_to_hash_filename, "r+b") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            file_size -= file_size % 32
+            if file_size <= self.__mapped_size:
+                return
+            new_map = mmap.mmap(f.fileno(), file_size, access=mmap.ACCESS_READ)
+        if self.__height_to_hash is not None:
+            self.__height_to_hash.close()
+        self.__height_to_hash = new_map
+        self.__mapped_size = file_size
 
     # load height-to-hash map entries from the DB starting at height back in
     # time until we hit a match in the existing map, at which point we can
@@ -222,28 +273,43 @@ class BlockHeightMap:
                         # the block hash matches the cache
                         return
                     self.__sub_epoch_summaries[height] = entry[2]
+                    self.__ses_dirty = True
                 elif height in self.__sub_epoch_summaries:
                     # if the database file was swapped out and the existing
                     # cache doesn't represent any of it at all, a missing sub
                     # epoch summary needs to be removed from the cache too
                     del self.__sub_epoch_summaries[height]
+                    self.__ses_dirty = True
                 self.__set_hash(height, prev_hash)
                 prev_hash = entry[1]
             log.info(f"Done validating at height {height}")
 
     def __set_hash(self, height: int, block_hash: bytes32) -> None:
         idx = height * 32
-        self.__height_to_hash[idx : idx + 32] = block_hash
+        assert idx <= self.__size
+        if idx < self.__mapped_size:
+            self.__updates[height] = block_hash
+        else:
+            # this either overwrites or appends to the tail
+            idx -= self.__mapped_size
+            self.__tail[idx : idx + 32] = block_hash
+        self.__size = max(self.__size, height * 32 + 32)
         self.__counter += 1
-        self.__first_dirty = min(self.__first_dirty, height)
 
     def get_hash(self, height: uint32) -> bytes32:
         idx = height * 32
-        assert idx + 32 <= len(self.__height_to_hash)
-        return bytes32(self.__height_to_hash[idx : idx + 32])
+        assert idx + 32 <= self.__size
+        if idx < self.__mapped_size:
+            block_hash = self.__updates.get(height)
+            if block_hash is not None:
+                return block_hash
+            assert self.__height_to_hash is not None
+            return bytes32(self.__height_to_hash[idx : idx + 32])
+        idx -= self.__mapped_size
+        return bytes32(self.__tail[idx : idx + 32])
 
     def contains_height(self, height: uint32) -> bool:
-        return height * 32 < len(self.__height_to_hash)
+        return height * 32 < self.__size
 
     def rollback(self, fork_height: int) -> None:
         # fork height may be -1, in which case all blocks are different and we
@@ -256,9 +322,14 @@ class BlockHeightMap:
 
         for height in heights_to_delete:
             del self.__sub_epoch_summaries[height]
+            self.__ses_dirty = True
 
-        del self.__height_to_hash[(fork_height + 1) * 32 :]
-        self.__first_dirty = min(self.__first_dirty, fork_height + 1)
+        new_size = (fork_height + 1) * 32
+        if new_size < self.__size:
+            del self.__tail[max(0, new_size - self.__mapped_size) :]
+            for updated_height in [h for h in self.__updates if h > fork_height]:
+                del self.__updates[updated_height]
+            self.__size = new_size
 
         if len(heights_to_delete) > 0:
             log.log(
@@ -267,6 +338,13 @@ class BlockHeightMap:
                 f"height-to-hash and sub-epoch-summaries cache, to height {fork_height}",
             )
 
+    def close(self) -> None:
+        # anything that wasn't flushed yet is restored from the DB on the next
+        # startup
+        if self.__height_to_hash is not None:
+            self.__height_to_hash.close()
+            self.__height_to_hash = None
+
     def get_ses(self, height: uint32) -> SubEpochSummary:
         return SubEpochSummary.from_bytes(self.__sub_epoch_summaries[height])
 
@@ -11,7 +11,12 @@ from chia_rs import BlockRecord, FullBlock, SubEpochChallengeSegment, SubEpochSe
 from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint32
 
-from chia.full_node.full_block_utils import GeneratorBlockInfo, block_info_from_block, generator_from_block
+from chia.full_node.full_block_utils import (
+    FullBlockView,
+    GeneratorBlockInfo,
+    block_info_from_block,
+    generator_from_block,
+)
 from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.errors import Err
 from chia.util.lru_cache import LRUCache
@@ -39,6 +44,9 @@ class BlockStore:
     block_cache: LRUCache[bytes32, FullBlock]
     db_wrapper: DBWrapper2
     ses_challenge_cache: LRUCache[bytes32, list[SubEpochChallengeSegment]]
+    # recently referenced transactions generators, by header hash. Heights
+    # are not stable across reorgs, so they're resolved against the DB first
+    generator_cache: LRUCache[bytes32, bytes]
 
     @classmethod
     async def create(cls, db_wrapper: DBWrapper2, *, use_cache: bool = True) -> BlockStore:
@@ -46,9 +54,9 @@ class BlockStore:
             raise RuntimeError(f"BlockStore does not support database schema v{db_wrapper.db_version}")
 
         if use_cache:
-            self = cls(LRUCache(1000), db_wrapper, LRUCache(50))
+            self = cls(LRUCache(1000), db_wrapper, LRUCache(50), LRUCache(100))
         else:
-            self = cls(LRUCache(0), db_wrapper, LRUCache(0))
+            self = cls(LRUCache(0), db_wrapper, LRUCache(0), LRUCache(0))
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             log.info("DB: Creating block store tables and indexes.")
@@ -69,6 +77,18 @@ class BlockStore:
                 "block_record blob)"
             )
 
+            # The (zstd compressed) transactions generator of every block that
+            # has one, stored separately so that resolving generator references
+            # doesn't require decompressing and parsing the full block. The
+            # generator is also still part of the block in full_blocks, so this
+            # grows the database by the compressed size of every generator.
+            # Blocks added before this table existed aren't backfilled. They
+            # don't have a row here, and keep being looked up in full_blocks
+            # instead
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS block_generators(header_hash blob PRIMARY KEY, generator blob)"
+            )
+
             # This is a single-row table containing the hash of the current
             # peak. The "key" field is there to make update statements simple
             await conn.execute("CREATE TABLE IF NOT EXISTS current_peak(key int PRIMARY KEY, hash blob)")
@@ -113,19 +133,23 @@ class BlockStore:
 
     async def replace_proof(self, header_hash: bytes32, block: FullBlock) -> None:
         assert header_hash == block.header_hash
+        await self.replace_proofs([block])
 
-        block_bytes: bytes = compress(block)
-
-        self.block_cache.put(header_hash, block)
+    async def replace_proofs(self, blocks: list[FullBlock]) -> None:
+        """
+        Updates the stored blocks with the same header hashes as the ones passed in. This is used to write
+        blocks whose proofs of time have been replaced by compact ones.
+        """
+        rows = []
+        for block in blocks:
+            header_hash = block.header_hash
+            self.block_cache.put(header_hash, block)
+            rows.append((compress(block), int(block.is_fully_compactified()), header_hash))
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
-            await conn.execute(
+            await conn.executemany(
                 "UPDATE full_blocks SET block=?,is_fully_compactified=? WHERE header_hash=?",
-                (
-                    block_bytes,
-                    int(block.is_fully_compactified()),
-                    header_hash,
-                ),
+                rows,
             )
 
     async def add_full_block(self, header_hash: bytes32, block: FullBlock, block_record: BlockRecord) -> None:
@@ -158,6 +182,11 @@ class BlockStore:
                     bytes(block_record),
                 ),
             )
+            if block.transactions_generator is not None:
+                await conn.execute(
+                    "INSERT OR IGNORE INTO block_generators(header_hash, generator) VALUES(?, ?)",
+                    (header_hash, zstd.compress(bytes(block.transactions_generator))),
+                )
 
     async def persist_sub_epoch_challenge_segments(
         self, ses_block_hash: bytes32, segments: list[SubEpochChallengeSegment]
@@ -196,6 +225,10 @@ class BlockStore:
             # this is best effort. When rolling back, we may not have added the
             # block to the cache yet
             pass
+        try:
+            self.generator_cache.remove(header_hash)
+        except KeyError:
+            pass
 
     async def get_full_block(self, header_hash: bytes32) -> Optional[FullBlock]:
         cached: Optional[FullBlock] = self.block_cache.get(header_hash)
@@ -223,6 +256,16 @@ class BlockStore:
 
         return None
 
+    async def get_full_block_view(self, header_hash: bytes32) -> Optional[FullBlockView]:
+        """
+        Like get_full_block(), but without parsing the block. Use this when
+        only some of the fields of the block are needed.
+        """
+        block_bytes = await self.get_full_block_bytes(header_hash)
+        if block_bytes is None:
+            return None
+        return FullBlockView(block_bytes)
+
     async def get_full_blocks_at(self, heights: list[uint32]) -> list[FullBlock]:
         """
         Returns all blocks at the given heights, including orphans.
@@ -269,22 +312,27 @@ class BlockStore:
         if cached is not None:
             return None if cached.transactions_generator is None else bytes(cached.transactions_generator)
 
-        formatted_str = "SELECT block, height from full_blocks WHERE header_hash=?"
+        generator = self.generator_cache.get(header_hash)
+        if generator is not None:
+            return generator
+
         async with self.db_wrapper.reader_no_transaction() as conn:
-            row = await execute_fetchone(conn, formatted_str, (header_hash,))
-            if row is None:
-                return None
-            block_bytes = zstd.decompress(row[0])
+            row = await execute_fetchone(
+                conn, "SELECT generator FROM block_generators WHERE header_hash=?", (header_hash,)
+            )
+            if row is not None:
+                generator = zstd.decompress(row[0])
+            else:
+                row = await execute_fetchone(
+                    conn, "SELECT block, height from full_blocks WHERE header_hash=?", (header_hash,)
+                )
+                if row is None:
+                    return None
+                generator = self._generator_from_block_blob(row[0], row[1])
 
-            try:
-                return generator_from_block(block_bytes)
-            except Exception as e:  # pragma: no cover
-                log.error(f"cheap parser failed for block at height {row[1]}: {e}")
-                # this is defensive, on the off-chance that
-                # generator_from_block() fails, fall back to the reliable
-                # definition of parsing a block
-                b = FullBlock.from_bytes(block_bytes)
-                return None if b.transactions_generator is None else bytes(b.transactions_generator)
+        if generator is not None:
+            self.generator_cache.put(header_hash, generator)
+        return generator
 
     async def get_generators_at(self, heights: set[uint32]) -> dict[uint32, bytes]:
         if len(heights) == 0:
@@ -292,31 +340,69 @@ class BlockStore:
 
         generators: dict[uint32, bytes] = {}
         formatted_str = (
-            f"SELECT block, height from full_blocks WHERE in_main_chain=1 AND height in ({'?,' * (len(heights) - 1)}?)"
+            "SELECT height, header_hash from full_blocks "
+            f"WHERE in_main_chain=1 AND height in ({'?,' * (len(heights) - 1)}?)"
         )
         async with self.db_wrapper.reader_no_transaction() as conn:
+            # resolve the heights to header hashes first, this only touches
+            # the main_chain index
+            missing: dict[bytes32, uint32] = {}
             async with conn.execute(formatted_str, list(heights)) as cursor:
                 async for row in cursor:
-                    block_bytes = zstd.decompress(row[0])
-
-                    try:
-                        gen = generator_from_block(block_bytes)
-                    except Exception as e:  # pragma: no cover
-                        log.error(f"cheap parser failed for block at height {row[1]}: {e}")
-                        # this is defensive, on the off-chance that
-                        # generator_from_block() fails, fall back to the reliable
-                        # definition of parsing a block
-                        b = FullBlock.from_bytes(block_bytes)
-                        gen = None if b.transactions_generator is None else bytes(b.transactions_generator)
+                    height = uint32(row[0])
+                    header_hash = bytes32(row[1])
+                    gen = self.generator_cache.get(header_hash)
                     if gen is None:
-                        raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
-                    generators[uint32(row[1])] = gen
+                        missing[header_hash] = height
+                    else:
+                        generators[height] = gen
+
+            if len(missing) > 0:
+                formatted_str = (
+                    "SELECT header_hash, generator from block_generators "
+                    f"WHERE header_hash in ({'?,' * (len(missing) - 1)}?)"
+                )
+                async with conn.execute(formatted_str, list(missing)) as cursor:
+                    async for row in cursor:
+                        header_hash = bytes32(row[0])
+                        gen = zstd.decompress(row[1])
+                        generators[missing.pop(header_hash)] = gen
+                        self.generator_cache.put(header_hash, gen)
+
+            if len(missing) > 0:
+                # these blocks were added before the block_generators table
+                # existed (or don't have a generator at all)
+                formatted_str = (
+                    f"SELECT header_hash, block from full_blocks WHERE header_hash in ({'?,' * (len(missing) - 1)}?)"
+                )
+                async with conn.execute(formatted_str, list(missing)) as cursor:
+                    async for row in cursor:
+                        header_hash = bytes32(row[0])
+                        height = missing[header_hash]
+                        gen = self._generator_from_block_blob(row[1], height)
+                        if gen is None:
+                            raise ValueError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
+                        generators[height] = gen
+                        self.generator_cache.put(header_hash, gen)
 
         if len(generators) != len(heights):
             raise KeyError(Err.GENERATOR_REF_HAS_NO_GENERATOR)
 
         return generators
 
+    @staticmethod
+    def _generator_from_block_blob(block_blob: bytes, height: int) -> Optional[bytes]:
+        block_bytes = zstd.decompress(block_blob)
+        try:
+            return generator_from_block(block_bytes)
+        except Exception as e:  # pragma: no cover
+            log.error(f"cheap parser failed for block at height {height}: {e}")
+            # this is defensive, on the off-chance that
+            # generator_from_block() fails, fall back to the reliable
+            # definition of parsing a block
+            b = FullBlock.from_bytes(block_bytes)
+            return None if b.transactions_generator is None else bytes(b.transactions_generator)
+
     async def get_block_records_by_hash(self, header_hashes: list[bytes32]) -> list[BlockRecord]:
         """
         Returns a list of Block Records, ordered by the same order in which header_hashes are passed in.
@@ -534,17 +620,21 @@ class BlockStore:
             return None
         return bool(row[0])
 
-    async def get_random_not_compactified(self, number: int) -> list[int]:
+    async def get_not_compactified(self, after: int, number: int) -> list[tuple[int, int]]:
+        """
+        Returns (rowid, height) for up to number main chain blocks that are not fully compactified,
+        ordered by rowid and starting after the given rowid. This walks the is_fully_compactified index,
+        so it only reads the rows it returns. Pass in the last rowid returned to continue the scan.
+        """
         async with self.db_wrapper.reader_no_transaction() as conn:
             async with conn.execute(
-                f"SELECT height FROM full_blocks WHERE in_main_chain=1 AND is_fully_compactified=0 "
-                f"ORDER BY RANDOM() LIMIT {number}"
+                "SELECT rowid, height FROM full_blocks WHERE is_fully_compactified=0 AND in_main_chain=1 "
+                "AND rowid>? ORDER BY rowid LIMIT ?",
+                (after, number),
             ) as cursor:
                 rows = await cursor.fetchall()
 
-        heights = [int(row[0]) for row in rows]
-
-        return heights
+        return [(int(row[0]), int(row[1])) for row in rows]
 
     async def count_compactified_blocks(self) -> int:
         # DB V2 has an index on is_fully_compactified only for blocks in the main chain
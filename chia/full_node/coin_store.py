@@ -4,8 +4,8 @@ import dataclasses
 import logging
 import sqlite3
 import time
-from collections.abc import Collection
-from typing import Any, ClassVar, Optional
+from collections.abc import Collection, Iterable
+from typing import ClassVar, Optional
 
 import typing_extensions
 from aiosqlite import Cursor
@@ -17,11 +17,31 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.coin_record import CoinRecord
 from chia.types.mempool_item import UnspentLineageInfo
 from chia.util.batches import to_batches
-from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2, execute_key_set_query
 
 log = logging.getLogger(__name__)
 
 
+# The rows passed to these decoders are expected to hold the columns:
+# confirmed_index, spent_index, coinbase, puzzle_hash, coin_parent, amount, timestamp
+
+
+def coin_record_from_row(row: sqlite3.Row) -> CoinRecord:
+    coin = Coin(bytes32(row[4]), bytes32(row[3]), uint64.from_bytes(row[5]))
+    return CoinRecord(coin, uint32(row[0]), uint32(row[1]), bool(row[2]), uint64(row[6]))
+
+
+def rows_to_coin_records(rows: Iterable[sqlite3.Row]) -> list[CoinRecord]:
+    return [coin_record_from_row(row) for row in rows]
+
+
+def rows_to_coin_states(rows: Iterable[sqlite3.Row]) -> list[CoinState]:
+    return [
+        CoinState(Coin(bytes32(row[4]), bytes32(row[3]), uint64.from_bytes(row[5])), row[1] or None, row[0])
+        for row in rows
+    ]
+
+
 @typing_extensions.final
 @dataclasses.dataclass
 class CoinStore:
@@ -69,7 +89,7 @@ class CoinStore:
         return self
 
     async def num_unspent(self) -> int:
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.num_unspent") as conn:
             async with conn.execute("SELECT COUNT(*) FROM coin_record WHERE spent_index=0") as cursor:
                 row = await cursor.fetchone()
         if row is not None:
@@ -131,7 +151,7 @@ class CoinStore:
 
     # Checks DB and DiffStores for CoinRecord with coin_name and returns it
     async def get_coin_record(self, coin_name: bytes32) -> Optional[CoinRecord]:
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_coin_record") as conn:
             async with conn.execute(
                 "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
                 "coin_parent, amount, timestamp FROM coin_record WHERE coin_name=?",
@@ -139,85 +159,55 @@ class CoinStore:
             ) as cursor:
                 row = await cursor.fetchone()
                 if row is not None:
-                    coin = self.row_to_coin(row)
-                    return CoinRecord(coin, row[0], row[1], row[2], row[6])
+                    return coin_record_from_row(row)
         return None
 
     async def get_coin_records(self, names: Collection[bytes32]) -> list[CoinRecord]:
         if len(names) == 0:
             return []
 
-        coins: list[CoinRecord] = []
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            cursors: list[Cursor] = []
-            for batch in to_batches(names, SQLITE_MAX_VARIABLE_NUMBER):
-                names_db: tuple[Any, ...] = tuple(batch.entries)
-                cursors.append(
-                    await conn.execute(
-                        f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
-                        f"coin_parent, amount, timestamp FROM coin_record "
-                        f"WHERE coin_name in ({','.join(['?'] * len(names_db))}) ",
-                        names_db,
-                    )
-                )
-
-            for cursor in cursors:
-                for row in await cursor.fetchall():
-                    coin = self.row_to_coin(row)
-                    record = CoinRecord(coin, row[0], row[1], row[2], row[6])
-                    coins.append(record)
-
-        return coins
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_coin_records") as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
+                "coin_parent, amount, timestamp FROM coin_record "
+                "WHERE coin_name in ({in_list}) ",
+                names,
+            )
+        return rows_to_coin_records(rows)
 
     async def get_coins_added_at_height(self, height: uint32) -> list[CoinRecord]:
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_coins_added_at_height") as conn:
             async with conn.execute(
                 "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
                 "coin_parent, amount, timestamp FROM coin_record WHERE confirmed_index=?",
                 (height,),
             ) as cursor:
-                rows = await cursor.fetchall()
-                coins = []
-                for row in rows:
-                    coin = self.row_to_coin(row)
-                    coins.append(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-                return coins
+                return rows_to_coin_records(await cursor.fetchall())
 
     async def get_coins_removed_at_height(self, height: uint32) -> list[CoinRecord]:
         # Special case to avoid querying all unspent coins (spent_index=0)
         if height == 0:
             return []
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_coins_removed_at_height") as conn:
             async with conn.execute(
                 "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
                 "coin_parent, amount, timestamp FROM coin_record WHERE spent_index=?",
                 (height,),
             ) as cursor:
-                coins = []
-                for row in await cursor.fetchall():
-                    if row[1] != 0:
-                        coin = self.row_to_coin(row)
-                        coin_record = CoinRecord(coin, row[0], row[1], row[2], row[6])
-                        coins.append(coin_record)
-                return coins
+                return rows_to_coin_records(row for row in await cursor.fetchall() if row[1] != 0)
 
     async def get_all_coins(self, include_spent_coins: bool) -> list[CoinRecord]:
         # WARNING: this should only be used for testing or in a simulation,
         # running it on a synced testnet or mainnet node will most likely result in an OOM error.
-        coins = set()
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_all_coins", long_query=True) as conn:
             async with conn.execute(
                 f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
                 f"coin_parent, amount, timestamp FROM coin_record "
                 f"{'' if include_spent_coins else 'INDEXED BY coin_spent_index WHERE spent_index=0'}"
                 f" ORDER BY confirmed_index"
             ) as cursor:
-                for row in await cursor.fetchall():
-                    coin = self.row_to_coin(row)
-                    coins.add(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-                return list(coins)
+                return list(set(rows_to_coin_records(await cursor.fetchall())))
 
     # Checks DB and DiffStores for CoinRecords with puzzle_hash and returns them
     async def get_coin_records_by_puzzle_hash(
@@ -227,9 +217,9 @@ class CoinStore:
         start_height: uint32 = uint32(0),
         end_height: uint32 = uint32((2**32) - 1),
     ) -> list[CoinRecord]:
-        coins = set()
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_coin_records_by_puzzle_hash", long_query=True
+        ) as conn:
             async with conn.execute(
                 f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
                 f"coin_parent, amount, timestamp FROM coin_record INDEXED BY coin_puzzle_hash WHERE puzzle_hash=? "
@@ -237,10 +227,7 @@ class CoinStore:
                 f"{'' if include_spent_coins else 'AND spent_index=0'}",
                 (puzzle_hash, start_height, end_height),
             ) as cursor:
-                for row in await cursor.fetchall():
-                    coin = self.row_to_coin(row)
-                    coins.add(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-                return list(coins)
+                return list(set(rows_to_coin_records(await cursor.fetchall())))
 
     async def get_coin_records_by_puzzle_hashes(
         self,
@@ -252,23 +239,20 @@ class CoinStore:
         if len(puzzle_hashes) == 0:
             return []
 
-        coins = set()
-        puzzle_hashes_db: tuple[Any, ...]
-        puzzle_hashes_db = tuple(puzzle_hashes)
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            async with conn.execute(
-                f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
-                f"coin_parent, amount, timestamp FROM coin_record INDEXED BY coin_puzzle_hash "
-                f"WHERE puzzle_hash in ({'?,' * (len(puzzle_hashes) - 1)}?) "
-                f"AND confirmed_index>=? AND confirmed_index<? "
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_coin_records_by_puzzle_hashes", long_query=True
+        ) as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
+                "coin_parent, amount, timestamp FROM coin_record INDEXED BY coin_puzzle_hash "
+                "WHERE puzzle_hash in ({in_list}) "
+                "AND confirmed_index>=? AND confirmed_index<? "
                 f"{'' if include_spent_coins else 'AND spent_index=0'}",
-                (*puzzle_hashes_db, start_height, end_height),
-            ) as cursor:
-                for row in await cursor.fetchall():
-                    coin = self.row_to_coin(row)
-                    coins.add(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-                return list(coins)
+                puzzle_hashes,
+                (start_height, end_height),
+            )
+        return list(set(rows_to_coin_records(rows)))
 
     async def get_coin_records_by_names(
         self,
@@ -280,33 +264,22 @@ class CoinStore:
         if len(names) == 0:
             return []
 
-        coins = set()
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            async with conn.execute(
-                f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
-                f"coin_parent, amount, timestamp FROM coin_record INDEXED BY sqlite_autoindex_coin_record_1 "
-                f"WHERE coin_name in ({'?,' * (len(names) - 1)}?) "
-                f"AND confirmed_index>=? AND confirmed_index<? "
+        async with self.db_wrapper.reader_no_transaction(call_site="CoinStore.get_coin_records_by_names") as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
+                "coin_parent, amount, timestamp FROM coin_record INDEXED BY sqlite_autoindex_coin_record_1 "
+                "WHERE coin_name in ({in_list}) "
+                "AND confirmed_index>=? AND confirmed_index<? "
                 f"{'' if include_spent_coins else 'AND spent_index=0'}",
-                [*names, start_height, end_height],
-            ) as cursor:
-                for row in await cursor.fetchall():
-                    coin = self.row_to_coin(row)
-                    coins.add(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-
-        return list(coins)
+                names,
+                (start_height, end_height),
+            )
+        return list(set(rows_to_coin_records(rows)))
 
     def row_to_coin(self, row: sqlite3.Row) -> Coin:
         return Coin(bytes32(row[4]), bytes32(row[3]), uint64.from_bytes(row[5]))
 
-    def row_to_coin_state(self, row: sqlite3.Row) -> CoinState:
-        coin = self.row_to_coin(row)
-        spent_h = None
-        if row[1] != 0:
-            spent_h = row[1]
-        return CoinState(coin, spent_h, row[0])
-
     async def get_coin_states_by_puzzle_hashes(
         self,
         include_spent_coins: bool,
@@ -318,27 +291,22 @@ class CoinStore:
         if len(puzzle_hashes) == 0:
             return set()
 
-        coins: set[CoinState] = set()
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            for batch in to_batches(puzzle_hashes, SQLITE_MAX_VARIABLE_NUMBER):
-                puzzle_hashes_db: tuple[Any, ...] = tuple(batch.entries)
-                async with conn.execute(
-                    f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
-                    f"coin_parent, amount, timestamp FROM coin_record INDEXED BY coin_puzzle_hash "
-                    f"WHERE puzzle_hash in ({'?,' * (len(batch.entries) - 1)}?) "
-                    f"AND (confirmed_index>=? OR spent_index>=?)"
-                    f"{'' if include_spent_coins else 'AND spent_index=0'}"
-                    " LIMIT ?",
-                    (*puzzle_hashes_db, min_height, min_height, max_items - len(coins)),
-                ) as cursor:
-                    row: sqlite3.Row
-                    for row in await cursor.fetchall():
-                        coins.add(self.row_to_coin_state(row))
-
-                if len(coins) >= max_items:
-                    break
-
-        return coins
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_coin_states_by_puzzle_hashes", long_query=True
+        ) as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, "
+                "coin_parent, amount, timestamp FROM coin_record INDEXED BY coin_puzzle_hash "
+                "WHERE puzzle_hash in ({in_list}) "
+                "AND (confirmed_index>=? OR spent_index>=?)"
+                f"{'' if include_spent_coins else 'AND spent_index=0'}"
+                " LIMIT ?",
+                puzzle_hashes,
+                (min_height, min_height),
+                limit=max_items,
+            )
+        return set(rows_to_coin_states(rows))
 
     async def get_coin_records_by_parent_ids(
         self,
@@ -350,22 +318,19 @@ class CoinStore:
         if len(parent_ids) == 0:
             return []
 
-        coins = set()
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            for batch in to_batches(parent_ids, SQLITE_MAX_VARIABLE_NUMBER):
-                parent_ids_db: tuple[Any, ...] = tuple(batch.entries)
-                async with conn.execute(
-                    f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, coin_parent, amount, timestamp "
-                    f"FROM coin_record WHERE coin_parent in ({'?,' * (len(batch.entries) - 1)}?) "
-                    f"AND confirmed_index>=? AND confirmed_index<? "
-                    f"{'' if include_spent_coins else 'AND spent_index=0'}",
-                    (*parent_ids_db, start_height, end_height),
-                ) as cursor:
-                    async for row in cursor:
-                        coin = self.row_to_coin(row)
-                        coins.add(CoinRecord(coin, row[0], row[1], row[2], row[6]))
-
-        return list(coins)
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_coin_records_by_parent_ids", long_query=True
+        ) as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, coin_parent, amount, timestamp "
+                "FROM coin_record WHERE coin_parent in ({in_list}) "
+                "AND confirmed_index>=? AND confirmed_index<? "
+                f"{'' if include_spent_coins else 'AND spent_index=0'}",
+                parent_ids,
+                (start_height, end_height),
+            )
+        return list(set(rows_to_coin_records(rows)))
 
     async def get_coin_states_by_ids(
         self,
@@ -379,29 +344,25 @@ class CoinStore:
         if len(coin_ids) == 0:
             return []
 
-        coins: list[CoinState] = []
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            for batch in to_batches(coin_ids, SQLITE_MAX_VARIABLE_NUMBER):
-                coin_ids_db: tuple[Any, ...] = tuple(batch.entries)
-
-                max_height_sql = ""
-                if max_height != uint32.MAXIMUM:
-                    max_height_sql = f"AND confirmed_index<={max_height} AND spent_index<={max_height}"
-
-                async with conn.execute(
-                    f"SELECT confirmed_index, spent_index, coinbase, puzzle_hash, coin_parent, amount, timestamp "
-                    f"FROM coin_record WHERE coin_name in ({'?,' * (len(batch.entries) - 1)}?) "
-                    f"AND (confirmed_index>=? OR spent_index>=?) {max_height_sql}"
-                    f"{'' if include_spent_coins else 'AND spent_index=0'}"
-                    " LIMIT ?",
-                    (*coin_ids_db, min_height, min_height, max_items - len(coins)),
-                ) as cursor:
-                    for row in await cursor.fetchall():
-                        coins.append(self.row_to_coin_state(row))
-                if len(coins) >= max_items:
-                    break
-
-        return coins
+        max_height_sql = ""
+        if max_height != uint32.MAXIMUM:
+            max_height_sql = f"AND confirmed_index<={max_height} AND spent_index<={max_height}"
+
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_coin_states_by_ids", long_query=True
+        ) as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT confirmed_index, spent_index, coinbase, puzzle_hash, coin_parent, amount, timestamp "
+                "FROM coin_record WHERE coin_name in ({in_list}) "
+                f"AND (confirmed_index>=? OR spent_index>=?) {max_height_sql}"
+                f"{'' if include_spent_coins else 'AND spent_index=0'}"
+                " LIMIT ?",
+                coin_ids,
+                (min_height, min_height),
+                limit=max_items,
+            )
+        return rows_to_coin_states(rows)
 
     MAX_PUZZLE_HASH_BATCH_SIZE: ClassVar[int] = SQLITE_MAX_VARIABLE_NUMBER - 10
 
@@ -432,7 +393,9 @@ class CoinStore:
         coin_states_dict: dict[bytes32, CoinState] = dict()
         coin_states: list[CoinState]
 
-        async with self.db_wrapper.reader() as conn:
+        async with self.db_wrapper.reader(
+            call_site="CoinStore.batch_coin_states_by_puzzle_hashes", long_query=True
+        ) as conn:
             puzzle_hashes_db = tuple(puzzle_hashes)
             puzzle_hash_count = len(puzzle_hashes_db)
 
@@ -466,8 +429,7 @@ class CoinStore:
                 ),
             )
 
-            for row in await cursor.fetchall():
-                coin_state = self.row_to_coin_state(row)
+            for coin_state in rows_to_coin_states(await cursor.fetchall()):
                 coin_states_dict[coin_state.coin.name()] = coin_state
 
             if include_hinted:
@@ -488,8 +450,7 @@ class CoinStore:
                     ),
                 )
 
-                for row in await cursor.fetchall():
-                    coin_state = self.row_to_coin_state(row)
+                for coin_state in rows_to_coin_states(await cursor.fetchall()):
                     coin_states_dict[coin_state.coin.name()] = coin_state
 
             coin_states = list(coin_states_dict.values())
@@ -608,7 +569,9 @@ class CoinStore:
 
     # Lookup the most recent unspent lineage that matches a puzzle hash
     async def get_unspent_lineage_info_for_puzzle_hash(self, puzzle_hash: bytes32) -> Optional[UnspentLineageInfo]:
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="CoinStore.get_unspent_lineage_info_for_puzzle_hash"
+        ) as conn:
             async with conn.execute(
                 "SELECT unspent.coin_name, "
                 "unspent.coin_parent, "
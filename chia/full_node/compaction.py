@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import time
+import traceback
+from typing import Optional
+
+from chia_rs import FullBlock
+from chia_rs.sized_bytes import bytes32
+
+from chia.full_node.block_store import BlockStore
+from chia.full_node.tx_processing_queue import ValuedEvent
+from chia.types.blockchain_format.vdf import CompressibleVDFField, VDFInfo, VDFProof
+from chia.util.db_wrapper import DBWrapper2
+from chia.util.task_referencer import create_referenced_task
+
+
+def replace_vdf_proof(
+    block: FullBlock, vdf_info: VDFInfo, vdf_proof: VDFProof, field_vdf: CompressibleVDFField
+) -> Optional[FullBlock]:
+    """
+    Returns a copy of block with the proof for vdf_info (in the field indicated by field_vdf) replaced by
+    vdf_proof, or None if the block doesn't have such a VDF.
+    """
+    if field_vdf == CompressibleVDFField.CC_EOS_VDF:
+        for index, sub_slot in enumerate(block.finished_sub_slots):
+            if sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf == vdf_info:
+                new_proofs = sub_slot.proofs.replace(challenge_chain_slot_proof=vdf_proof)
+                new_subslot = sub_slot.replace(proofs=new_proofs)
+                new_finished_subslots = block.finished_sub_slots
+                new_finished_subslots[index] = new_subslot
+                return block.replace(finished_sub_slots=new_finished_subslots)
+    if field_vdf == CompressibleVDFField.ICC_EOS_VDF:
+        for index, sub_slot in enumerate(block.finished_sub_slots):
+            if (
+                sub_slot.infused_challenge_chain is not None
+                and sub_slot.infused_challenge_chain.infused_challenge_chain_end_of_slot_vdf == vdf_info
+            ):
+                new_proofs = sub_slot.proofs.replace(infused_challenge_chain_slot_proof=vdf_proof)
+                new_subslot = sub_slot.replace(proofs=new_proofs)
+                new_finished_subslots = block.finished_sub_slots
+                new_finished_subslots[index] = new_subslot
+                return block.replace(finished_sub_slots=new_finished_subslots)
+    if field_vdf == CompressibleVDFField.CC_SP_VDF:
+        if block.reward_chain_block.challenge_chain_sp_vdf == vdf_info:
+            assert block.challenge_chain_sp_proof is not None
+            return block.replace(challenge_chain_sp_proof=vdf_proof)
+    if field_vdf == CompressibleVDFField.CC_IP_VDF:
+        if block.reward_chain_block.challenge_chain_ip_vdf == vdf_info:
+            return block.replace(challenge_chain_ip_proof=vdf_proof)
+    return None
+
+
+@dataclasses.dataclass(frozen=True)
+class PendingProof:
+    header_hash: bytes32
+    vdf_info: VDFInfo
+    vdf_proof: VDFProof
+    field_vdf: CompressibleVDFField
+    done: ValuedEvent[bool] = dataclasses.field(default_factory=ValuedEvent, compare=False)
+
+
+@dataclasses.dataclass
+class CompactionService:
+    """
+    Keeps track of the main chain blocks that still have uncompact proofs of time, and writes the compact
+    proofs we receive for them (from blueboxes or peers) back to the database.
+
+    Uncompact blocks are found by walking the is_fully_compactified index in insertion order, picking up
+    where the previous scan left off, so each scan only touches the rows it returns. Once the end of the
+    index is reached, the scan starts over from the oldest block.
+
+    Proofs are queued and written in batches, each batch in a single writer transaction. All proofs for
+    the same block in a batch result in a single update of its row. Consecutive batches are at least
+    min_write_interval seconds apart, to leave the database to block validation when a bluebox is busy.
+    """
+
+    block_store: BlockStore
+    db_wrapper: DBWrapper2
+    log: logging.Logger
+    batch_size: int = 100
+    min_write_interval: float = 0.5
+    _scan_cursor: int = 0
+    _pending: list[PendingProof] = dataclasses.field(default_factory=list)
+    _writer: Optional[asyncio.Task[None]] = None
+    _last_write: float = 0.0
+
+    async def get_uncompact_heights(self, number: int) -> list[int]:
+        """
+        Returns the heights of up to number main chain blocks that are not fully compactified, continuing
+        from where the previous call left off.
+        """
+        rows = await self.block_store.get_not_compactified(self._scan_cursor, number)
+        if len(rows) < number and self._scan_cursor > 0:
+            # wrap around, and pick up the oldest blocks we haven't returned in this call
+            first = {height for _, height in rows}
+            more = await self.block_store.get_not_compactified(0, number - len(rows))
+            rows.extend(row for row in more if row[1] not in first)
+        if len(rows) > 0:
+            self._scan_cursor = rows[-1][0]
+        return [height for _, height in rows]
+
+    async def replace_proof(
+        self, header_hash: bytes32, vdf_info: VDFInfo, vdf_proof: VDFProof, field_vdf: CompressibleVDFField
+    ) -> bool:
+        """
+        Queues vdf_proof to replace the proof of vdf_info in the block with header_hash, and waits for the
+        batch it's part of to be written. Returns True if the proof was replaced, and False otherwise.
+        """
+        entry = PendingProof(header_hash, vdf_info, vdf_proof, field_vdf)
+        self._pending.append(entry)
+        if self._writer is None:
+            self._writer = create_referenced_task(self._write_batches())
+        return await entry.done.wait()
+
+    async def _write_batches(self) -> None:
+        try:
+            while len(self._pending) > 0:
+                delay = self._last_write + self.min_write_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                batch = self._pending[: self.batch_size]
+                del self._pending[: self.batch_size]
+                try:
+                    await self._write_batch(batch)
+                except Exception as e:
+                    self.log.error(f"error writing {len(batch)} compact proofs: {e} {traceback.format_exc()}")
+                    for entry in batch:
+                        entry.done.set(False)
+                self._last_write = time.monotonic()
+        finally:
+            self._writer = None
+
+    async def _write_batch(self, batch: list[PendingProof]) -> None:
+        by_block: dict[bytes32, list[PendingProof]] = {}
+        for entry in batch:
+            by_block.setdefault(entry.header_hash, []).append(entry)
+
+        new_blocks: list[FullBlock] = []
+        results: list[tuple[PendingProof, bool]] = []
+        for header_hash, entries in by_block.items():
+            block = await self.block_store.get_full_block(header_hash)
+            replaced_any = False
+            for entry in entries:
+                new_block = None
+                if block is not None:
+                    new_block = replace_vdf_proof(block, entry.vdf_info, entry.vdf_proof, entry.field_vdf)
+                if new_block is not None:
+                    block = new_block
+                    replaced_any = True
+                results.append((entry, new_block is not None))
+            if replaced_any:
+                assert block is not None
+                new_blocks.append(block)
+
+        if len(new_blocks) > 0:
+            async with self.db_wrapper.writer():
+                await self.block_store.replace_proofs(new_blocks)
+            self.log.info(f"Wrote {len(batch)} compact proofs to {len(new_blocks)} blocks")
+
+        for entry, replaced in results:
+            entry.done.set(replaced)
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Callable, Optional
-
-from chia_rs import G1Element, G2Element, TransactionsInfo, serialized_length
+from functools import partial
+from hashlib import sha256
+from typing import Callable, Optional, Union
+
+from chia_rs import (
+    Foliage,
+    FoliageTransactionBlock,
+    FullBlock,
+    G1Element,
+    G2Element,
+    RewardChainBlock,
+    TransactionsInfo,
+    serialized_length,
+)
 from chia_rs.sized_bytes import bytes32
-from chia_rs.sized_ints import uint32
+from chia_rs.sized_ints import uint32, uint128
 from chiabip158 import PyBIP158
 
 from chia.types.blockchain_format.coin import Coin
@@ -203,25 +214,8 @@ def skip_transactions_info(buf: memoryview) -> memoryview:
     return skip_list(buf, skip_coin)
 
 
-def generator_from_block(buf: memoryview) -> Optional[bytes]:
-    buf = skip_list(buf, skip_end_of_sub_slot_bundle)  # finished_sub_slots
-    buf = skip_reward_chain_block(buf)  # reward_chain_block
-    buf = skip_optional(buf, skip_vdf_proof)  # challenge_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # challenge_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # reward_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # reward_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # infused_challenge_chain_ip_proof
-    buf = skip_foliage(buf)  # foliage
-    buf = skip_optional(buf, skip_foliage_transaction_block)  # foliage_transaction_block
-    buf = skip_optional(buf, skip_transactions_info)  # transactions_info
-
-    # this is the transactions_generator optional
-    if buf[0] == 0:
-        return None
-
-    buf = buf[1:]
-    length = serialized_length(buf)
-    return bytes(buf[:length])
+def skip_program(buf: memoryview) -> memoryview:
+    return buf[serialized_length(buf) :]
 
 
 # this implements the BlockInfo protocol
@@ -232,92 +226,186 @@ class GeneratorBlockInfo:
     transactions_generator_ref_list: list[uint32]
 
 
-def block_info_from_block(buf: memoryview) -> GeneratorBlockInfo:
-    buf = skip_list(buf, skip_end_of_sub_slot_bundle)  # finished_sub_slots
-    buf = skip_reward_chain_block(buf)  # reward_chain_block
-    buf = skip_optional(buf, skip_vdf_proof)  # challenge_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # challenge_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # reward_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # reward_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # infused_challenge_chain_ip_proof
-    buf, prev_hash = prev_hash_from_foliage(buf)  # foliage
-    buf = skip_optional(buf, skip_foliage_transaction_block)  # foliage_transaction_block
-    buf = skip_optional(buf, skip_transactions_info)  # transactions_info
-
-    # this is the transactions_generator optional
-    generator = None
-    if buf[0] != 0:
-        buf = buf[1:]
-        length = serialized_length(buf)
-        generator = SerializedProgram.from_bytes(bytes(buf[:length]))
-        buf = buf[length:]
-    else:
-        buf = buf[1:]
-
-    refs_length = uint32.from_bytes(buf[:4])
-    buf = buf[4:]
+# the functions to skip each field of a FullBlock, in order
+FULL_BLOCK_FIELDS: list[Callable[[memoryview], memoryview]] = [
+    partial(skip_list, skip_item=skip_end_of_sub_slot_bundle),  # finished_sub_slots
+    skip_reward_chain_block,  # reward_chain_block
+    partial(skip_optional, skip_item=skip_vdf_proof),  # challenge_chain_sp_proof
+    skip_vdf_proof,  # challenge_chain_ip_proof
+    partial(skip_optional, skip_item=skip_vdf_proof),  # reward_chain_sp_proof
+    skip_vdf_proof,  # reward_chain_ip_proof
+    partial(skip_optional, skip_item=skip_vdf_proof),  # infused_challenge_chain_ip_proof
+    skip_foliage,  # foliage
+    partial(skip_optional, skip_item=skip_foliage_transaction_block),  # foliage_transaction_block
+    partial(skip_optional, skip_item=skip_transactions_info),  # transactions_info
+    partial(skip_optional, skip_item=skip_program),  # transactions_generator
+    partial(skip_list, skip_item=skip_uint32),  # transactions_generator_ref_list
+]
+
+REWARD_CHAIN_BLOCK = 1
+FOLIAGE = 7
+FOLIAGE_TRANSACTION_BLOCK = 8
+TRANSACTIONS_INFO = 9
+TRANSACTIONS_GENERATOR = 10
+TRANSACTIONS_GENERATOR_REF_LIST = 11
+
+
+class FullBlockView:
+    """
+    Read-only access to the fields of a serialized FullBlock, without parsing
+    the whole block. Fields are located (by skipping over the ones before
+    them) the first time they're accessed, and only the requested field is
+    parsed.
+    """
 
-    refs = []
-    for i in range(refs_length):
-        refs.append(uint32.from_bytes(buf[:4]))
-        buf = buf[4:]
+    def __init__(self, buf: Union[bytes, memoryview]) -> None:
+        self._buf = memoryview(buf)
+        # the offsets of the fields we've located so far. The field at index i
+        # spans _offsets[i] to _offsets[i + 1]
+        self._offsets = [0]
+
+    def _field(self, index: int) -> memoryview:
+        offsets = self._offsets
+        while len(offsets) <= index + 1:
+            remaining = FULL_BLOCK_FIELDS[len(offsets) - 1](self._buf[offsets[-1] :])
+            offsets.append(len(self._buf) - len(remaining))
+        return self._buf[offsets[index] : offsets[index + 1]]
+
+    @staticmethod
+    def _optional(buf: memoryview) -> Optional[memoryview]:
+        if buf[0] == 0:
+            return None
+        return buf[1:]
+
+    @property
+    def weight(self) -> uint128:
+        return uint128(int.from_bytes(self._field(REWARD_CHAIN_BLOCK)[:16], "big"))
+
+    @property
+    def height(self) -> uint32:
+        return uint32(int.from_bytes(self._field(REWARD_CHAIN_BLOCK)[16:20], "big"))
+
+    @property
+    def total_iters(self) -> uint128:
+        return uint128(int.from_bytes(self._field(REWARD_CHAIN_BLOCK)[20:36], "big"))
+
+    @property
+    def reward_chain_block(self) -> RewardChainBlock:
+        return RewardChainBlock.parse_rust(self._field(REWARD_CHAIN_BLOCK))[0]
+
+    @property
+    def foliage(self) -> Foliage:
+        return Foliage.parse_rust(self._field(FOLIAGE))[0]
+
+    @property
+    def header_hash(self) -> bytes32:
+        # the header hash is the hash of the foliage
+        return bytes32(sha256(self._field(FOLIAGE)).digest())
+
+    @property
+    def prev_header_hash(self) -> bytes32:
+        return bytes32(self._field(FOLIAGE)[:32])
+
+    def is_transaction_block(self) -> bool:
+        # a transaction block is one whose foliage has a
+        # foliage_transaction_block_hash
+        buf = self._field(FOLIAGE)[64:]  # prev_block_hash, reward_block_hash
+        buf = skip_foliage_block_data(buf)  # foliage_block_data
+        buf = skip_g2_element(buf)  # foliage_block_data_signature
+        return buf[0] != 0
+
+    @property
+    def foliage_transaction_block(self) -> Optional[FoliageTransactionBlock]:
+        buf = self._optional(self._field(FOLIAGE_TRANSACTION_BLOCK))
+        return None if buf is None else FoliageTransactionBlock.parse_rust(buf)[0]
+
+    @property
+    def transactions_info(self) -> Optional[TransactionsInfo]:
+        buf = self._optional(self._field(TRANSACTIONS_INFO))
+        return None if buf is None else TransactionsInfo.parse_rust(buf)[0]
+
+    @property
+    def transactions_generator_bytes(self) -> Optional[bytes]:
+        """
+        The serialized transactions generator, without parsing it into a
+        SerializedProgram
+        """
+        buf = self._optional(self._field(TRANSACTIONS_GENERATOR))
+        return None if buf is None else bytes(buf)
+
+    @property
+    def transactions_generator(self) -> Optional[SerializedProgram]:
+        generator = self.transactions_generator_bytes
+        return None if generator is None else SerializedProgram.from_bytes(generator)
+
+    @property
+    def transactions_generator_ref_list(self) -> list[uint32]:
+        buf = self._field(TRANSACTIONS_GENERATOR_REF_LIST)[4:]
+        return [uint32(int.from_bytes(buf[i : i + 4], "big")) for i in range(0, len(buf), 4)]
+
+    def block_info(self) -> GeneratorBlockInfo:
+        return GeneratorBlockInfo(
+            self.prev_header_hash, self.transactions_generator, self.transactions_generator_ref_list
+        )
+
+    def header_block(
+        self, request_filter: bool = True, tx_addition_coins: list[Coin] = [], removal_names: list[bytes32] = []
+    ) -> bytes:
+        """
+        Returns the serialized HeaderBlock of this block. If request_filter is
+        set, the transactions filter is computed from the addition and removal
+        coins (as well as the reward coins). Otherwise it's left empty and the
+        transactions info is omitted.
+        """
+        transactions_info: Optional[TransactionsInfo] = None
+        # we make it optional even if it's not by default
+        # if request_filter is True it will read extra bytes and populate it properly
+        transactions_info_optional: bytes = bytes([0])
+        encoded_filter = b"\x00"
+
+        if request_filter:
+            transactions_info = self.transactions_info
+            if transactions_info is not None:
+                transactions_info_optional = bytes([1])
+            byte_array_tx: list[bytearray] = []
+            if self.is_transaction_block() and transactions_info:
+                addition_coins = tx_addition_coins + list(transactions_info.reward_claims_incorporated)
+                for coin in addition_coins:
+                    byte_array_tx.append(bytearray(coin.puzzle_hash))
+                for name in removal_names:
+                    byte_array_tx.append(bytearray(name))
+
+            bip158: PyBIP158 = PyBIP158(byte_array_tx)
+            encoded_filter = bytes(bip158.GetEncoded())
+
+        # Takes everything up to but not including transactions info
+        self._field(FOLIAGE_TRANSACTION_BLOCK)
+        header_block: bytes = bytes(self._buf[: self._offsets[TRANSACTIONS_INFO]])
+        # Transactions filter, potentially with added / removal coins
+        header_block += (len(encoded_filter)).to_bytes(4, "big") + encoded_filter
+        # Add transactions info
+        header_block += transactions_info_optional
+        if transactions_info is not None:
+            header_block += bytes(transactions_info)
+
+        return header_block
+
+    def full_block(self) -> FullBlock:
+        return FullBlock.parse_rust(self._buf)[0]
 
-    return GeneratorBlockInfo(prev_hash, generator, refs)
+
+def generator_from_block(buf: memoryview) -> Optional[bytes]:
+    return FullBlockView(buf).transactions_generator_bytes
+
+
+def block_info_from_block(buf: memoryview) -> GeneratorBlockInfo:
+    return FullBlockView(buf).block_info()
 
 
 def header_block_from_block(
     buf: memoryview, request_filter: bool = True, tx_addition_coins: list[Coin] = [], removal_names: list[bytes32] = []
 ) -> bytes:
-    buf2 = buf[:]
-    buf2 = skip_list(buf2, skip_end_of_sub_slot_bundle)  # finished_sub_slots
-    buf2 = skip_reward_chain_block(buf2)  # reward_chain_block
-    buf2 = skip_optional(buf2, skip_vdf_proof)  # challenge_chain_sp_proof
-    buf2 = skip_vdf_proof(buf2)  # challenge_chain_ip_proof
-    buf2 = skip_optional(buf2, skip_vdf_proof)  # reward_chain_sp_proof
-    buf2 = skip_vdf_proof(buf2)  # reward_chain_ip_proof
-    buf2 = skip_optional(buf2, skip_vdf_proof)  # infused_challenge_chain_ip_proof
-    buf2 = skip_foliage(buf2)  # foliage
-    if buf2[0] == 0:
-        is_transaction_block = False
-    else:
-        is_transaction_block = True
-
-    buf2 = skip_optional(buf2, skip_foliage_transaction_block)  # foliage_transaction_block
-
-    transactions_info: Optional[TransactionsInfo] = None
-    # we make it optional even if it's not by default
-    # if request_filter is True it will read extra bytes and populate it properly
-    transactions_info_optional: bytes = bytes([0])
-    encoded_filter = b"\x00"
-
-    if request_filter:
-        # this is the transactions_info optional
-        if buf2[0] == 0:
-            transactions_info_optional = bytes([0])
-        else:
-            transactions_info_optional = bytes([1])
-            transactions_info, _advance = TransactionsInfo.parse_rust(buf2[1:])
-        byte_array_tx: list[bytearray] = []
-        if is_transaction_block and transactions_info:
-            addition_coins = tx_addition_coins + list(transactions_info.reward_claims_incorporated)
-            for coin in addition_coins:
-                byte_array_tx.append(bytearray(coin.puzzle_hash))
-            for name in removal_names:
-                byte_array_tx.append(bytearray(name))
-
-        bip158: PyBIP158 = PyBIP158(byte_array_tx)
-        encoded_filter = bytes(bip158.GetEncoded())
-
-    # Takes everything up to but not including transactions info
-    header_block: bytes = bytes(buf[: (len(buf) - len(buf2))])
-    # Transactions filter, potentially with added / removal coins
-    header_block += (len(encoded_filter)).to_bytes(4, "big") + encoded_filter
-    # Add transactions info
-    header_block += transactions_info_optional
-    if transactions_info is not None:
-        header_block += bytes(transactions_info)
-
-    return header_block
+    return FullBlockView(buf).header_block(request_filter, tx_addition_coins, removal_names)
 
 
 def get_height_and_tx_status_from_block(buf: memoryview) -> tuple[uint32, bool]:
@@ -325,20 +413,5 @@ def get_height_and_tx_status_from_block(buf: memoryview) -> tuple[uint32, bool]:
     Returns the height of the block and whether it's a transaction block or not.
     We're considering the block as a transaction block if transactions_info is not None.
     """
-    reward_chain_block_buf = skip_list(buf, skip_end_of_sub_slot_bundle)  # finished_sub_slots
-    # Get the block height from reward_chain_block_buf
-    height_buf = skip_uint128(reward_chain_block_buf)  # weight
-    height = uint32.from_bytes(height_buf[:4])
-    # Let's continue down to transactions_info
-    buf = skip_reward_chain_block(reward_chain_block_buf)  # reward_chain_block
-    buf = skip_optional(buf, skip_vdf_proof)  # challenge_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # challenge_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # reward_chain_sp_proof
-    buf = skip_vdf_proof(buf)  # reward_chain_ip_proof
-    buf = skip_optional(buf, skip_vdf_proof)  # infused_challenge_chain_ip_proof
-    buf = skip_foliage(buf)  # foliage
-    buf = skip_optional(buf, skip_foliage_transaction_block)  # foliage_transaction_block
-    # We're at the transactions_info optional.
-    # If it's not None, consider this a transaction block.
-    is_tx_block = buf[0] != 0
-    return height, is_tx_block
+    view = FullBlockView(buf)
+    return view.height, view._field(TRANSACTIONS_INFO)[0] != 0
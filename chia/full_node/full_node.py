@@ -19,7 +19,6 @@ from chia_rs import (
     AugSchemeMPL,
     BlockRecord,
     BLSCache,
-    CoinState,
     ConsensusConstants,
     EndOfSubSlotBundle,
     FullBlock,
@@ -45,11 +44,17 @@ from chia.consensus.condition_tools import pkm_pairs
 from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
 from chia.consensus.make_sub_epoch_summary import next_sub_epoch_summary
-from chia.consensus.multiprocess_validation import PreValidationResult, pre_validate_block
+from chia.consensus.multiprocess_validation import (
+    PoSpaceCheck,
+    PreValidationResult,
+    check_pospace_batch,
+    pre_validate_block,
+)
 from chia.consensus.pot_iterations import calculate_sp_iters
 from chia.full_node.block_store import BlockStore
 from chia.full_node.check_fork_next_block import check_fork_next_block
 from chia.full_node.coin_store import CoinStore
+from chia.full_node.compaction import CompactionService
 from chia.full_node.full_node_api import FullNodeAPI
 from chia.full_node.full_node_store import FullNodeStore, FullNodeStorePeakResult, UnfinishedBlockEntry
 from chia.full_node.hint_management import get_hints_and_subscription_coin_ids
@@ -57,7 +62,7 @@ from chia.full_node.hint_store import HintStore
 from chia.full_node.mempool import MempoolRemoveInfo
 from chia.full_node.mempool_manager import MempoolManager, NewPeakItem
 from chia.full_node.signage_point import SignagePoint
-from chia.full_node.subscriptions import PeerSubscriptions, peers_for_spend_bundle
+from chia.full_node.subscriptions import PeerSubscriptions, coin_states_for_peers, peers_for_spend_bundle
 from chia.full_node.sync_store import Peak, SyncStore
 from chia.full_node.tx_processing_queue import TransactionQueue, TransactionQueueEntry
 from chia.full_node.weight_proof import WeightProofHandler
@@ -155,6 +160,7 @@ class FullNode:
     _db_wrapper: Optional[DBWrapper2] = None
     _hint_store: Optional[HintStore] = None
     _block_store: Optional[BlockStore] = None
+    _compaction: Optional[CompactionService] = None
     _coin_store: Optional[CoinStore] = None
     _mempool_manager: Optional[MempoolManager] = None
     _init_weight_proof: Optional[asyncio.Task[None]] = None
@@ -233,6 +239,10 @@ class FullNode:
             self.db_path,
             db_version=db_version,
             reader_count=self.config.get("db_readers", 4),
+            long_reader_count=self.config.get("db_long_readers", 1),
+            max_reader_count=self.config.get("db_max_readers", 8),
+            max_long_reader_count=self.config.get("db_max_long_readers", 4),
+            slow_query_threshold=self.config.get("db_slow_query_threshold", 2.0),
             log_path=sql_log_path,
             synchronous=db_sync,
         ) as self._db_wrapper:
@@ -254,6 +264,13 @@ class FullNode:
                                 pass
 
             self._block_store = await BlockStore.create(self.db_wrapper)
+            self._compaction = CompactionService(
+                block_store=self.block_store,
+                db_wrapper=self.db_wrapper,
+                log=self.log,
+                batch_size=self.config.get("compact_proof_batch_size", 100),
+                min_write_interval=self.config.get("compact_proof_write_interval", 0.5),
+            )
             self._hint_store = await HintStore.create(self.db_wrapper)
             self._coin_store = await CoinStore.create(self.db_wrapper)
             self.log.info("Initializing blockchain from disk")
@@ -270,6 +287,8 @@ class FullNode:
                 blockchain_dir=self.db_path.parent,
                 reserved_cores=reserved_cores,
                 single_threaded=single_threaded,
+                multiprocess_validation=self.config.get("multiprocess_validation", False),
+                multiprocessing_context=self.multiprocessing_context,
                 log_coins=log_coins,
                 selected_network=self.config.get("selected_network"),
             )
@@ -401,6 +420,11 @@ class FullNode:
         assert self._block_store is not None
         return self._block_store
 
+    @property
+    def compaction(self) -> CompactionService:
+        assert self._compaction is not None
+        return self._compaction
+
     @property
     def timelord_lock(self) -> asyncio.Lock:
         assert self._timelord_lock is not None
@@ -1283,8 +1307,42 @@ class FullNode:
                 # finished signal with None
                 await output_queue.put(None)
 
-        async def validate_blocks(
+        async def check_proofs(
             input_queue: asyncio.Queue[Optional[tuple[WSChiaConnection, list[FullBlock]]]],
+            output_queue: asyncio.Queue[
+                Optional[tuple[WSChiaConnection, list[FullBlock], list[Awaitable[Optional[PoSpaceCheck]]]]]
+            ],
+        ) -> None:
+            # The proof of space checks don't depend on the validation state,
+            # so they are submitted to the pool for whole batches as soon as
+            # the blocks arrive, ahead of the (ordered) validate_blocks() stage.
+            # Keep enough preceding blocks around to derive the challenges from
+            recent_blocks: dict[bytes32, FullBlock] = {}
+            max_recent_blocks = 4 * self.constants.MAX_SUB_SLOT_BLOCKS + 2 * batch_size
+            try:
+                while True:
+                    res = await input_queue.get()
+                    if res is None:
+                        return None
+                    peer, blocks = res
+                    for block in blocks:
+                        recent_blocks[block.header_hash] = block
+                    while len(recent_blocks) > max_recent_blocks:
+                        del recent_blocks[next(iter(recent_blocks))]
+                    futures = check_pospace_batch(
+                        self.constants, blockchain, blocks, recent_blocks, self.blockchain.pool
+                    )
+                    await output_queue.put((peer, blocks, futures))
+            except Exception:
+                self.log.exception("Exception checking proofs of space")
+            finally:
+                # finished signal with None
+                await output_queue.put(None)
+
+        async def validate_blocks(
+            input_queue: asyncio.Queue[
+                Optional[tuple[WSChiaConnection, list[FullBlock], list[Awaitable[Optional[PoSpaceCheck]]]]]
+            ],
             output_queue: asyncio.Queue[
                 Optional[
                     tuple[WSChiaConnection, ValidationState, list[Awaitable[PreValidationResult]], list[FullBlock]]
@@ -1299,11 +1357,11 @@ class FullNode:
 
             try:
                 while True:
-                    res: Optional[tuple[WSChiaConnection, list[FullBlock]]] = await input_queue.get()
+                    res = await input_queue.get()
                     if res is None:
                         self.log.debug("done fetching blocks")
                         return None
-                    peer, blocks = res
+                    peer, blocks, pospace_futures = res
 
                     # skip_blocks is only relevant at the start of the sync,
                     # to skip blocks we already have in the database (and have
@@ -1318,14 +1376,18 @@ class FullNode:
 
                     first_batch = False
 
+                    # skip_blocks() only skips a prefix of the batch
+                    pospace_checks = await asyncio.gather(*pospace_futures)
+                    pospace_checks = pospace_checks[len(blocks) - len(blocks_to_validate) :]
                     futures: list[Awaitable[PreValidationResult]] = []
-                    for block in blocks_to_validate:
+                    for block, pospace in zip(blocks_to_validate, pospace_checks):
                         futures.extend(
                             await self.prevalidate_blocks(
                                 blockchain,
                                 [block],
                                 vs,
                                 summaries,
+                                pospace=[pospace],
                             )
                         )
                     start = time.monotonic()
@@ -1363,16 +1425,33 @@ class FullNode:
                     block_rate_height = start_height
 
                 pre_validation_results = list(await asyncio.gather(*futures))
-                # The ValidationState object (vs) is an in-out parameter. the add_block_batch()
-                # call will update it
-                state_change_summary, err = await self.add_prevalidated_blocks(
-                    blockchain,
-                    blocks,
-                    pre_validation_results,
-                    fork_info,
-                    peer.peer_info,
-                    vs,
-                )
+                # with batch commits enabled, the blocks and their hints are
+                # committed in a single transaction. Validation of the next
+                # batches carries on in validate_blocks() in the meantime.
+                # sync_from_fork_point() is called with the blockchain lock
+                # held, which batch_commit() relies on to roll back a failed
+                # batch before anything else sees it. This is only done during
+                # long sync, since the peak moves ahead of the transaction (see
+                # batch_commit())
+                async with self.blockchain.batch_commit() if batch_commit else contextlib.nullcontext():
+                    # The ValidationState object (vs) is an in-out parameter. the add_block_batch()
+                    # call will update it
+                    state_change_summary, err = await self.add_prevalidated_blocks(
+                        blockchain,
+                        blocks,
+                        pre_validation_results,
+                        fork_info,
+                        peer.peer_info,
+                        vs,
+                    )
+                    if state_change_summary is not None:
+                        # Hints must be added to the DB. The other post-processing tasks are not required when syncing
+                        hints_to_add, _ = get_hints_and_subscription_coin_ids(
+                            state_change_summary,
+                            self.subscriptions.has_coin_subscription,
+                            self.subscriptions.has_puzzle_subscription,
+                        )
+                        await self.hint_store.add_hints(hints_to_add)
                 if err is not None:
                     await peer.close(600)
                     raise ValueError(f"Failed to validate block batch {start_height} to {end_height}: {err}")
@@ -1384,18 +1463,10 @@ class FullNode:
 
                 self.log.info(
                     "Added blocks {start_height} to {end_height} "
-                    f"({block_rate:.3g} blocks/s) (from: {peer.peer_info.ip})"
+                    f"({block_rate:.3g} blocks/s) (from: {peer.peer_info.ip}) "
+                    f"(pipeline: {block_queue.qsize()} fetched, {proof_queue.qsize()} proofs checked, "
+                    f"{validation_queue.qsize()} validated batches)"
                 )
-                peak: Optional[BlockRecord] = self.blockchain.get_peak()
-                if state_change_summary is not None:
-                    assert peak is not None
-                    # Hints must be added to the DB. The other post-processing tasks are not required when syncing
-                    hints_to_add, _ = get_hints_and_subscription_coin_ids(
-                        state_change_summary,
-                        self.subscriptions.has_coin_subscription,
-                        self.subscriptions.has_puzzle_subscription,
-                    )
-                    await self.hint_store.add_hints(hints_to_add)
                 # Note that end_height is not necessarily the peak at this
                 # point. In case of a re-org, it may even be significantly
                 # higher than _peak_height, and still not be the peak.
@@ -1403,23 +1474,40 @@ class FullNode:
                 # height, in that case.
                 self.blockchain.clean_block_record(end_height - self.constants.BLOCKS_CACHE_SIZE)
 
-        block_queue: asyncio.Queue[Optional[tuple[WSChiaConnection, list[FullBlock]]]] = asyncio.Queue(maxsize=10)
+        # the number of batches each stage of the pipeline may run ahead of the
+        # next one
+        pipeline_depth = self.config.get("sync_pipeline_depth", 10)
+        batch_commit = self.config.get("sync_batch_commit", True)
+        block_queue: asyncio.Queue[Optional[tuple[WSChiaConnection, list[FullBlock]]]] = asyncio.Queue(
+            maxsize=pipeline_depth
+        )
+        proof_queue: asyncio.Queue[
+            Optional[tuple[WSChiaConnection, list[FullBlock], list[Awaitable[Optional[PoSpaceCheck]]]]]
+        ] = asyncio.Queue(maxsize=pipeline_depth)
         validation_queue: asyncio.Queue[
             Optional[tuple[WSChiaConnection, ValidationState, list[Awaitable[PreValidationResult]], list[FullBlock]]]
-        ] = asyncio.Queue(maxsize=10)
+        ] = asyncio.Queue(maxsize=pipeline_depth)
 
         fetch_task = create_referenced_task(fetch_blocks(block_queue))
-        validate_task = create_referenced_task(validate_blocks(block_queue, validation_queue))
+        proof_task = create_referenced_task(check_proofs(block_queue, proof_queue))
+        validate_task = create_referenced_task(validate_blocks(proof_queue, validation_queue))
         ingest_task = create_referenced_task(ingest_blocks(validation_queue))
         try:
-            await asyncio.gather(fetch_task, validate_task, ingest_task)
+            await asyncio.gather(fetch_task, proof_task, validate_task, ingest_task)
         except Exception:
             self.log.exception("sync from fork point failed")
         finally:
             cancel_task_safe(validate_task, self.log)
+            cancel_task_safe(proof_task, self.log)
             cancel_task_safe(fetch_task)
             cancel_task_safe(ingest_task)
 
+            while not proof_queue.empty():
+                proof_result = proof_queue.get_nowait()
+                if proof_result is None:
+                    continue
+                await asyncio.gather(*proof_result[2])
+
             # we still need to await all the pending futures of the
             # prevalidation steps posted to the thread pool
             while not validation_queue.empty():
@@ -1450,16 +1538,7 @@ class FullNode:
         self.log.debug(
             f"update_wallets - fork_height: {wallet_update.fork_height}, peak_height: {wallet_update.peak.height}"
         )
-        changes_for_peer: dict[bytes32, set[CoinState]] = {}
-        for coin_record in wallet_update.coin_records:
-            coin_id = coin_record.name
-            subscribed_peers = self.subscriptions.peers_for_coin_id(coin_id)
-            subscribed_peers.update(self.subscriptions.peers_for_puzzle_hash(coin_record.coin.puzzle_hash))
-            hint = wallet_update.hints.get(coin_id)
-            if hint is not None:
-                subscribed_peers.update(self.subscriptions.peers_for_puzzle_hash(hint))
-            for peer in subscribed_peers:
-                changes_for_peer.setdefault(peer, set()).add(coin_record.coin_state)
+        changes_for_peer = coin_states_for_peers(self.subscriptions, wallet_update.coin_records, wallet_update.hints)
 
         for peer, changes in changes_for_peer.items():
             connection = self.server.all_connections.get(peer)
@@ -1575,6 +1654,8 @@ class FullNode:
         blocks_to_validate: list[FullBlock],
         vs: ValidationState,
         wp_summaries: Optional[list[SubEpochSummary]] = None,
+        *,
+        pospace: Optional[Sequence[Optional[PoSpaceCheck]]] = None,
     ) -> Sequence[Awaitable[PreValidationResult]]:
         """
         This is a thin wrapper over pre_validate_block().
@@ -1586,6 +1667,8 @@ class FullNode:
                 parameter. It will be updated to be the validation state for the next
                 batch of blocks.
             wp_summaries:
+            pospace: Optional proof of space checks for each block, done ahead
+                of time by check_pospace_batch()
         """
         # Validates signatures in multiprocessing since they take a while, and we don't have cached transactions
         # for these blocks (unlike during normal operation where we validate one at a time)
@@ -1593,16 +1676,17 @@ class FullNode:
         # call below. pre_validate_block() will update the
         # object we pass in.
         ret: list[Awaitable[PreValidationResult]] = []
-        for block in blocks_to_validate:
+        for i, block in enumerate(blocks_to_validate):
             ret.append(
                 await pre_validate_block(
                     self.constants,
                     blockchain,
                     block,
-                    self.blockchain.pool,
+                    self.blockchain.validation_pool,
                     None,
                     vs,
                     wp_summaries=wp_summaries,
+                    pospace=None if pospace is None else pospace[i],
                 )
             )
         return ret
@@ -2138,7 +2222,7 @@ class FullNode:
                 self.blockchain.constants,
                 AugmentedBlockchain(self.blockchain),
                 block,
-                self.blockchain.pool,
+                self.blockchain.validation_pool,
                 conds,
                 ValidationState(ssi, diff, prev_ses_block),
             )
@@ -3035,52 +3119,7 @@ class FullNode:
         header_hash: bytes32,
         field_vdf: CompressibleVDFField,
     ) -> bool:
-        block = await self.block_store.get_full_block(header_hash)
-        if block is None:
-            return False
-
-        new_block = None
-
-        if field_vdf == CompressibleVDFField.CC_EOS_VDF:
-            for index, sub_slot in enumerate(block.finished_sub_slots):
-                if sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf == vdf_info:
-                    new_proofs = sub_slot.proofs.replace(challenge_chain_slot_proof=vdf_proof)
-                    new_subslot = sub_slot.replace(proofs=new_proofs)
-                    new_finished_subslots = block.finished_sub_slots
-                    new_finished_subslots[index] = new_subslot
-                    new_block = block.replace(finished_sub_slots=new_finished_subslots)
-                    break
-        if field_vdf == CompressibleVDFField.ICC_EOS_VDF:
-            for index, sub_slot in enumerate(block.finished_sub_slots):
-                if (
-                    sub_slot.infused_challenge_chain is not None
-                    and sub_slot.infused_challenge_chain.infused_challenge_chain_end_of_slot_vdf == vdf_info
-                ):
-                    new_proofs = sub_slot.proofs.replace(infused_challenge_chain_slot_proof=vdf_proof)
-                    new_subslot = sub_slot.replace(proofs=new_proofs)
-                    new_finished_subslots = block.finished_sub_slots
-                    new_finished_subslots[index] = new_subslot
-                    new_block = block.replace(finished_sub_slots=new_finished_subslots)
-                    break
-        if field_vdf == CompressibleVDFField.CC_SP_VDF:
-            if block.reward_chain_block.challenge_chain_sp_vdf == vdf_info:
-                assert block.challenge_chain_sp_proof is not None
-                new_block = block.replace(challenge_chain_sp_proof=vdf_proof)
-        if field_vdf == CompressibleVDFField.CC_IP_VDF:
-            if block.reward_chain_block.challenge_chain_ip_vdf == vdf_info:
-                new_block = block.replace(challenge_chain_ip_proof=vdf_proof)
-        if new_block is None:
-            return False
-        async with self.db_wrapper.writer():
-            try:
-                await self.block_store.replace_proof(header_hash, new_block)
-                return True
-            except BaseException as e:
-                self.log.error(
-                    f"_replace_proof error while adding block {block.header_hash} height {block.height},"
-                    f" rolling back: {e} {traceback.format_exc()}"
-                )
-                raise
+        return await self.compaction.replace_proof(header_hash, vdf_info, vdf_proof, field_vdf)
 
     async def add_compact_proof_of_time(self, request: timelord_protocol.RespondCompactProofOfTime) -> None:
         peak = self.blockchain.get_peak()
@@ -3093,8 +3132,7 @@ class FullNode:
             request.vdf_info, request.vdf_proof, request.height, request.header_hash, field_vdf
         ):
             return None
-        async with self.blockchain.compact_proof_lock:
-            replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
+        replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
         if not replaced:
             self.log.error(f"Could not replace compact proof: {request.height}")
             return None
@@ -3178,10 +3216,9 @@ class FullNode:
             request.vdf_info, request.vdf_proof, request.height, request.header_hash, field_vdf
         ):
             return None
-        async with self.blockchain.compact_proof_lock:
-            if self.blockchain.seen_compact_proofs(request.vdf_info, request.height):
-                return None
-            replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
+        if self.blockchain.seen_compact_proofs(request.vdf_info, request.height):
+            return None
+        replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
         if not replaced:
             self.log.error(f"Could not replace compact proof: {request.height}")
             return None
@@ -3239,7 +3276,7 @@ class FullNode:
 
                 broadcast_list: list[timelord_protocol.RequestCompactProofOfTime] = []
 
-                self.log.info("Getting random heights for bluebox to compact")
+                self.log.info("Getting heights for bluebox to compact")
 
                 if self._server is None:
                     self.log.info("Not broadcasting uncompact blocks, no server found")
@@ -3248,7 +3285,7 @@ class FullNode:
                 connected_timelords = self.server.get_connections(NodeType.TIMELORD)
 
                 total_target_uncompact_proofs = target_uncompact_proofs * max(1, len(connected_timelords))
-                heights = await self.block_store.get_random_not_compactified(total_target_uncompact_proofs)
+                heights = await self.compaction.get_uncompact_heights(total_target_uncompact_proofs)
                 self.log.info("Heights found for bluebox to compact: [%s]", ", ".join(map(str, heights)))
 
                 for h in heights:
@@ -4,7 +4,6 @@ import asyncio
 import logging
 import time
 import traceback
-from collections.abc import Collection
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import TYPE_CHECKING, ClassVar, Optional, cast
@@ -41,7 +40,7 @@ from chia.consensus.get_block_generator import get_block_generator
 from chia.consensus.pot_iterations import calculate_ip_iters, calculate_iterations_quality, calculate_sp_iters
 from chia.full_node.coin_store import CoinStore
 from chia.full_node.fee_estimator_interface import FeeEstimatorInterface
-from chia.full_node.full_block_utils import get_height_and_tx_status_from_block, header_block_from_block
+from chia.full_node.full_block_utils import FullBlockView
 from chia.full_node.mempool_check_conditions import get_puzzle_and_solution_for_coin
 from chia.full_node.signage_point import SignagePoint
 from chia.full_node.tx_processing_queue import TransactionQueueEntry, TransactionQueueFull
@@ -336,9 +335,17 @@ class FullNodeAPI:
         if header_hash is None:
             return make_msg(ProtocolMessageTypes.reject_block, RejectBlock(request.height))
 
+        if request.include_transaction_block:
+            # RespondBlock only has the block, so we can stream it directly,
+            # without parsing it
+            block_bytes = await self.full_node.block_store.get_full_block_bytes(header_hash)
+            if block_bytes is not None:
+                return make_msg(ProtocolMessageTypes.respond_block, block_bytes)
+            return make_msg(ProtocolMessageTypes.reject_block, RejectBlock(request.height))
+
         block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash)
         if block is not None:
-            if not request.include_transaction_block and block.transactions_generator is not None:
+            if block.transactions_generator is not None:
                 block = block.replace(transactions_generator=None)
             return make_msg(ProtocolMessageTypes.respond_block, full_node_protocol.RespondBlock(block))
         return make_msg(ProtocolMessageTypes.reject_block, RejectBlock(request.height))
@@ -1211,13 +1218,16 @@ class FullNodeAPI:
         if header_hash is None:
             msg = make_msg(ProtocolMessageTypes.reject_header_request, RejectHeaderRequest(request.height))
             return msg
-        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash)
+        # we only need a few fields of the block, so we don't parse all of it
+        block = await self.full_node.block_store.get_full_block_view(header_hash)
         if block is None:
             return None
 
-        removals_and_additions: Optional[tuple[Collection[bytes32], Collection[Coin]]] = None
+        tx_addition_coins: list[Coin] = []
+        removal_names: list[bytes32] = []
 
-        if block.transactions_generator is not None:
+        generator = block.transactions_generator_bytes
+        if generator is not None:
             block_generator: Optional[BlockGenerator] = await get_block_generator(
                 self.full_node.blockchain.lookup_block_generators, block
             )
@@ -1231,24 +1241,22 @@ class FullNodeAPI:
             additions, removals = await asyncio.get_running_loop().run_in_executor(
                 self.executor,
                 additions_and_removals,
-                bytes(block.transactions_generator),
+                generator,
                 block_generator.generator_refs,
                 flags,
                 self.full_node.constants,
             )
             # strip the hint from additions, and compute the puzzle hash for
             # removals
-            removals_and_additions = ([r.name() for r in removals], [a[0] for a in additions])
-        elif block.is_transaction_block():
-            # This is a transaction block with just reward coins.
-            removals_and_additions = ([], [])
+            removal_names = [r.name() for r in removals]
+            tx_addition_coins = [a[0] for a in additions]
 
-        header_block = get_block_header(block, removals_and_additions)
-        msg = make_msg(
+        # RespondBlockHeader only has the header block, so we can stream it
+        # directly. The filter includes the reward coins of transaction blocks
+        return make_msg(
             ProtocolMessageTypes.respond_block_header,
-            wallet_protocol.RespondBlockHeader(header_block),
+            block.header_block(True, tx_addition_coins, removal_names),
         )
-        return msg
 
     @metadata.request()
     async def request_additions(self, request: wallet_protocol.RequestAdditions) -> Optional[Message]:
@@ -1309,7 +1317,7 @@ class FullNodeAPI:
 
     @metadata.request()
     async def request_removals(self, request: wallet_protocol.RequestRemovals) -> Optional[Message]:
-        block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(request.header_hash)
+        block = await self.full_node.block_store.get_full_block_view(request.header_hash)
 
         # We lock so that the coin store does not get modified
         peak_height = self.full_node.blockchain.get_peak_height()
@@ -1324,13 +1332,14 @@ class FullNodeAPI:
             msg = make_msg(ProtocolMessageTypes.reject_removals_request, reject)
             return msg
 
-        assert block is not None and block.foliage_transaction_block is not None
+        foliage_transaction_block = block.foliage_transaction_block
+        assert foliage_transaction_block is not None
 
         # Note: this might return bad data if there is a reorg in this time
         all_removals: list[CoinRecord] = await self.full_node.coin_store.get_coins_removed_at_height(block.height)
 
         if self.full_node.blockchain.height_to_hash(block.height) != request.header_hash:
-            raise ValueError(f"Block {block.header_hash} no longer in chain")
+            raise ValueError(f"Block {request.header_hash} no longer in chain")
 
         all_removals_dict: dict[bytes32, Coin] = {}
         for coin_record in all_removals:
@@ -1340,24 +1349,23 @@ class FullNodeAPI:
         proofs_map: list[tuple[bytes32, bytes]] = []
 
         # If there are no transactions, respond with empty lists
-        if block.transactions_generator is None:
+        if block.transactions_generator_bytes is None:
             proofs: Optional[list[tuple[bytes32, bytes]]]
             if request.coin_names is None:
                 proofs = None
             else:
                 proofs = []
-            response = wallet_protocol.RespondRemovals(block.height, block.header_hash, [], proofs)
+            response = wallet_protocol.RespondRemovals(block.height, request.header_hash, [], proofs)
         elif request.coin_names is None or len(request.coin_names) == 0:
             for removed_name, removed_coin in all_removals_dict.items():
                 coins_map.append((removed_name, removed_coin))
-            response = wallet_protocol.RespondRemovals(block.height, block.header_hash, coins_map, None)
+            response = wallet_protocol.RespondRemovals(block.height, request.header_hash, coins_map, None)
         else:
-            assert block.transactions_generator
             leafs: list[bytes32] = []
             for removed_name, removed_coin in all_removals_dict.items():
                 leafs.append(removed_name)
             removal_merkle_set = MerkleSet(leafs)
-            assert removal_merkle_set.get_root() == block.foliage_transaction_block.removals_root
+            assert removal_merkle_set.get_root() == foliage_transaction_block.removals_root
             for coin_name in request.coin_names:
                 result, proof = removal_merkle_set.is_included_already_hashed(coin_name)
                 proofs_map.append((coin_name, proof))
@@ -1368,7 +1376,7 @@ class FullNodeAPI:
                 else:
                     coins_map.append((coin_name, None))
                     assert not result
-            response = wallet_protocol.RespondRemovals(block.height, block.header_hash, coins_map, proofs_map)
+            response = wallet_protocol.RespondRemovals(block.height, request.header_hash, coins_map, proofs_map)
 
         msg = make_msg(ProtocolMessageTypes.respond_removals, response)
         return msg
@@ -1476,9 +1484,9 @@ class FullNodeAPI:
         return_filter = request.return_filter
         header_blocks_bytes: list[bytes] = []
         for b in blocks_bytes:
-            b_mem_view = memoryview(b)
-            height, is_tx_block = get_height_and_tx_status_from_block(b_mem_view)
-            if not is_tx_block:
+            block = FullBlockView(b)
+            height = block.height
+            if not block.is_transaction_block():
                 tx_addition_coins = []
                 removal_names = []
             else:
@@ -1489,9 +1497,7 @@ class FullNodeAPI:
                 )
                 tx_addition_coins = [record.coin for record in added_coins_records if not record.coinbase]
                 removal_names = [record.coin.name() for record in removed_coins_records]
-            header_blocks_bytes.append(
-                header_block_from_block(b_mem_view, return_filter, tx_addition_coins, removal_names)
-            )
+            header_blocks_bytes.append(block.header_block(return_filter, tx_addition_coins, removal_names))
 
         # we're building the RespondHeaderBlocks manually to avoid cost of
         # dynamic serialization
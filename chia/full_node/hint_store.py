@@ -6,8 +6,7 @@ import logging
 import typing_extensions
 from chia_rs.sized_bytes import bytes32
 
-from chia.util.batches import to_batches
-from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2
+from chia.util.db_wrapper import DBWrapper2, execute_key_set_query
 
 log = logging.getLogger(__name__)
 
@@ -39,37 +38,27 @@ class HintStore:
         return [bytes32(row[0]) for row in rows]
 
     async def get_coin_ids_multi(self, hints: set[bytes], *, max_items: int = 50000) -> list[bytes32]:
-        coin_ids: list[bytes32] = []
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            for batch in to_batches(hints, SQLITE_MAX_VARIABLE_NUMBER):
-                hints_db: tuple[bytes, ...] = tuple(batch.entries)
-                cursor = await conn.execute(
-                    f"SELECT coin_id from hints INDEXED BY hint_index "
-                    f"WHERE hint IN ({'?,' * (len(batch.entries) - 1)}?) LIMIT ?",
-                    (*hints_db, max_items),
-                )
-                rows = await cursor.fetchall()
-                coin_ids.extend([bytes32(row[0]) for row in rows])
-                await cursor.close()
-
-        return coin_ids
+        if len(hints) == 0:
+            return []
+
+        async with self.db_wrapper.reader_no_transaction(
+            call_site="HintStore.get_coin_ids_multi", long_query=True
+        ) as conn:
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT coin_id from hints INDEXED BY hint_index WHERE hint IN ({in_list}) LIMIT ?",
+                hints,
+                limit=max_items,
+            )
+        return [bytes32(row[0]) for row in rows]
 
     async def get_hints(self, coin_ids: list[bytes32]) -> list[bytes32]:
-        hints: list[bytes32] = []
+        if len(coin_ids) == 0:
+            return []
 
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            for batch in to_batches(coin_ids, SQLITE_MAX_VARIABLE_NUMBER):
-                coin_ids_db: tuple[bytes32, ...] = tuple(batch.entries)
-                cursor = await conn.execute(
-                    f"SELECT hint from hints WHERE coin_id IN ({'?,' * (len(batch.entries) - 1)}?)",
-                    coin_ids_db,
-                )
-                rows = await cursor.fetchall()
-                hints.extend([bytes32(row[0]) for row in rows if len(row[0]) == 32])
-                await cursor.close()
-
-        return hints
+        async with self.db_wrapper.reader_no_transaction(call_site="HintStore.get_hints") as conn:
+            rows = await execute_key_set_query(conn, "SELECT hint from hints WHERE coin_id IN ({in_list})", coin_ids)
+        return [bytes32(row[0]) for row in rows if len(row[0]) == 32]
 
     async def add_hints(self, coin_hint_list: list[tuple[bytes32, bytes]]) -> None:
         if len(coin_hint_list) == 0:
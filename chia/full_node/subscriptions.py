@@ -1,72 +1,175 @@
 from __future__ import annotations
 
+import heapq
 import logging
+import sys
+from collections.abc import Iterable
 from dataclasses import dataclass, field
+from typing import Optional
 
-from chia_rs import Coin, SpendBundleConditions
+from chia_rs import Coin, CoinState, SpendBundleConditions
 from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint64
 
+from chia.types.coin_record import CoinRecord
+
 log = logging.getLogger(__name__)
 
+_KEY_SIZE = sys.getsizeof(bytes(32))
+
 
 @dataclass(frozen=True)
 class SubscriptionSet:
-    _subscriptions_for_peer: dict[bytes32, set[bytes32]] = field(default_factory=dict, init=False)
-    _peers_for_subscription: dict[bytes32, set[bytes32]] = field(default_factory=dict, init=False)
+    """
+    A many-to-many mapping between peers and the items (coin ids or puzzle hashes) they're subscribed to.
+
+    Wallet serving nodes can hold millions of these, so they're stored compactly. Each peer is assigned
+    a small integer id (ids are reused once a peer has no subscriptions left), and the peers subscribed
+    to an item are stored as a bitmap of those ids in a single int, rather than as a set per item. Items
+    are stored as plain bytes, which are smaller than bytes32 objects, and are converted back to bytes32
+    when returned.
+    """
+
+    _peer_ids: dict[bytes32, int] = field(default_factory=dict, init=False)
+    _peers_by_id: list[Optional[bytes32]] = field(default_factory=list, init=False)
+    # unused peer ids, as a heap so we always hand out the lowest one and keep the bitmaps small
+    _free_peer_ids: list[int] = field(default_factory=list, init=False)
+    _subscriptions_for_peer: dict[int, set[bytes]] = field(default_factory=dict, init=False)
+    _peers_for_subscription: dict[bytes, int] = field(default_factory=dict, init=False)
+
+    def _add_peer(self, peer_id: bytes32) -> int:
+        if len(self._free_peer_ids) > 0:
+            index = heapq.heappop(self._free_peer_ids)
+            self._peers_by_id[index] = peer_id
+        else:
+            index = len(self._peers_by_id)
+            self._peers_by_id.append(peer_id)
+        self._peer_ids[peer_id] = index
+        self._subscriptions_for_peer[index] = set()
+        return index
+
+    def _drop_peer(self, peer_id: bytes32, index: int) -> None:
+        del self._peer_ids[peer_id]
+        del self._subscriptions_for_peer[index]
+        self._peers_by_id[index] = None
+        heapq.heappush(self._free_peer_ids, index)
+
+    def _peers_in(self, bitmap: int) -> set[bytes32]:
+        peers: set[bytes32] = set()
+        while bitmap != 0:
+            lowest = bitmap & -bitmap
+            peer_id = self._peers_by_id[lowest.bit_length() - 1]
+            assert peer_id is not None
+            peers.add(peer_id)
+            bitmap ^= lowest
+        return peers
 
     def add_subscription(self, peer_id: bytes32, item: bytes32) -> bool:
-        peers = self._peers_for_subscription.setdefault(item, set())
+        index = self._peer_ids.get(peer_id)
+        bitmap = self._peers_for_subscription.get(item, 0)
 
-        if peer_id in peers:
+        if index is not None and bitmap & (1 << index) != 0:
             return False
 
-        subscriptions = self._subscriptions_for_peer.setdefault(peer_id, set())
-        subscriptions.add(item)
-        peers.add(peer_id)
+        if index is None:
+            index = self._add_peer(peer_id)
+
+        key = bytes(item)
+        self._peers_for_subscription[key] = bitmap | (1 << index)
+        self._subscriptions_for_peer[index].add(key)
 
         return True
 
     def remove_subscription(self, peer_id: bytes32, item: bytes32) -> bool:
-        subscriptions = self._subscriptions_for_peer.get(peer_id)
+        index = self._peer_ids.get(peer_id)
+
+        if index is None:
+            return False
 
-        if subscriptions is None or item not in subscriptions:
+        bitmap = self._peers_for_subscription.get(item, 0)
+        if bitmap & (1 << index) == 0:
             return False
 
-        peers = self._peers_for_subscription[item]
-        peers.remove(peer_id)
+        bitmap ^= 1 << index
+        if bitmap == 0:
+            self._peers_for_subscription.pop(item)
+        else:
+            self._peers_for_subscription[item] = bitmap
+
+        subscriptions = self._subscriptions_for_peer[index]
         subscriptions.remove(item)
 
         if len(subscriptions) == 0:
-            self._subscriptions_for_peer.pop(peer_id)
-
-        if len(peers) == 0:
-            self._peers_for_subscription.pop(item)
+            self._drop_peer(peer_id, index)
 
         return True
 
     def has_subscription(self, item: bytes32) -> bool:
         return item in self._peers_for_subscription
 
+    def subscribed(self, items: Iterable[bytes32]) -> set[bytes32]:
+        """
+        Returns the items that at least one peer is subscribed to.
+        """
+        return {item for item in items if item in self._peers_for_subscription}
+
     def count_subscriptions(self, peer_id: bytes32) -> int:
-        return len(self._subscriptions_for_peer.get(peer_id, {}))
+        index = self._peer_ids.get(peer_id)
+        if index is None:
+            return 0
+        return len(self._subscriptions_for_peer[index])
 
     def remove_peer(self, peer_id: bytes32) -> None:
-        for item in self._subscriptions_for_peer.pop(peer_id, {}):
-            self._peers_for_subscription[item].remove(peer_id)
-
-            if len(self._peers_for_subscription[item]) == 0:
+        index = self._peer_ids.get(peer_id)
+        if index is None:
+            return
+
+        mask = ~(1 << index)
+        for item in self._subscriptions_for_peer[index]:
+            bitmap = self._peers_for_subscription[item] & mask
+            if bitmap == 0:
                 self._peers_for_subscription.pop(item)
+            else:
+                self._peers_for_subscription[item] = bitmap
+
+        self._drop_peer(peer_id, index)
 
     def subscriptions(self, peer_id: bytes32) -> set[bytes32]:
-        return self._subscriptions_for_peer.get(peer_id, set())
+        index = self._peer_ids.get(peer_id)
+        if index is None:
+            return set()
+        return {bytes32(item) for item in self._subscriptions_for_peer[index]}
 
     def peers(self, item: bytes32) -> set[bytes32]:
-        return self._peers_for_subscription.get(item, set())
+        return self._peers_in(self._peers_for_subscription.get(item, 0))
 
     def total_count(self) -> int:
         return len(self._peers_for_subscription)
 
+    def peer_count(self) -> int:
+        return len(self._peer_ids)
+
+    def memory_usage(self) -> int:
+        """
+        Returns an estimate of the number of bytes used to store the subscriptions. It doesn't walk the
+        items, so it's cheap enough to call from an RPC.
+        """
+        total = (
+            sys.getsizeof(self._peer_ids)
+            + sys.getsizeof(self._peers_by_id)
+            + sys.getsizeof(self._free_peer_ids)
+            + sys.getsizeof(self._subscriptions_for_peer)
+            + sys.getsizeof(self._peers_for_subscription)
+        )
+        # every (peer, item) pair holds one key object. The first peer's is shared with
+        # _peers_for_subscription
+        for items in self._subscriptions_for_peer.values():
+            total += sys.getsizeof(items) + len(items) * _KEY_SIZE
+        # bitmaps that don't fit in the small int cache are objects of their own
+        if len(self._peers_by_id) > 8:
+            total += len(self._peers_for_subscription) * sys.getsizeof(1 << (len(self._peers_by_id) - 1))
+        return total
+
 
 @dataclass(frozen=True)
 class PeerSubscriptions:
@@ -79,6 +182,12 @@ class PeerSubscriptions:
     def has_coin_subscription(self, coin_id: bytes32) -> bool:
         return self._coin_subscriptions.has_subscription(coin_id)
 
+    def subscribed_puzzle_hashes(self, puzzle_hashes: Iterable[bytes32]) -> set[bytes32]:
+        return self._puzzle_subscriptions.subscribed(puzzle_hashes)
+
+    def subscribed_coin_ids(self, coin_ids: Iterable[bytes32]) -> set[bytes32]:
+        return self._coin_subscriptions.subscribed(coin_ids)
+
     def peer_subscription_count(self, peer_id: bytes32) -> int:
         puzzle_subscriptions = self._puzzle_subscriptions.count_subscriptions(peer_id)
         coin_subscriptions = self._coin_subscriptions.count_subscriptions(peer_id)
@@ -210,6 +319,20 @@ class PeerSubscriptions:
     def puzzle_subscription_count(self) -> int:
         return self._puzzle_subscriptions.total_count()
 
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the number of subscriptions and peers, along with an estimate of the memory used by each
+        kind of subscription.
+        """
+        return {
+            "puzzle_subscriptions": self._puzzle_subscriptions.total_count(),
+            "puzzle_subscription_peers": self._puzzle_subscriptions.peer_count(),
+            "puzzle_subscription_memory": self._puzzle_subscriptions.memory_usage(),
+            "coin_subscriptions": self._coin_subscriptions.total_count(),
+            "coin_subscription_peers": self._coin_subscriptions.peer_count(),
+            "coin_subscription_memory": self._coin_subscriptions.memory_usage(),
+        }
+
 
 def peers_for_spend_bundle(
     peer_subscriptions: PeerSubscriptions, conds: SpendBundleConditions, hints_for_removals: set[bytes32]
@@ -243,3 +366,47 @@ def peers_for_spend_bundle(
         peers |= peer_subscriptions.peers_for_puzzle_hash(puzzle_hash)
 
     return peers
+
+
+def coin_states_for_peers(
+    peer_subscriptions: PeerSubscriptions, coin_records: list[CoinRecord], hints: dict[bytes32, bytes32]
+) -> dict[bytes32, set[CoinState]]:
+    """
+    Returns the coin states each peer should be notified about, given the coin records that changed
+    (added, spent or rolled back) and the hints of the added coins. A peer is notified about a coin if
+    it's subscribed to its coin id, its puzzle hash or its hint.
+
+    Most coins in a block don't match any subscription, so we first narrow down the coin ids and puzzle
+    hashes to the ones anybody is subscribed to (in a single pass each), and only look up the peers for
+    those.
+    """
+
+    coin_ids = [coin_record.name for coin_record in coin_records]
+    subscribed_coin_ids = peer_subscriptions.subscribed_coin_ids(coin_ids)
+    subscribed_puzzle_hashes = peer_subscriptions.subscribed_puzzle_hashes(
+        [coin_record.coin.puzzle_hash for coin_record in coin_records] + list(hints.values())
+    )
+
+    changes_for_peer: dict[bytes32, set[CoinState]] = {}
+
+    if len(subscribed_coin_ids) == 0 and len(subscribed_puzzle_hashes) == 0:
+        return changes_for_peer
+
+    for coin_id, coin_record in zip(coin_ids, coin_records):
+        peers: set[bytes32] = set()
+        if coin_id in subscribed_coin_ids:
+            peers |= peer_subscriptions.peers_for_coin_id(coin_id)
+        if coin_record.coin.puzzle_hash in subscribed_puzzle_hashes:
+            peers |= peer_subscriptions.peers_for_puzzle_hash(coin_record.coin.puzzle_hash)
+        hint = hints.get(coin_id)
+        if hint is not None and hint in subscribed_puzzle_hashes:
+            peers |= peer_subscriptions.peers_for_puzzle_hash(hint)
+
+        if len(peers) == 0:
+            continue
+
+        coin_state = coin_record.coin_state
+        for peer in peers:
+            changes_for_peer.setdefault(peer, set()).add(coin_state)
+
+    return changes_for_peer
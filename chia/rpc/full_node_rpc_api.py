@@ -106,6 +106,8 @@ class FullNodeRpcApi:
             "/get_block": self.get_block,
             "/get_blocks": self.get_blocks,
             "/get_block_count_metrics": self.get_block_count_metrics,
+            "/get_db_reader_stats": self.get_db_reader_stats,
+            "/get_subscription_stats": self.get_subscription_stats,
             "/get_block_record_by_height": self.get_block_record_by_height,
             "/get_block_record": self.get_block_record,
             "/get_block_records": self.get_block_records,
@@ -443,6 +445,16 @@ class FullNodeRpcApi:
             }
         }
 
+    async def get_db_reader_stats(self, request: dict[str, Any]) -> EndpointResult:
+        db_wrapper = self.service.db_wrapper
+        stats = db_wrapper.reader_stats()
+        if request.get("reset", False):
+            db_wrapper.reset_reader_stats()
+        return {"reader_stats": stats}
+
+    async def get_subscription_stats(self, _: dict[str, Any]) -> EndpointResult:
+        return {"subscription_stats": self.service.subscriptions.stats()}
+
     async def get_block_records(self, request: dict[str, Any]) -> EndpointResult:
         if "start" not in request:
             raise ValueError("No start in request")
@@ -477,7 +489,9 @@ class FullNodeRpcApi:
         if "header_hash" not in request:
             raise ValueError("No header_hash in request")
         header_hash = bytes32.from_hexstr(request["header_hash"])
-        full_block: Optional[FullBlock] = await self.service.block_store.get_full_block(header_hash)
+        # only the generator and the height are needed, so we don't parse the
+        # whole block
+        full_block = await self.service.block_store.get_full_block_view(header_hash)
         if full_block is None:
             raise ValueError(f"Block {header_hash.hex()} not found")
 
@@ -494,7 +508,9 @@ class FullNodeRpcApi:
         if "header_hash" not in request:
             raise ValueError("No header_hash in request")
         header_hash = bytes32.from_hexstr(request["header_hash"])
-        full_block: Optional[FullBlock] = await self.service.block_store.get_full_block(header_hash)
+        # only the generator and the height are needed, so we don't parse the
+        # whole block
+        full_block = await self.service.block_store.get_full_block_view(header_hash)
         if full_block is None:
             raise ValueError(f"Block {header_hash.hex()} not found")
 
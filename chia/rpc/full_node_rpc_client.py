@@ -285,6 +285,14 @@ class FullNodeRpcClient(RpcClient):
         except Exception:
             return None
 
+    async def get_db_reader_stats(self, reset: bool = False) -> dict[str, Any]:
+        response = await self.fetch("get_db_reader_stats", {"reset": reset})
+        return cast(dict[str, Any], response["reader_stats"])
+
+    async def get_subscription_stats(self) -> dict[str, int]:
+        response = await self.fetch("get_subscription_stats", {})
+        return cast(dict[str, int], response["subscription_stats"])
+
     async def get_fee_estimate(
         self,
         target_times: Optional[list[int]],
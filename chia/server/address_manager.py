@@ -5,6 +5,7 @@ import io
 import logging
 import math
 import time
+from array import array
 from asyncio import Lock
 from dataclasses import dataclass, field
 from ipaddress import IPv4Address, IPv6Address, ip_address
@@ -64,6 +65,9 @@ class ExtendedPeerInfo:
         self.last_try: int = 0
         self.num_attempts: int = 0
         self.last_count_attempt: int = 0
+        # (timestamp, bytes) of the last `stream` encoding, so serializing a large table
+        # only re-encodes the entries whose timestamp changed since the previous pass
+        self._encoded: Optional[tuple[int, bytes]] = None
 
     def to_string(self) -> str:
         out = (
@@ -101,13 +105,18 @@ class ExtendedPeerInfo:
         return ip
 
     def stream(self, out: io.BytesIO) -> None:
-        out.write(self.encode_ip_type(self.peer_info._ip))
-        out.write(self.peer_info._ip._inner.packed)
-        self.peer_info.port.stream(out)
-        uint64(self.timestamp).stream(out)
-        out.write(self.encode_ip_type(self.src._ip))
-        out.write(self.src._ip._inner.packed)
-        self.src.port.stream(out)
+        # peer_info and src never change after construction, the timestamp does
+        if self._encoded is None or self._encoded[0] != self.timestamp:
+            buf = io.BytesIO()
+            buf.write(self.encode_ip_type(self.peer_info._ip))
+            buf.write(self.peer_info._ip._inner.packed)
+            self.peer_info.port.stream(buf)
+            uint64(self.timestamp).stream(buf)
+            buf.write(self.encode_ip_type(self.src._ip))
+            buf.write(self.src._ip._inner.packed)
+            self.src.port.stream(buf)
+            self._encoded = (self.timestamp, buf.getvalue())
+        out.write(self._encoded[1])
 
     @classmethod
     def parse(cls, data: io.BytesIO) -> ExtendedPeerInfo:
@@ -215,12 +224,50 @@ class ExtendedPeerInfo:
         return chance
 
 
-def create_tried_matrix() -> list[list[int]]:
-    return [[-1 for x in range(BUCKET_SIZE)] for y in range(TRIED_BUCKET_COUNT)]
+# Each bucket is a flat array of node ids (-1 for an empty slot) rather than a list of
+# Python ints, which keeps the 80k slot tables compact.
+def create_tried_matrix() -> list[array[int]]:
+    return [array("q", [-1]) * BUCKET_SIZE for y in range(TRIED_BUCKET_COUNT)]
 
 
-def create_new_matrix() -> list[list[int]]:
-    return [[-1 for x in range(BUCKET_SIZE)] for y in range(NEW_BUCKET_COUNT)]
+def create_new_matrix() -> list[array[int]]:
+    return [array("q", [-1]) * BUCKET_SIZE for y in range(NEW_BUCKET_COUNT)]
+
+
+@dataclass
+class BucketSlotIndex:
+    """
+    Dense index of the occupied (bucket, position) slots of a bucket matrix. Slots are kept
+    in a list with a reverse lookup so adding, removing and picking a uniformly random
+    occupied slot are all O(1), no matter how sparse the matrix is.
+    """
+
+    slots: list[tuple[int, int]] = field(default_factory=list)
+    index: dict[tuple[int, int], int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, slot: tuple[int, int]) -> bool:
+        return slot in self.index
+
+    def add(self, slot: tuple[int, int]) -> None:
+        if slot in self.index:
+            return
+        self.index[slot] = len(self.slots)
+        self.slots.append(slot)
+
+    def remove(self, slot: tuple[int, int]) -> None:
+        pos = self.index.pop(slot, None)
+        if pos is None:
+            return
+        last = self.slots.pop()
+        if pos < len(self.slots):
+            self.slots[pos] = last
+            self.index[last] = pos
+
+    def random_slot(self) -> tuple[int, int]:
+        return self.slots[randrange(len(self.slots))]
 
 
 # This is a Python port from 'CAddrMan' class from Bitcoin core code.
@@ -229,16 +276,16 @@ class AddressManager:
     id_count: int = 0
     key: int = field(default_factory=functools.partial(randbits, 256))
     random_pos: list[int] = field(default_factory=list)
-    tried_matrix: list[list[int]] = field(default_factory=create_tried_matrix)
-    new_matrix: list[list[int]] = field(default_factory=create_new_matrix)
+    tried_matrix: list[array[int]] = field(default_factory=create_tried_matrix)
+    new_matrix: list[array[int]] = field(default_factory=create_new_matrix)
     tried_count: int = 0
     new_count: int = 0
     map_addr: dict[str, int] = field(default_factory=dict)
     map_info: dict[int, ExtendedPeerInfo] = field(default_factory=dict)
     last_good: int = 1
     tried_collisions: list[int] = field(default_factory=list)
-    used_new_matrix_positions: set[tuple[int, int]] = field(default_factory=set)
-    used_tried_matrix_positions: set[tuple[int, int]] = field(default_factory=set)
+    used_new_matrix_positions: BucketSlotIndex = field(default_factory=BucketSlotIndex)
+    used_tried_matrix_positions: BucketSlotIndex = field(default_factory=BucketSlotIndex)
     allow_private_subnets: bool = False
     lock: Lock = field(default_factory=Lock)
 
@@ -287,13 +334,12 @@ class AddressManager:
         out.write(self.key.to_bytes(32, byteorder="big"))
         uint64(count_ids).stream(out)
 
+        # walk the occupied slots in matrix order instead of scanning every empty one
         count = 0
-        for bucket in range(NEW_BUCKET_COUNT):
-            for i in range(BUCKET_SIZE):
-                if self.new_matrix[bucket][i] != -1:
-                    count += 1
-                    uint64(unique_ids[self.new_matrix[bucket][i]]).stream(new_table)
-                    uint64(bucket).stream(new_table)
+        for bucket, i in sorted(self.used_new_matrix_positions.slots):
+            count += 1
+            uint64(unique_ids[self.new_matrix[bucket][i]]).stream(new_table)
+            uint64(bucket).stream(new_table)
 
         # give ourselves a clue how long the new_table is
         uint32(count).stream(out)
@@ -369,25 +415,21 @@ class AddressManager:
     def _set_new_matrix(self, row: int, col: int, value: int) -> None:
         self.new_matrix[row][col] = value
         if value == -1:
-            if (row, col) in self.used_new_matrix_positions:
-                self.used_new_matrix_positions.remove((row, col))
+            self.used_new_matrix_positions.remove((row, col))
         else:
-            if (row, col) not in self.used_new_matrix_positions:
-                self.used_new_matrix_positions.add((row, col))
+            self.used_new_matrix_positions.add((row, col))
 
     # Use only this method for modifying tried matrix.
     def _set_tried_matrix(self, row: int, col: int, value: int) -> None:
         self.tried_matrix[row][col] = value
         if value == -1:
-            if (row, col) in self.used_tried_matrix_positions:
-                self.used_tried_matrix_positions.remove((row, col))
+            self.used_tried_matrix_positions.remove((row, col))
         else:
-            if (row, col) not in self.used_tried_matrix_positions:
-                self.used_tried_matrix_positions.add((row, col))
+            self.used_tried_matrix_positions.add((row, col))
 
     def load_used_table_positions(self) -> None:
-        self.used_new_matrix_positions = set()
-        self.used_tried_matrix_positions = set()
+        self.used_new_matrix_positions = BucketSlotIndex()
+        self.used_tried_matrix_positions = BucketSlotIndex()
         for bucket in range(NEW_BUCKET_COUNT):
             for pos in range(BUCKET_SIZE):
                 if self.new_matrix[bucket][pos] != -1:
@@ -615,62 +657,33 @@ class AddressManager:
 
         # Use a 50% chance for choosing between tried and new table entries.
         if not new_only and self.tried_count > 0 and (self.new_count == 0 or randrange(2) == 0):
-            chance = 1.0
-            start = time.time()
-            cached_tried_matrix_positions: list[tuple[int, int]] = []
-            if len(self.used_tried_matrix_positions) < math.sqrt(TRIED_BUCKET_COUNT * BUCKET_SIZE):
-                cached_tried_matrix_positions = list(self.used_tried_matrix_positions)
-            while True:
-                if len(self.used_tried_matrix_positions) < math.sqrt(TRIED_BUCKET_COUNT * BUCKET_SIZE):
-                    if len(self.used_tried_matrix_positions) == 0:
-                        log.error(f"Empty tried table, but tried_count shows {self.tried_count}.")
-                        return None
-                    # The table is sparse, randomly pick from positions list.
-                    index = randrange(len(cached_tried_matrix_positions))
-                    tried_bucket, tried_bucket_pos = cached_tried_matrix_positions[index]
-                else:
-                    # The table is dense, randomly trying positions is faster than loading positions list.
-                    tried_bucket = randrange(TRIED_BUCKET_COUNT)
-                    tried_bucket_pos = randrange(BUCKET_SIZE)
-                    while self.tried_matrix[tried_bucket][tried_bucket_pos] == -1:
-                        tried_bucket = (tried_bucket + randbits(LOG_TRIED_BUCKET_COUNT)) % TRIED_BUCKET_COUNT
-                        tried_bucket_pos = (tried_bucket_pos + randbits(LOG_BUCKET_SIZE)) % BUCKET_SIZE
-
-                node_id = self.tried_matrix[tried_bucket][tried_bucket_pos]
-                assert node_id != -1
-                info = self.map_info[node_id]
-                if randbits(30) < (chance * info.get_selection_chance() * (1 << 30)):
-                    end = time.time()
-                    log.debug(f"address_manager.select_peer took {(end - start):.2e} seconds in tried table.")
-                    return info
-                chance *= 1.2
+            if len(self.used_tried_matrix_positions) == 0:
+                log.error(f"Empty tried table, but tried_count shows {self.tried_count}.")
+                return None
+            return self.select_from_table_(self.used_tried_matrix_positions, self.tried_matrix, "tried")
         else:
-            chance = 1.0
-            start = time.time()
-            cached_new_matrix_positions: list[tuple[int, int]] = []
-            if len(self.used_new_matrix_positions) < math.sqrt(NEW_BUCKET_COUNT * BUCKET_SIZE):
-                cached_new_matrix_positions = list(self.used_new_matrix_positions)
-            while True:
-                if len(self.used_new_matrix_positions) < math.sqrt(NEW_BUCKET_COUNT * BUCKET_SIZE):
-                    if len(self.used_new_matrix_positions) == 0:
-                        log.error(f"Empty new table, but new_count shows {self.new_count}.")
-                        return None
-                    index = randrange(len(cached_new_matrix_positions))
-                    new_bucket, new_bucket_pos = cached_new_matrix_positions[index]
-                else:
-                    new_bucket = randrange(NEW_BUCKET_COUNT)
-                    new_bucket_pos = randrange(BUCKET_SIZE)
-                    while self.new_matrix[new_bucket][new_bucket_pos] == -1:
-                        new_bucket = (new_bucket + randbits(LOG_NEW_BUCKET_COUNT)) % NEW_BUCKET_COUNT
-                        new_bucket_pos = (new_bucket_pos + randbits(LOG_BUCKET_SIZE)) % BUCKET_SIZE
-                node_id = self.new_matrix[new_bucket][new_bucket_pos]
-                assert node_id != -1
-                info = self.map_info[node_id]
-                if randbits(30) < chance * info.get_selection_chance() * (1 << 30):
-                    end = time.time()
-                    log.debug(f"address_manager.select_peer took {(end - start):.2e} seconds in new table.")
-                    return info
-                chance *= 1.2
+            if len(self.used_new_matrix_positions) == 0:
+                log.error(f"Empty new table, but new_count shows {self.new_count}.")
+                return None
+            return self.select_from_table_(self.used_new_matrix_positions, self.new_matrix, "new")
+
+    def select_from_table_(
+        self, used_positions: BucketSlotIndex, matrix: list[array[int]], table: str
+    ) -> ExtendedPeerInfo:
+        # Occupied slots are drawn straight from the dense index, so every iteration looks
+        # at a real entry and only the selection chance decides how many rounds it takes.
+        chance = 1.0
+        start = time.time()
+        while True:
+            bucket, bucket_pos = used_positions.random_slot()
+            node_id = matrix[bucket][bucket_pos]
+            assert node_id != -1
+            info = self.map_info[node_id]
+            if randbits(30) < chance * info.get_selection_chance() * (1 << 30):
+                end = time.time()
+                log.debug(f"address_manager.select_peer took {(end - start):.2e} seconds in {table} table.")
+                return info
+            chance *= 1.2
 
     def resolve_tried_collisions_(self) -> None:
         for node_id in self.tried_collisions[:]:
@@ -738,16 +751,16 @@ class AddressManager:
 
     def cleanup(self, max_timestamp_difference: int, max_consecutive_failures: int) -> None:
         now = int(math.floor(time.time()))
-        for bucket in range(NEW_BUCKET_COUNT):
-            for pos in range(BUCKET_SIZE):
-                if self.new_matrix[bucket][pos] != -1:
-                    node_id = self.new_matrix[bucket][pos]
-                    cur_info = self.map_info[node_id]
-                    if (
-                        cur_info.timestamp < now - max_timestamp_difference
-                        and cur_info.num_attempts >= max_consecutive_failures
-                    ):
-                        self.clear_new_(bucket, pos)
+        for bucket, pos in sorted(self.used_new_matrix_positions.slots):
+            node_id = self.new_matrix[bucket][pos]
+            if node_id == -1:
+                continue
+            cur_info = self.map_info[node_id]
+            if (
+                cur_info.timestamp < now - max_timestamp_difference
+                and cur_info.num_attempts >= max_consecutive_failures
+            ):
+                self.clear_new_(bucket, pos)
 
     def connect_(self, addr: PeerInfo, timestamp: int) -> None:
         info, _ = self.find_(addr)
@@ -34,6 +34,8 @@ from chia.util.task_referencer import create_referenced_task
 MAX_PEERS_RECEIVED_PER_REQUEST = 1000
 MAX_TOTAL_PEERS_RECEIVED = 3000
 MAX_CONCURRENT_OUTBOUND_CONNECTIONS = 70
+# upper bound on the number of outbound dials started in one pass of the connect loop
+MAX_DIALS_PER_ROUND = 8
 NETWORK_ID_DEFAULT_PORTS = {
     "mainnet": 8444,
     "testnet7": 58444,
@@ -65,7 +67,9 @@ class FullNodeDiscovery:
     connect_peers_task: Optional[asyncio.Task[None]] = field(default=None)
     serialize_task: Optional[asyncio.Task[None]] = field(default=None)
     cleanup_task: Optional[asyncio.Task[None]] = field(default=None)
+    feeler_task: Optional[asyncio.Task[None]] = field(default=None)
     initial_wait: int = field(default=0)
+    last_collision_timestamp: int = field(default=0)
     pending_outbound_connections: set[str] = field(default_factory=set)
     pending_tasks: set[asyncio.Task[None]] = field(default_factory=set)
     introducer_info_obj: Optional[UnresolvedPeerInfo] = field(default=None)
@@ -97,12 +101,14 @@ class FullNodeDiscovery:
         self.connect_peers_task = create_referenced_task(self._connect_to_peers(random))
         self.serialize_task = create_referenced_task(self._periodically_serialize(random))
         self.cleanup_task = create_referenced_task(self._periodically_cleanup())
+        self.feeler_task = create_referenced_task(self._make_feeler_connections(random))
 
     async def _close_common(self) -> None:
         self.is_closed = True
         cancel_task_safe(self.connect_peers_task, self.log)
         cancel_task_safe(self.serialize_task, self.log)
         cancel_task_safe(self.cleanup_task, self.log)
+        cancel_task_safe(self.feeler_task, self.log)
         for t in self.pending_tasks:
             cancel_task_safe(t, self.log)
         if len(self.pending_tasks) > 0:
@@ -157,6 +163,14 @@ class FullNodeDiscovery:
         outgoing = len(self.server.get_connections(NodeType.FULL_NODE, outbound=True))
         return max(0, target - outgoing)
 
+    def _num_dials_for_round(self) -> int:
+        # the dials already in flight count towards both the needed peers and the concurrency cap
+        pending = len(self.pending_outbound_connections)
+        return max(
+            1,
+            min(self._num_needed_peers() - pending, MAX_CONCURRENT_OUTBOUND_CONNECTIONS - pending, MAX_DIALS_PER_ROUND),
+        )
+
     """
     Uses the Poisson distribution to determine the next time
     when we'll initiate a feeler connection.
@@ -220,6 +234,8 @@ class FullNodeDiscovery:
             if self.address_manager is None:
                 return
             self.pending_outbound_connections.add(addr.host)
+            # start_client() bounds both the connect and the handshake by peer_connect_timeout, so
+            # a stalled peer can't hold a dial slot indefinitely
             client_connected = await self.server.start_client(
                 addr,
                 on_connect=self.on_connect_callback,
@@ -242,13 +258,11 @@ class FullNodeDiscovery:
             self.log.error(f"Traceback: {traceback.format_exc()}")
 
     async def _connect_to_peers(self, random: Random) -> None:
-        next_feeler = self._poisson_next_send(time.time() * 1000 * 1000, 240, random)
         retry_introducers = False
         dns_server_index: int = 0
         tried_all_dns_servers: bool = False
         local_peerinfo: Optional[PeerInfo] = await self.server.get_peer_info()
         last_timestamp_local_info: uint64 = uint64(int(time.time()))
-        last_collision_timestamp = 0
 
         if self.initial_wait > 0:
             await asyncio.sleep(self.initial_wait)
@@ -305,37 +319,24 @@ class FullNodeDiscovery:
                     group = peer.get_group()
                     groups.add(group)
 
-                # Feeler Connections
-                #
-                # Design goals:
-                # * Increase the number of connectable addresses in the tried table.
-                #
-                # Method:
-                # * Choose a random address from new and attempt to connect to it if we can connect
-                # successfully it is added to tried.
-                # * Start attempting feeler connections only after node finishes making outbound
-                # connections.
-                # * Only make a feeler connection once every few minutes.
-
-                is_feeler = False
+                # Feeler connections are made by _make_feeler_connections() on their own schedule.
                 has_collision = False
-                if self._num_needed_peers() == 0:
-                    if time.time() * 1000 * 1000 > next_feeler:
-                        next_feeler = self._poisson_next_send(time.time() * 1000 * 1000, 240, random)
-                        is_feeler = True
-
                 await self.address_manager.resolve_tried_collisions()
+
+                # While we are short of outbound peers, select a whole round of candidates (one per
+                # network group) and dial them concurrently instead of one per loop iteration.
+                dials_wanted = self._num_dials_for_round()
                 tries = 0
                 now = time.time()
-                got_peer = False
-                addr: Optional[PeerInfo] = None
+                candidates: list[PeerInfo] = []
                 max_tries = 50
                 if len(groups) < 3:
                     max_tries = 10
                 elif len(groups) <= 5:
                     max_tries = 25
+                max_tries += dials_wanted - 1
                 select_peer_interval = max(0.1, len(groups) * 0.25)
-                while not got_peer and not self.is_closed:
+                while len(candidates) < dials_wanted and not self.is_closed:
                     self.log.debug(f"Address manager query count: {tries}. Query limit: {max_tries}")
                     try:
                         await asyncio.sleep(select_peer_interval)
@@ -343,29 +344,28 @@ class FullNodeDiscovery:
                         return None
                     tries += 1
                     if tries > max_tries:
-                        addr = None
-                        retry_introducers = True
+                        if len(candidates) == 0:
+                            retry_introducers = True
                         break
                     info: Optional[ExtendedPeerInfo] = await self.address_manager.select_tried_collision()
-                    if info is None or time.time() - last_collision_timestamp <= 60:
-                        info = await self.address_manager.select_peer(is_feeler)
+                    if info is None or time.time() - self.last_collision_timestamp <= 60:
+                        info = await self.address_manager.select_peer()
                     else:
                         has_collision = True
-                        last_collision_timestamp = int(time.time())
+                        self.last_collision_timestamp = int(time.time())
                     if info is None:
-                        if not is_feeler:
+                        if len(candidates) == 0:
                             retry_introducers = True
                         break
-                    # Require outbound connections, other than feelers,
-                    # to be to distinct network groups.
                     addr = info.peer_info
                     if has_collision:
+                        if addr not in candidates:
+                            candidates.append(addr)
                         break
-                    if not is_feeler and addr.get_group() in groups:
-                        addr = None
+                    # Require outbound connections to be to distinct network groups.
+                    if addr.get_group() in groups:
                         continue
-                    if addr in connected:
-                        addr = None
+                    if addr in connected or addr.host in self.pending_outbound_connections:
                         continue
                     # attempt a node once per 30 minutes.
                     if now - info.last_try < 1800:
@@ -375,27 +375,31 @@ class FullNodeDiscovery:
                         last_timestamp_local_info = uint64(int(time.time()))
                     if local_peerinfo is not None and addr == local_peerinfo:
                         continue
-                    got_peer = True
+                    groups.add(addr.get_group())
+                    candidates.append(addr)
                     self.log.debug(f"Addrman selected address: {addr}.")
 
-                disconnect_after_handshake = is_feeler
+                disconnect_after_handshake = False
                 extra_peers_needed = self._num_needed_peers()
                 if extra_peers_needed == 0:
                     disconnect_after_handshake = True
                     retry_introducers = False
                 self.log.debug(f"Num peers needed: {extra_peers_needed}")
-                initiate_connection = extra_peers_needed > 0 or has_collision or is_feeler
+                initiate_connection = extra_peers_needed > 0 or has_collision
                 connect_peer_interval = max(0.25, len(groups) * 0.5)
                 if not initiate_connection:
                     connect_peer_interval += 15
                 connect_peer_interval = min(connect_peer_interval, self.peer_connect_interval)
-                if addr is not None and initiate_connection and addr.host not in self.pending_outbound_connections:
-                    if len(self.pending_outbound_connections) >= MAX_CONCURRENT_OUTBOUND_CONNECTIONS:
-                        self.log.debug("Max concurrent outbound connections reached. waiting")
-                        await asyncio.wait(self.pending_tasks, return_when=asyncio.FIRST_COMPLETED)
-                    self.pending_tasks.add(
-                        create_referenced_task(self.start_client_async(addr, disconnect_after_handshake))
-                    )
+                if initiate_connection:
+                    for addr in candidates:
+                        if addr.host in self.pending_outbound_connections:
+                            continue
+                        if len(self.pending_outbound_connections) >= MAX_CONCURRENT_OUTBOUND_CONNECTIONS:
+                            self.log.debug("Max concurrent outbound connections reached. waiting")
+                            await asyncio.wait(self.pending_tasks, return_when=asyncio.FIRST_COMPLETED)
+                        self.pending_tasks.add(
+                            create_referenced_task(self.start_client_async(addr, disconnect_after_handshake))
+                        )
 
                 await asyncio.sleep(connect_peer_interval)
 
@@ -406,6 +410,76 @@ class FullNodeDiscovery:
                 self.log.error(f"Exception in create outbound connections: {e}")
                 self.log.error(f"Traceback: {traceback.format_exc()}")
 
+    async def _make_feeler_connections(self, random: Random) -> None:
+        # Feeler Connections
+        #
+        # Design goals:
+        # * Increase the number of connectable addresses in the tried table.
+        #
+        # Method:
+        # * Choose a random address from new and attempt to connect to it if we can connect
+        # successfully it is added to tried.
+        # * Start attempting feeler connections only after node finishes making outbound
+        # connections.
+        # * Only make a feeler connection once every few minutes.
+        #
+        # This runs as its own task so feelers neither wait behind nor take a round from the
+        # outbound dials made by _connect_to_peers().
+        local_peerinfo: Optional[PeerInfo] = await self.server.get_peer_info()
+        last_timestamp_local_info: uint64 = uint64(int(time.time()))
+
+        if self.initial_wait > 0:
+            await asyncio.sleep(self.initial_wait)
+
+        while not self.is_closed:
+            next_feeler = self._poisson_next_send(time.time() * 1000 * 1000, 240, random)
+            try:
+                await asyncio.sleep(max(0.0, next_feeler / (1000 * 1000) - time.time()))
+            except asyncio.CancelledError:
+                return None
+            try:
+                if self.address_manager is None or self._num_needed_peers() > 0:
+                    continue
+                if len(self.pending_outbound_connections) >= MAX_CONCURRENT_OUTBOUND_CONNECTIONS:
+                    continue
+                if time.time() - last_timestamp_local_info > 1800 or local_peerinfo is None:
+                    local_peerinfo = await self.server.get_peer_info()
+                    last_timestamp_local_info = uint64(int(time.time()))
+                addr = await self._select_feeler_peer(local_peerinfo)
+                if addr is not None:
+                    self.pending_tasks.add(create_referenced_task(self.start_client_async(addr, True)))
+            except Exception as e:
+                self.log.error(f"Exception in feeler connections: {e}")
+                self.log.error(f"Traceback: {traceback.format_exc()}")
+
+    async def _select_feeler_peer(self, local_peerinfo: Optional[PeerInfo]) -> Optional[PeerInfo]:
+        assert self.address_manager is not None
+        # a tried table collision is resolved by connecting to the peer it's evicting
+        info: Optional[ExtendedPeerInfo] = await self.address_manager.select_tried_collision()
+        if info is not None and time.time() - self.last_collision_timestamp > 60:
+            self.last_collision_timestamp = int(time.time())
+            if info.peer_info.host in self.pending_outbound_connections:
+                return None
+            return info.peer_info
+
+        full_node_connected = self.server.get_connections(NodeType.FULL_NODE, outbound=True)
+        connected = [c.get_peer_info() for c in full_node_connected]
+        now = time.time()
+        for _ in range(10):
+            info = await self.address_manager.select_peer(True)
+            if info is None:
+                return None
+            addr = info.peer_info
+            if addr in connected or addr.host in self.pending_outbound_connections:
+                continue
+            # attempt a node once per 30 minutes.
+            if now - info.last_try < 1800:
+                continue
+            if local_peerinfo is not None and addr == local_peerinfo:
+                continue
+            return addr
+        return None
+
     async def _periodically_serialize(self, random: Random) -> None:
         while not self.is_closed:
             if self.address_manager is None:
@@ -491,7 +491,16 @@ class ChiaServer:
                 class_for_type=self.class_for_type,
                 session=session,
             )
-            await connection.perform_handshake(self._network_id, server_port, self._local_type)
+            try:
+                await asyncio.wait_for(
+                    connection.perform_handshake(self._network_id, server_port, self._local_type),
+                    timeout=timeout_value,
+                )
+            except asyncio.TimeoutError:
+                # a stalled handshake isn't a protocol violation, close without banning the peer
+                self.log.debug(f"Timeout error during handshake with {url}")
+                await connection.close()
+                return False
             await self.connection_added(connection, on_connect)
             # the session has been adopted by the connection, don't close it at
             # the end of the function
@@ -3,16 +3,20 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import contextlib
 import functools
+import json
+import logging
 import secrets
 import sqlite3
 import sys
-from collections.abc import AsyncIterator, Iterable
+import time
+from collections.abc import AsyncIterator, Awaitable, Collection, Iterable
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional, TextIO, Union
+from typing import Any, Callable, Optional, TextIO, Union
 
 import aiosqlite
 import anyio
@@ -26,6 +30,12 @@ else:
 # integers in sqlite are limited by int64
 SQLITE_INT_MAX = 2**63 - 1
 
+# upper bounds (in seconds) of the buckets of the reader timing histograms. The
+# last bucket is implicit and collects everything slower than the last bound
+READER_TIMING_BUCKETS: tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+log = logging.getLogger(__name__)
+
 
 class DBWrapperError(Exception):
     pass
@@ -61,11 +71,101 @@ class PurposefulAbort(DBWrapperError):
         self.obj = obj
 
 
+@dataclass
+class TimingHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(READER_TIMING_BUCKETS) + 1))
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, duration: float) -> None:
+        self.counts[bisect.bisect_left(READER_TIMING_BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def to_json_dict(self) -> dict[str, Any]:
+        buckets = {str(bound): count for bound, count in zip(READER_TIMING_BUCKETS, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+@dataclass
+class ReaderCallSiteStats:
+    queue_wait: TimingHistogram = field(default_factory=TimingHistogram)
+    execution: TimingHistogram = field(default_factory=TimingHistogram)
+    slow_queries: int = 0
+
+    def to_json_dict(self) -> dict[str, Any]:
+        return {
+            "queue_wait": self.queue_wait.to_json_dict(),
+            "execution": self.execution.to_json_dict(),
+            "slow_queries": self.slow_queries,
+        }
+
+
 def generate_in_memory_db_uri() -> str:
     # We need to use shared cache as our DB wrapper uses different types of connections
     return f"file:db_{secrets.token_hex(16)}?mode=memory&cache=shared"
 
 
+def key_set_subquery(keys: Collection[Any]) -> tuple[str, list[Any]]:
+    """
+    Returns a subquery selecting the keys, and its parameters. The keys are
+    bound as a handful of parameters, no matter how many there are. Byte
+    string keys are concatenated into one blob per key size, and split up
+    again by a recursive CTE. Other keys (e.g. integers) are passed as a JSON
+    array.
+    """
+    assert len(keys) > 0
+    if not all(isinstance(key, bytes) for key in keys):
+        return "SELECT value FROM json_each(?)", [json.dumps(list(keys))]
+
+    keys_by_size: dict[int, list[bytes]] = {}
+    for key in keys:
+        keys_by_size.setdefault(len(key), []).append(key)
+    selects: list[str] = []
+    parameters: list[Any] = [max(len(sized_keys) for sized_keys in keys_by_size.values())]
+    for size, sized_keys in keys_by_size.items():
+        selects.append(f"SELECT substr(?, i * {size} + 1, {size}) FROM key_index WHERE i < ?")
+        parameters.extend([b"".join(sized_keys), len(sized_keys)])
+    sql = (
+        "WITH RECURSIVE key_index(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM key_index WHERE i + 1 < ?) "
+        + " UNION ALL ".join(selects)
+    )
+    return sql, parameters
+
+
+async def execute_key_set_query(
+    c: aiosqlite.Connection,
+    template: str,
+    keys: Collection[Any],
+    parameters: Iterable[Any] = (),
+    *,
+    limit: Optional[int] = None,
+) -> list[sqlite3.Row]:
+    """
+    Runs the template, with the "{in_list}" placeholder replaced by a subquery
+    selecting the keys (see key_set_subquery()), followed by the parameters,
+    and returns the rows. This looks up any number of keys in a single
+    statement, without running into the host parameter limit. Nothing is
+    written, so this works on query_only reader connections. If limit is set,
+    the template must end with "LIMIT ?".
+    """
+    if len(keys) == 0:
+        return []
+    subquery, key_parameters = key_set_subquery(keys)
+    all_parameters = [*key_parameters, *parameters]
+    if limit is not None:
+        all_parameters.append(limit)
+    return list(await c.execute_fetchall(template.replace("{in_list}", subquery), all_parameters))
+
+
 async def execute_fetchone(
     c: aiosqlite.Connection, sql: str, parameters: Optional[Iterable[Any]] = None
 ) -> Optional[sqlite3.Row]:
@@ -146,16 +246,38 @@ class DBWrapper2:
     _lock: asyncio.Lock = field(default_factory=asyncio.Lock)
     _read_connections: asyncio.Queue[aiosqlite.Connection] = field(default_factory=asyncio.Queue)
     _num_read_connections: int = 0
+    # long running queries (e.g. large scans) are served from their own lane of
+    # connections, so they can't starve short lookups. If there are no long
+    # lane connections, long queries share the regular pool
+    _long_read_connections: asyncio.Queue[aiosqlite.Connection] = field(default_factory=asyncio.Queue)
+    _num_long_read_connections: int = 0
+    # the regular pool grows on demand, up to this many connections, when all
+    # readers are busy. Growing requires a _create_read_connection function
+    max_reader_count: int = 0
+    # the long lane grows the same way, up to this many connections
+    max_long_reader_count: int = 0
+    _create_read_connection: Optional[Callable[[str], Awaitable[aiosqlite.Connection]]] = None
+    # reads holding a connection for longer than this (in seconds) are logged
+    slow_query_threshold: Optional[float] = None
+    _reader_stats: dict[str, ReaderCallSiteStats] = field(default_factory=dict)
     _in_use: dict[asyncio.Task[object], aiosqlite.Connection] = field(default_factory=dict)
     _current_writer: Optional[asyncio.Task[object]] = None
+    # bumped every time a top level write transaction ends (whether it committed or rolled back)
+    _write_generation: int = 0
     _savepoint_name: int = 0
 
-    async def add_connection(self, c: aiosqlite.Connection) -> None:
+    async def add_connection(self, c: aiosqlite.Connection, long_query: bool = False) -> None:
         # this guarantees that reader connections can only be used for reading
         assert c != self._write_connection
-        await c.execute("pragma query_only")
-        self._read_connections.put_nowait(c)
-        self._num_read_connections += 1
+        await c.execute("pragma query_only = ON")
+        if long_query:
+            self._long_read_connections.put_nowait(c)
+            self._num_long_read_connections += 1
+            self.max_long_reader_count = max(self.max_long_reader_count, self._num_long_read_connections)
+        else:
+            self._read_connections.put_nowait(c)
+            self._num_read_connections += 1
+            self.max_reader_count = max(self.max_reader_count, self._num_read_connections)
 
     @classmethod
     @contextlib.asynccontextmanager
@@ -166,6 +288,10 @@ class DBWrapper2:
         db_version: int = 1,
         uri: bool = False,
         reader_count: int = 4,
+        long_reader_count: int = 0,
+        max_reader_count: Optional[int] = None,
+        max_long_reader_count: Optional[int] = None,
+        slow_query_threshold: Optional[float] = None,
         log_path: Optional[Path] = None,
         journal_mode: str = "WAL",
         synchronous: Optional[str] = None,
@@ -193,19 +319,35 @@ class DBWrapper2:
 
             write_connection.row_factory = row_factory
 
-            self = cls(_write_connection=write_connection, db_version=db_version, _log_file=log_file)
+            self = cls(
+                _write_connection=write_connection,
+                db_version=db_version,
+                _log_file=log_file,
+                slow_query_threshold=slow_query_threshold,
+            )
 
-            for index in range(reader_count):
+            async def create_read_connection(name: str) -> aiosqlite.Connection:
                 read_connection = await async_exit_stack.enter_async_context(
                     manage_connection(
                         database=database,
                         uri=uri,
                         log_file=log_file,
-                        name=f"reader-{index}",
+                        name=name,
                     ),
                 )
                 read_connection.row_factory = row_factory
-                await self.add_connection(c=read_connection)
+                return read_connection
+
+            for index in range(reader_count):
+                await self.add_connection(c=await create_read_connection(f"reader-{index}"))
+            for index in range(long_reader_count):
+                await self.add_connection(c=await create_read_connection(f"long-reader-{index}"), long_query=True)
+
+            self._create_read_connection = create_read_connection
+            if max_reader_count is not None:
+                self.max_reader_count = max(self.max_reader_count, max_reader_count)
+            if max_long_reader_count is not None:
+                self.max_long_reader_count = max(self.max_long_reader_count, max_long_reader_count)
 
             try:
                 yield self
@@ -214,6 +356,9 @@ class DBWrapper2:
                     while self._num_read_connections > 0:
                         await self._read_connections.get()
                         self._num_read_connections -= 1
+                    while self._num_long_read_connections > 0:
+                        await self._long_read_connections.get()
+                        self._num_long_read_connections -= 1
 
     @classmethod
     async def create(
@@ -223,6 +368,10 @@ class DBWrapper2:
         db_version: int = 1,
         uri: bool = False,
         reader_count: int = 4,
+        long_reader_count: int = 0,
+        max_reader_count: Optional[int] = None,
+        max_long_reader_count: Optional[int] = None,
+        slow_query_threshold: Optional[float] = None,
         log_path: Optional[Path] = None,
         journal_mode: str = "WAL",
         synchronous: Optional[str] = None,
@@ -244,17 +393,33 @@ class DBWrapper2:
 
         write_connection.row_factory = row_factory
 
-        self = cls(_write_connection=write_connection, db_version=db_version, _log_file=log_file)
+        self = cls(
+            _write_connection=write_connection,
+            db_version=db_version,
+            _log_file=log_file,
+            slow_query_threshold=slow_query_threshold,
+        )
 
-        for index in range(reader_count):
+        async def create_read_connection(name: str) -> aiosqlite.Connection:
             read_connection = await _create_connection(
                 database=database,
                 uri=uri,
                 log_file=log_file,
-                name=f"reader-{index}",
+                name=name,
             )
             read_connection.row_factory = row_factory
-            await self.add_connection(c=read_connection)
+            return read_connection
+
+        for index in range(reader_count):
+            await self.add_connection(c=await create_read_connection(f"reader-{index}"))
+        for index in range(long_reader_count):
+            await self.add_connection(c=await create_read_connection(f"long-reader-{index}"), long_query=True)
+
+        self._create_read_connection = create_read_connection
+        if max_reader_count is not None:
+            self.max_reader_count = max(self.max_reader_count, max_reader_count)
+        if max_long_reader_count is not None:
+            self.max_long_reader_count = max(self.max_long_reader_count, max_long_reader_count)
 
         return self
 
@@ -264,6 +429,9 @@ class DBWrapper2:
             while self._num_read_connections > 0:
                 await (await self._read_connections.get()).close()
                 self._num_read_connections -= 1
+            while self._num_long_read_connections > 0:
+                await (await self._long_read_connections.get()).close()
+                self._num_long_read_connections -= 1
             await self._write_connection.close()
         finally:
             if self._log_file is not None:
@@ -326,15 +494,18 @@ class DBWrapper2:
                         self._set_foreign_key_enforcement(enabled=foreign_key_enforcement_enabled),
                     )
 
-                async with self._savepoint_ctx():
-                    self._current_writer = task
-                    try:
-                        yield self._write_connection
-
-                        if foreign_key_enforcement_enabled is not None and not foreign_key_enforcement_enabled:
-                            await self._check_foreign_keys()
-                    finally:
-                        self._current_writer = None
+                try:
+                    async with self._savepoint_ctx():
+                        self._current_writer = task
+                        try:
+                            yield self._write_connection
+
+                            if foreign_key_enforcement_enabled is not None and not foreign_key_enforcement_enabled:
+                                await self._check_foreign_keys()
+                        finally:
+                            self._current_writer = None
+                finally:
+                    self._write_generation += 1
 
     @contextlib.asynccontextmanager
     async def _set_foreign_key_enforcement(self, enabled: bool) -> AsyncIterator[None]:
@@ -382,16 +553,37 @@ class DBWrapper2:
             return
 
         async with self._lock:
-            async with self._savepoint_ctx():
-                self._current_writer = task
-                try:
-                    yield self._write_connection
-                finally:
-                    self._current_writer = None
+            try:
+                async with self._savepoint_ctx():
+                    self._current_writer = task
+                    try:
+                        yield self._write_connection
+                    finally:
+                        self._current_writer = None
+            finally:
+                self._write_generation += 1
+
+    @property
+    def write_generation(self) -> int:
+        """
+        A number that changes whenever a write transaction ends. Anything computed from the database while
+        write_generation had a given value is still current for as long as it keeps that value, which makes
+        it a cheap way to tell whether a cached result needs to be recomputed.
+        """
+        return self._write_generation
+
+    def current_task_is_writer(self) -> bool:
+        """
+        Whether the calling task is in a write transaction, i.e. may see changes that haven't been committed (and
+        aren't reflected in write_generation) yet.
+        """
+        return self._current_writer is not None and self._current_writer == asyncio.current_task()
 
     @contextlib.asynccontextmanager
-    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
-        async with self.reader_no_transaction() as connection:
+    async def reader(
+        self, call_site: Optional[str] = None, long_query: bool = False
+    ) -> AsyncIterator[aiosqlite.Connection]:
+        async with self.reader_no_transaction(call_site=call_site, long_query=long_query) as connection:
             if connection.in_transaction:
                 yield connection
             else:
@@ -404,7 +596,14 @@ class DBWrapper2:
                     await connection.rollback()
 
     @contextlib.asynccontextmanager
-    async def reader_no_transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+    async def reader_no_transaction(
+        self, call_site: Optional[str] = None, long_query: bool = False
+    ) -> AsyncIterator[aiosqlite.Connection]:
+        """
+        Acquires a read connection. call_site names the caller in the reader
+        statistics, long_query routes the read to the lane reserved for long
+        running queries (if there is one), so it doesn't hold up short lookups.
+        """
         # there should have been read connections added
         assert self._num_read_connections > 0
 
@@ -426,7 +625,14 @@ class DBWrapper2:
         if task in self._in_use:
             yield self._in_use[task]
         else:
-            c = await self._read_connections.get()
+            queue_start = time.monotonic()
+            if long_query and self._num_long_read_connections > 0:
+                queue = self._long_read_connections
+                c = await self._get_long_read_connection()
+            else:
+                queue = self._read_connections
+                c = await self._get_read_connection()
+            start = time.monotonic()
             try:
                 # record our connection in this dict to allow nested calls in
                 # the same task to use the same connection
@@ -434,4 +640,73 @@ class DBWrapper2:
                 yield c
             finally:
                 del self._in_use[task]
-                self._read_connections.put_nowait(c)
+                queue.put_nowait(c)
+                self._record_read(call_site, start - queue_start, time.monotonic() - start)
+
+    async def _get_read_connection(self) -> aiosqlite.Connection:
+        if (
+            not self._read_connections.empty()
+            or self._num_read_connections >= self.max_reader_count
+            or self._create_read_connection is None
+        ):
+            return await self._read_connections.get()
+
+        # all readers are busy, grow the pool. The connection is counted before
+        # it's opened, to not overshoot the limit with concurrent requests
+        self._num_read_connections += 1
+        try:
+            c = await self._create_read_connection(f"reader-{self._num_read_connections - 1}")
+            await c.execute("pragma query_only = ON")
+        except BaseException:
+            self._num_read_connections -= 1
+            raise
+        log.info(f"database reader pool grown to {self._num_read_connections} connections")
+        return c
+
+    async def _get_long_read_connection(self) -> aiosqlite.Connection:
+        if (
+            not self._long_read_connections.empty()
+            or self._num_long_read_connections >= self.max_long_reader_count
+            or self._create_read_connection is None
+        ):
+            return await self._long_read_connections.get()
+
+        self._num_long_read_connections += 1
+        try:
+            c = await self._create_read_connection(f"long-reader-{self._num_long_read_connections - 1}")
+            await c.execute("pragma query_only = ON")
+        except BaseException:
+            self._num_long_read_connections -= 1
+            raise
+        log.info(f"database long reader lane grown to {self._num_long_read_connections} connections")
+        return c
+
+    def _record_read(self, call_site: Optional[str], queue_wait: float, execution: float) -> None:
+        name = "unspecified" if call_site is None else call_site
+        stats = self._reader_stats.get(name)
+        if stats is None:
+            stats = ReaderCallSiteStats()
+            self._reader_stats[name] = stats
+        stats.queue_wait.add(queue_wait)
+        stats.execution.add(execution)
+        if self.slow_query_threshold is not None and execution > self.slow_query_threshold:
+            stats.slow_queries += 1
+            log.warning(
+                f"slow database read from {name}: held a connection for {execution:0.3f}s "
+                f"after waiting {queue_wait:0.3f}s for it"
+            )
+
+    def reader_stats(self) -> dict[str, Any]:
+        return {
+            "reader_count": self._num_read_connections,
+            "max_reader_count": self.max_reader_count,
+            "idle_readers": self._read_connections.qsize(),
+            "long_reader_count": self._num_long_read_connections,
+            "max_long_reader_count": self.max_long_reader_count,
+            "idle_long_readers": self._long_read_connections.qsize(),
+            "slow_query_threshold": self.slow_query_threshold,
+            "call_sites": {name: stats.to_json_dict() for name, stats in self._reader_stats.items()},
+        }
+
+    def reset_reader_stats(self) -> None:
+        self._reader_stats.clear()
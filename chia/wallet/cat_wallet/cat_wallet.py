@@ -381,7 +381,9 @@ class CATWallet:
                         [coin.parent_coin_info], peer=peer
                     )
                     assert coin_state[0].coin.name() == coin.parent_coin_info
-                    coin_spend = await fetch_coin_spend_for_coin_state(coin_state[0], peer)
+                    coin_spend = await fetch_coin_spend_for_coin_state(
+                        coin_state[0], peer, self.wallet_state_manager.wallet_node.get_cache_for_peer(peer)
+                    )
                     cat_curried_args = match_cat_puzzle(uncurry_puzzle(coin_spend.puzzle_reveal))
                     if cat_curried_args is not None:
                         cat_mod_hash, tail_program_hash, cat_inner_puzzle = cat_curried_args
@@ -500,8 +502,8 @@ class CATWallet:
         Returns a set of coins that can be used for generating a new transaction.
         Note: Must be called under wallet state manager lock
         """
-        spendable_amount: uint128 = await self.get_spendable_balance()
         spendable_coins: list[WalletCoinRecord] = await self.get_cat_spendable_coins()
+        spendable_amount = uint128(sum(record.coin.amount for record in spendable_coins))
 
         # Try to use coins from the store, if there isn't enough of "unused"
         # coins use change coins that are not confirmed yet
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 import random
+import time
 from typing import Optional
 
 from chia_rs.sized_bytes import bytes32
@@ -11,6 +12,10 @@ from chia.types.blockchain_format.coin import Coin
 from chia.wallet.util.tx_config import CoinSelectionConfig
 from chia.wallet.wallet_coin_record import WalletCoinRecord
 
+# how long (in seconds) select_coins() may spend searching for a good combination of coins, before settling for
+# the best one found so far
+DEFAULT_SELECTION_TIME_BUDGET = 0.5
+
 
 async def select_coins(
     spendable_amount: uint128,
@@ -19,10 +24,13 @@ async def select_coins(
     unconfirmed_removals: dict[bytes32, Coin],
     log: logging.Logger,
     amount: uint128,
+    time_budget: float = DEFAULT_SELECTION_TIME_BUDGET,
 ) -> set[Coin]:
     """
     Returns a set of coins that can be used for generating a new transaction.
+    spendable_coins are cheapest to filter and sort when they're already in descending amount order.
     """
+    deadline = time.monotonic() + time_budget
     if amount > spendable_amount:
         error_msg = (
             f"Can't select amount higher than our spendable balance.  Amount: {amount}, spendable: {spendable_amount}"
@@ -36,18 +44,20 @@ async def select_coins(
     sum_spendable_coins = 0
     valid_spendable_coins: list[Coin] = []
 
+    excluded_coin_ids = set(coin_selection_config.excluded_coin_ids)
+    excluded_coin_amounts = set(coin_selection_config.excluded_coin_amounts)
     for coin_record in spendable_coins:  # remove all the unconfirmed coins, excluded coins and dust.
-        coin_name: bytes32 = coin_record.coin.name()
-        if coin_name in unconfirmed_removals:
-            continue
-        if coin_name in coin_selection_config.excluded_coin_ids:
-            continue
         if (
             coin_record.coin.amount < coin_selection_config.min_coin_amount
             or coin_record.coin.amount > coin_selection_config.max_coin_amount
         ):
             continue
-        if coin_record.coin.amount in coin_selection_config.excluded_coin_amounts:
+        if coin_record.coin.amount in excluded_coin_amounts:
+            continue
+        coin_name: bytes32 = coin_record.coin.name()
+        if coin_name in unconfirmed_removals:
+            continue
+        if coin_name in excluded_coin_ids:
             continue
         valid_spendable_coins.append(coin_record.coin)
         sum_spendable_coins += coin_record.coin.amount
@@ -90,8 +100,16 @@ async def select_coins(
         log.debug(f"Selected closest greater coin: {smallest_coin.name()}")
         return {smallest_coin}
     elif smaller_coin_sum > amount:
-        coin_set: Optional[set[Coin]] = knapsack_coin_algorithm(
-            smaller_coins, amount, coin_selection_config.max_coin_amount, max_num_coins
+        # look for a combination that needs no change first, and leave the rest of the time to the knapsack
+        now = time.monotonic()
+        coin_set: Optional[set[Coin]] = branch_and_bound_coin_algorithm(
+            smaller_coins, amount, max_num_coins, now + (deadline - now) / 2
+        )
+        if coin_set is not None:
+            log.debug(f"Selected coins from branch and bound algorithm: {coin_set}")
+            return coin_set
+        coin_set = knapsack_coin_algorithm(
+            smaller_coins, amount, coin_selection_config.max_coin_amount, max_num_coins, deadline=deadline
         )
         log.debug(f"Selected coins from knapsack algorithm: {coin_set}")
         if coin_set is None:
@@ -137,16 +155,63 @@ def select_smallest_coin_over_target(target: uint128, sorted_coin_list: list[Coi
     assert False  # Should never reach here
 
 
+# we use this to find a set of at most max_num_coins coins which add up to exactly the target, so no change is
+# needed. It's a depth first search that tries the largest coins first, skips branches that can't reach the target
+# and coins with the same amount as one that was just tried. The search gives up (returning None) at deadline, as
+# measured by time.monotonic(). The coins must be sorted in descending amount order, and all be smaller than target.
+def branch_and_bound_coin_algorithm(
+    smaller_coins: list[Coin], target: uint128, max_num_coins: int, deadline: float
+) -> Optional[set[Coin]]:
+    amounts = [coin.amount for coin in smaller_coins]
+    # remaining[i] is the sum of the amounts of smaller_coins[i:]
+    remaining = [0] * (len(amounts) + 1)
+    for i in range(len(amounts) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + amounts[i]
+
+    selected: list[int] = []
+    selected_sum = 0
+    i = 0
+    steps = 0
+    while True:
+        if selected_sum == target:
+            return {smaller_coins[index] for index in selected}
+        steps += 1
+        if steps % 1000 == 0 and time.monotonic() > deadline:
+            return None
+        if i < len(amounts) and len(selected) < max_num_coins and selected_sum + remaining[i] >= target:
+            if selected_sum + amounts[i] <= target:
+                selected.append(i)
+                selected_sum += amounts[i]
+            i += 1
+            continue
+        # dead end, undo the last selection and try without it
+        if len(selected) == 0:
+            return None
+        last = selected.pop()
+        selected_sum -= amounts[last]
+        i = last + 1
+        while i < len(amounts) and amounts[i] == amounts[last]:
+            i += 1
+
+
 # we use this to find the set of coins which have total value closest to the target, but at least the target.
 # IMPORTANT: The coins have to be sorted in descending order or else this function will not work.
 def knapsack_coin_algorithm(
-    smaller_coins: list[Coin], target: uint128, max_coin_amount: int, max_num_coins: int, seed: bytes = b"knapsack seed"
+    smaller_coins: list[Coin],
+    target: uint128,
+    max_coin_amount: int,
+    max_num_coins: int,
+    seed: bytes = b"knapsack seed",
+    deadline: Optional[float] = None,
 ) -> Optional[set[Coin]]:
     best_set_sum = max_coin_amount
     best_set_of_coins: Optional[set[Coin]] = None
     ran: random.Random = random.Random()
     ran.seed(seed)
     for i in range(1000):
+        # settle for the best set so far once we're out of time
+        if deadline is not None and i > 0 and time.monotonic() > deadline:
+            break
         # reset these variables every loop.
         selected_coins: set[Coin] = set()
         selected_coins_sum = 0
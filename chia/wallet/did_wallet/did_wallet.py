@@ -379,7 +379,9 @@ class DIDWallet:
                     coin_names=[coin.parent_coin_info], peer=peer
                 )
             )[0]
-            coin_spend = await fetch_coin_spend_for_coin_state(parent_state, peer)
+            coin_spend = await fetch_coin_spend_for_coin_state(
+                parent_state, peer, self.wallet_state_manager.wallet_node.get_cache_for_peer(peer)
+            )
             uncurried = uncurry_puzzle(coin_spend.puzzle_reveal)
             did_curried_args = match_did_puzzle(uncurried.mod, uncurried.args)
             assert did_curried_args is not None
@@ -520,7 +522,12 @@ class DIDWallet:
 
                     await self.save_info(did_info)
                     assert children_state.created_height
-                    parent_spend = await fetch_coin_spend(uint32(children_state.created_height), parent_coin, peer)
+                    parent_spend = await fetch_coin_spend(
+                        uint32(children_state.created_height),
+                        parent_coin,
+                        peer,
+                        self.wallet_state_manager.wallet_node.get_cache_for_peer(peer),
+                    )
                     assert parent_spend is not None
                     parent_innerpuz = get_inner_puzzle_from_singleton(parent_spend.puzzle_reveal)
                     assert parent_innerpuz is not None
@@ -3,7 +3,7 @@ from __future__ import annotations
 import asyncio
 from typing import Any, Optional
 
-from chia_rs import CoinState, HeaderBlock
+from chia_rs import CoinSpend, CoinState, HeaderBlock
 from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint32, uint64
 
@@ -19,6 +19,7 @@ class PeerRequestCache:
     _blocks_validated: LRUCache[bytes32, uint32]  # header_hash -> height
     _block_signatures_validated: LRUCache[bytes32, uint32]  # sig_hash -> height
     _additions_in_block: LRUCache[tuple[bytes32, bytes32], uint32]  # header_hash, puzzle_hash -> height
+    _coin_spends: LRUCache[bytes32, tuple[uint32, asyncio.Task[CoinSpend]]]  # coin id -> spent height, Task
     # The wallet gets the state update before receiving the block. In untrusted mode the block is required for the
     # coin state validation, so we cache them before we apply them once we received the block.
     _race_cache: dict[uint32, set[CoinState]]
@@ -31,6 +32,7 @@ class PeerRequestCache:
         self._blocks_validated = LRUCache(1000)
         self._block_signatures_validated = LRUCache(1000)
         self._additions_in_block = LRUCache(200)
+        self._coin_spends = LRUCache(1000)
         self._race_cache = {}
 
     def get_block(self, height: uint32) -> Optional[HeaderBlock]:
@@ -91,6 +93,17 @@ class PeerRequestCache:
     def in_additions_in_block(self, header_hash: bytes32, addition_ph: bytes32) -> bool:
         return self._additions_in_block.get((header_hash, addition_ph)) is not None
 
+    def get_coin_spend_request(self, coin_id: bytes32, spent_height: uint32) -> Optional[asyncio.Task[CoinSpend]]:
+        entry = self._coin_spends.get(coin_id)
+        if entry is None or entry[0] != spent_height:
+            return None
+        return entry[1]
+
+    def add_to_coin_spend_requests(
+        self, coin_id: bytes32, spent_height: uint32, request: asyncio.Task[CoinSpend]
+    ) -> None:
+        self._coin_spends.put(coin_id, (spent_height, request))
+
     def add_states_to_race_cache(self, coin_states: list[CoinState]) -> None:
         for coin_state in coin_states:
             created_height = 0 if coin_state.created_height is None else coin_state.created_height
@@ -156,6 +169,14 @@ class PeerRequestCache:
                 new_additions_in_block.put((hh, ph), h)
         self._additions_in_block = new_additions_in_block
 
+        new_coin_spends: LRUCache[bytes32, tuple[uint32, asyncio.Task[CoinSpend]]] = LRUCache(
+            self._coin_spends.capacity
+        )
+        for coin_id, (h, request) in self._coin_spends.cache.items():
+            if h <= height:
+                new_coin_spends.put(coin_id, (h, request))
+        self._coin_spends = new_coin_spends
+
 
 def can_use_peer_request_cache(
     coin_state: CoinState, peer_request_cache: PeerRequestCache, fork_height: Optional[uint32]
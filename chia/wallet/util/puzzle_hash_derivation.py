@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Optional
+
+from chia_rs import G1Element
+from chia_rs.sized_bytes import bytes32
+
+from chia.wallet.derive_keys import _derive_pk_unhardened
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
+
+
+def _derive_unhardened_range(intermediate_pk: bytes, start: int, end: int) -> list[tuple[bytes, bytes32]]:
+    # this runs in a worker process, so it takes and returns bytes
+    pk = G1Element.from_bytes(intermediate_pk)
+    ret: list[tuple[bytes, bytes32]] = []
+    for index in range(start, end):
+        child = _derive_pk_unhardened(pk, [index])
+        ret.append((bytes(child), puzzle_hash_for_pk(child)))
+    return ret
+
+
+async def derive_unhardened_keys(
+    intermediate_pk: G1Element,
+    start: int,
+    end: int,
+    *,
+    num_workers: int,
+    min_pool_size: int,
+    multiprocessing_context: Optional[BaseContext] = None,
+) -> list[tuple[G1Element, bytes32]]:
+    """
+    Derives the unhardened child public keys of intermediate_pk for the indexes in [start, end), along with
+    the standard puzzle hash of each key.
+    Ranges of at least min_pool_size indexes are split between num_workers worker processes. Smaller ranges
+    (or num_workers == 0) are derived right here, since starting the processes costs more than it saves.
+    """
+    count = end - start
+    if count <= 0:
+        return []
+
+    if num_workers < 1 or count < min_pool_size:
+        ret: list[tuple[G1Element, bytes32]] = []
+        for index in range(start, end):
+            child = _derive_pk_unhardened(intermediate_pk, [index])
+            ret.append((child, puzzle_hash_for_pk(child)))
+        return ret
+
+    chunk_size = math.ceil(count / num_workers)
+    loop = asyncio.get_running_loop()
+    pk_bytes = bytes(intermediate_pk)
+    with ProcessPoolExecutor(num_workers, mp_context=multiprocessing_context) as executor:
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    executor, _derive_unhardened_range, pk_bytes, chunk_start, min(chunk_start + chunk_size, end)
+                )
+                for chunk_start in range(start, end, chunk_size)
+            )
+        )
+
+    # the keys come from our own worker processes, so there's no need to validate them again
+    return [(G1Element.from_bytes_unchecked(pk), puzzle_hash) for chunk in chunks for pk, puzzle_hash in chunk]
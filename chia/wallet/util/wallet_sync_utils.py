@@ -1,9 +1,12 @@
 from __future__ import annotations
 
 import asyncio
+import dataclasses
 import logging
 import random
-from typing import Any, Optional, Union
+from collections import deque
+from collections.abc import Awaitable, Coroutine, Iterable
+from typing import Any, Callable, Optional, TypeVar, Union
 
 from chia_rs import (
     CoinSpend,
@@ -46,6 +49,8 @@ from chia.wallet.util.peer_request_cache import PeerRequestCache
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class PeerRequestException(Exception):
     pass
@@ -86,6 +91,36 @@ async def subscribe_to_coin_updates(
     return all_coins_state.coin_states
 
 
+async def process_in_order(
+    requests: Iterable[Coroutine[Any, Any, T]],
+    process: Callable[[T], Awaitable[bool]],
+    max_in_flight: int,
+) -> bool:
+    """
+    Runs up to max_in_flight of the requests concurrently, and passes their results to process() one at
+    a time, in the order the requests were made. This lets us fetch the next few batches from a peer
+    while we're still applying the previous one. Requests are only started once there is room for them,
+    so requests can be a generator that builds them lazily.
+    If process() returns False, the remaining requests are cancelled and we return False.
+    """
+    in_flight: deque[asyncio.Task[T]] = deque()
+    try:
+        for request in requests:
+            in_flight.append(create_referenced_task(request))
+            if len(in_flight) < max_in_flight:
+                continue
+            if not await process(await in_flight.popleft()):
+                return False
+        while len(in_flight) > 0:
+            if not await process(await in_flight.popleft()):
+                return False
+        return True
+    finally:
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+
+
 def validate_additions(
     coins: list[tuple[bytes32, list[Coin]]],
     proofs: Optional[list[tuple[bytes32, bytes, Optional[bytes]]]],
@@ -334,7 +369,7 @@ async def fetch_header_blocks_in_range(
     return blocks
 
 
-async def fetch_coin_spend(height: uint32, coin: Coin, peer: WSChiaConnection) -> CoinSpend:
+async def _fetch_coin_spend_inner(height: uint32, coin: Coin, peer: WSChiaConnection) -> CoinSpend:
     solution_response = await peer.call_api(
         FullNodeAPI.request_puzzle_solution, RequestPuzzleSolution(coin.name(), height)
     )
@@ -350,7 +385,53 @@ async def fetch_coin_spend(height: uint32, coin: Coin, peer: WSChiaConnection) -
     )
 
 
-async def fetch_coin_spend_for_coin_state(coin_state: CoinState, peer: WSChiaConnection) -> CoinSpend:
+async def fetch_coin_spend(
+    height: uint32, coin: Coin, peer: WSChiaConnection, peer_request_cache: Optional[PeerRequestCache] = None
+) -> CoinSpend:
+    if peer_request_cache is None:
+        return await _fetch_coin_spend_inner(height, coin, peer)
+
+    # Sibling coins share a parent, so the same spend tends to be requested several times, often concurrently.
+    # Concurrent lookups wait for the same request, and failed requests are not reused.
+    coin_id = coin.name()
+    request = peer_request_cache.get_coin_spend_request(coin_id, height)
+    if request is None or (request.done() and (request.cancelled() or request.exception() is not None)):
+        request = create_referenced_task(_fetch_coin_spend_inner(height, coin, peer))
+        peer_request_cache.add_to_coin_spend_requests(coin_id, height, request)
+    # shielded, so that one caller being cancelled doesn't cancel the request for everyone else waiting on it
+    return await asyncio.shield(request)
+
+
+async def fetch_coin_spend_for_coin_state(
+    coin_state: CoinState, peer: WSChiaConnection, peer_request_cache: Optional[PeerRequestCache] = None
+) -> CoinSpend:
     if coin_state.spent_height is None:
         raise ValueError("coin_state.coin must be spent coin")
-    return await fetch_coin_spend(uint32(coin_state.spent_height), coin_state.coin, peer)
+    return await fetch_coin_spend(uint32(coin_state.spent_height), coin_state.coin, peer, peer_request_cache)
+
+
+@dataclasses.dataclass(frozen=True)
+class CoinStatePrefetch:
+    """
+    Peer data requested ahead of processing a list of coin states.
+    """
+
+    # parent coin id -> the parent's coin state and spend
+    parents: dict[bytes32, tuple[CoinState, CoinSpend]] = dataclasses.field(default_factory=dict)
+    # coin id -> the coin states of its children
+    children: dict[bytes32, list[CoinState]] = dataclasses.field(default_factory=dict)
+    # the errors requesting the entries above failed with, keyed the same way
+    parent_errors: dict[bytes32, Exception] = dataclasses.field(default_factory=dict)
+    children_errors: dict[bytes32, Exception] = dataclasses.field(default_factory=dict)
+
+    def get_parent(self, coin: Coin) -> Optional[tuple[CoinState, CoinSpend]]:
+        error = self.parent_errors.get(coin.parent_coin_info)
+        if error is not None:
+            raise error
+        return self.parents.get(coin.parent_coin_info)
+
+    def get_children(self, coin_id: bytes32) -> Optional[list[CoinState]]:
+        error = self.children_errors.get(coin_id)
+        if error is not None:
+            raise error
+        return self.children.get(coin_id)
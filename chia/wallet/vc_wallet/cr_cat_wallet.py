@@ -208,7 +208,9 @@ class CRCATWallet(CATWallet):
         self.log.info(f"CR-CAT wallet has been notified that {coin.name().hex()} was added")
         try:
             coin_state = await self.wallet_state_manager.wallet_node.get_coin_state([coin.parent_coin_info], peer=peer)
-            coin_spend = await fetch_coin_spend_for_coin_state(coin_state[0], peer)
+            coin_spend = await fetch_coin_spend_for_coin_state(
+                coin_state[0], peer, self.wallet_state_manager.wallet_node.get_cache_for_peer(peer)
+            )
             await self.add_crcat_coin(coin_spend, coin, height)
         except Exception as e:
             self.log.debug(f"Exception: {e}, traceback: {traceback.format_exc()}")
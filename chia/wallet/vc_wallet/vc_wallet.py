@@ -116,7 +116,9 @@ class VCWallet:
             )  # pragma: no cover
             return  # pragma: no cover
         parent_coin_state = coin_states[0]
-        cs = await fetch_coin_spend_for_coin_state(parent_coin_state, peer)
+        cs = await fetch_coin_spend_for_coin_state(
+            parent_coin_state, peer, self.wallet_state_manager.wallet_node.get_cache_for_peer(peer)
+        )
         if cs is None:
             self.log.error(
                 f"Cannot get verified credential coin: {coin.name().hex()} puzzle and solution"
@@ -378,7 +380,9 @@ class VCWallet:
         if vc_coin_states is None:
             raise ValueError(f"Cannot find verified credential coin: {parent_id.hex()}")  # pragma: no cover
         vc_coin_state = vc_coin_states[0]
-        cs: CoinSpend = await fetch_coin_spend_for_coin_state(vc_coin_state, peer)
+        cs: CoinSpend = await fetch_coin_spend_for_coin_state(
+            vc_coin_state, peer, self.wallet_state_manager.wallet_node.get_cache_for_peer(peer)
+        )
         vc: VerifiedCredential = VerifiedCredential.get_next_from_coin_spend(cs)
 
         # Check if we own the DID
@@ -207,8 +207,13 @@ class Wallet:
         Returns a set of coins that can be used for generating a new transaction.
         Note: Must be called under wallet state manager lock
         """
-        spendable_amount: uint128 = await self.get_spendable_balance()
-        spendable_coins: list[WalletCoinRecord] = list(await self.get_max_spendable_coins())
+        # load the unspent coins once, already in amount order, rather than once for the spendable balance and
+        # once more for the coins to select from
+        unspent_records = await self.wallet_state_manager.coin_store.get_unspent_coins_for_wallet_by_amount(self.id())
+        spendable = await self.wallet_state_manager.get_spendable_coins_for_wallet(self.id(), set(unspent_records))
+        spendable_records = [record for record in unspent_records if record in spendable]
+        spendable_amount = uint128(sum(record.coin.amount for record in spendable_records))
+        spendable_coins: list[WalletCoinRecord] = spendable_records[: self.max_send_quantity]
 
         # Try to use coins from the store, if there isn't enough of "unused"
         # coins use change coins that are not confirmed yet
@@ -60,6 +60,8 @@ class WalletCoinStore:
 
     db_wrapper: DBWrapper2
     total_count_cache: LRUCache[bytes32, uint32]
+    # (wallet id, coin type) -> the DB write generation and the unspent coin records at that point, largest first
+    unspent_by_amount: dict[tuple[int, CoinType], tuple[int, list[WalletCoinRecord]]]
 
     @classmethod
     async def create(cls, wrapper: DBWrapper2):
@@ -67,6 +69,7 @@ class WalletCoinStore:
 
         self.db_wrapper = wrapper
         self.total_count_cache = LRUCache(100)
+        self.unspent_by_amount = {}
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
@@ -161,6 +164,7 @@ class WalletCoinStore:
         self.total_count_cache.cache.clear()
 
     def coin_record_from_row(self, row: sqlite3.Row) -> WalletCoinRecord:
+        # Coin is implemented in rust and accepts plain bytes and ints
         coin = Coin(bytes32.fromhex(row[6]), bytes32.fromhex(row[5]), uint64.from_bytes(row[7]))
         return WalletCoinRecord(
             coin,
@@ -296,12 +300,33 @@ class WalletCoinStore:
         self, wallet_id: int, coin_type: CoinType = CoinType.NORMAL
     ) -> set[WalletCoinRecord]:
         """Returns set of CoinRecords that have not been spent yet for a wallet."""
+        return set(await self.get_unspent_coins_for_wallet_by_amount(wallet_id, coin_type))
+
+    async def get_unspent_coins_for_wallet_by_amount(
+        self, wallet_id: int, coin_type: CoinType = CoinType.NORMAL
+    ) -> list[WalletCoinRecord]:
+        """
+        Returns the CoinRecords that have not been spent yet for a wallet, largest amount first.
+        The list is kept in memory until the next write to the DB, so repeated lookups (balances, coin
+        selection) don't load and sort every unspent coin again.
+        """
+        generation = self.db_wrapper.write_generation
+        key = (wallet_id, coin_type)
+        entry = self.unspent_by_amount.get(key)
+        if entry is not None and entry[0] == generation and not self.db_wrapper.current_task_is_writer():
+            return list(entry[1])
+
         async with self.db_wrapper.reader_no_transaction() as conn:
             rows = await conn.execute_fetchall(
                 "SELECT * FROM coin_record WHERE coin_type=? AND wallet_id=? AND spent_height=0",
                 (coin_type, wallet_id),
             )
-        return {self.coin_record_from_row(row) for row in rows}
+        records = [self.coin_record_from_row(row) for row in rows]
+        records.sort(reverse=True, key=lambda record: record.coin.amount)
+        # a writer may see its own changes before they're committed, those can't be cached
+        if not self.db_wrapper.current_task_is_writer():
+            self.unspent_by_amount[key] = (generation, records)
+        return list(records)
 
     async def get_all_unspent_coins(self, coin_type: CoinType = CoinType.NORMAL) -> set[WalletCoinRecord]:
         """Returns set of CoinRecords that have not been spent yet for a wallet."""
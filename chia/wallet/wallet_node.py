@@ -60,6 +60,7 @@ from chia.wallet.util.peer_request_cache import PeerRequestCache, can_use_peer_r
 from chia.wallet.util.wallet_sync_utils import (
     PeerRequestException,
     fetch_header_blocks_in_range,
+    process_in_order,
     request_and_validate_additions,
     request_and_validate_removals,
     request_header_blocks,
@@ -126,6 +127,8 @@ class WalletNode:
     logged_in: bool = False
     _keychain_proxy: Optional[KeychainProxy] = None
     _balance_cache: dict[int, Balance] = dataclasses.field(default_factory=dict)
+    # wallet id -> the wallet DB write generation the cached balance was computed at
+    _balance_cache_generation: dict[int, int] = dataclasses.field(default_factory=dict)
     # Peers that we have long synced to
     synced_peers: set[bytes32] = dataclasses.field(default_factory=set)
     wallet_peers: Optional[WalletPeers] = None
@@ -505,6 +508,7 @@ class WalletNode:
             await asyncio.sleep(0.5)  # https://docs.aiohttp.org/en/stable/client_advanced.html#graceful-shutdown
         self.wallet_peers = None
         self._balance_cache = {}
+        self._balance_cache_generation = {}
 
     def _set_state_changed_callback(self, callback: StateChangedProtocol) -> None:
         self.state_changed_callback = callback
@@ -826,6 +830,15 @@ class WalletNode:
         # Things, so we don't have to reprocess these later. There can be many things in ph_update_res.
         use_delta_sync = self.config.get("use_delta_sync", False)
         min_height_for_subscriptions = fork_height if use_delta_sync else 0
+        # We keep a few subscription requests in flight while we add the states from the previous ones
+        requests_in_flight = self.config.get("long_sync_requests_in_flight", 4)
+
+        async def add_new_states(ph_update_res: list[CoinState]) -> bool:
+            return await self.add_states_from_peer(list(filter(is_new_state_update, ph_update_res)), full_node)
+
+        async def add_states(c_update_res: list[CoinState]) -> bool:
+            return await self.add_states_from_peer(c_update_res, full_node)
+
         already_checked_ph: set[bytes32] = set()
         while not self._shut_down:
             result = await self.wallet_state_manager.create_more_puzzle_hashes()
@@ -834,14 +847,16 @@ class WalletNode:
             not_checked_puzzle_hashes = set(all_puzzle_hashes) - already_checked_ph
             if not_checked_puzzle_hashes == set():
                 break
-            for batch in to_batches(not_checked_puzzle_hashes, 1000):
-                ph_update_res: list[CoinState] = await subscribe_to_phs(
-                    batch.entries, full_node, min_height_for_subscriptions
-                )
-                ph_update_res = list(filter(is_new_state_update, ph_update_res))
-                if not await self.add_states_from_peer(ph_update_res, full_node):
-                    # If something goes wrong, abort sync
-                    return
+            if not await process_in_order(
+                (
+                    subscribe_to_phs(batch.entries, full_node, min_height_for_subscriptions)
+                    for batch in to_batches(not_checked_puzzle_hashes, 1000)
+                ),
+                add_new_states,
+                requests_in_flight,
+            ):
+                # If something goes wrong, abort sync
+                return
             already_checked_ph.update(not_checked_puzzle_hashes)
 
         self.log.info(f"Successfully subscribed and updated {len(already_checked_ph)} puzzle hashes")
@@ -854,14 +869,16 @@ class WalletNode:
             not_checked_coin_ids = set(all_coin_ids) - already_checked_coin_ids
             if not_checked_coin_ids == set():
                 break
-            for batch in to_batches(not_checked_coin_ids, 1000):
-                c_update_res: list[CoinState] = await subscribe_to_coin_updates(
-                    batch.entries, full_node, min_height_for_subscriptions
-                )
-
-                if not await self.add_states_from_peer(c_update_res, full_node):
-                    # If something goes wrong, abort sync
-                    return
+            if not await process_in_order(
+                (
+                    subscribe_to_coin_updates(batch.entries, full_node, min_height_for_subscriptions)
+                    for batch in to_batches(not_checked_coin_ids, 1000)
+                ),
+                add_states,
+                requests_in_flight,
+            ):
+                # If something goes wrong, abort sync
+                return
             already_checked_coin_ids.update(not_checked_coin_ids)
         self.log.info(f"Successfully subscribed and updated {len(already_checked_coin_ids)} coin ids")
 
@@ -1731,6 +1748,7 @@ class WalletNode:
 
     async def _update_balance_cache(self, wallet_id: uint32) -> None:
         assert self.wallet_state_manager.lock.locked(), "WalletStateManager.lock required"
+        generation = self.wallet_state_manager.db_wrapper.write_generation
         wallet = self.wallet_state_manager.wallets[wallet_id]
         if wallet.type() == WalletType.CRCAT:
             coin_type = CoinType.CRCAT
@@ -1755,10 +1773,16 @@ class WalletNode:
             unspent_coin_count=uint32(len(unspent_records)),
             pending_coin_removal_count=uint32(len(unconfirmed_removals)),
         )
+        self._balance_cache_generation[wallet_id] = generation
 
     async def get_balance(self, wallet_id: uint32) -> Balance:
         self.log.debug(f"get_balance - wallet_id: {wallet_id}")
-        if not self.wallet_state_manager.sync_mode:
+        # The balance is derived from the wallet DB only (coins, transactions, trades), so it only needs to be
+        # recomputed after something was written to it. Polling clients get the cached balance in between.
+        if (
+            not self.wallet_state_manager.sync_mode
+            and self._balance_cache_generation.get(wallet_id) != self.wallet_state_manager.db_wrapper.write_generation
+        ):
             self.log.debug(f"get_balance - Updating cache for {wallet_id}")
             async with self.wallet_state_manager.lock:
                 await self._update_balance_cache(wallet_id)
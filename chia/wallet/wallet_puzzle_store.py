@@ -8,8 +8,7 @@ from chia_rs import G1Element
 from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint32
 
-from chia.util.db_wrapper import DBWrapper2, execute_fetchone
-from chia.util.lru_cache import LRUCache
+from chia.util.db_wrapper import DBWrapper2, execute_fetchone, execute_key_set_query
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.util.wallet_types import WalletIdentifier, WalletType
 
@@ -25,7 +24,11 @@ class WalletPuzzleStore:
 
     lock: asyncio.Lock
     db_wrapper: DBWrapper2
-    wallet_identifier_cache: LRUCache
+    # maps every puzzle hash in the table to the wallet it belongs to. Most coin states we receive are
+    # not ours, and this answers those lookups without going to the database
+    wallet_identifiers: dict[bytes32, WalletIdentifier]
+    # one WalletIdentifier instance per wallet, shared by all its puzzle hashes
+    _identifier_for_wallet: dict[tuple[int, int], WalletIdentifier]
     # maps wallet_id -> last_derivation_index
     last_wallet_derivation_index: dict[uint32, uint32]
     last_derivation_index: Optional[uint32]
@@ -63,11 +66,29 @@ class WalletPuzzleStore:
 
         # the lock is locked by the users of this class
         self.lock = asyncio.Lock()
-        self.wallet_identifier_cache = LRUCache(100)
+        self._identifier_for_wallet = {}
         self.last_derivation_index = None
         self.last_wallet_derivation_index = {}
+        await self._load_wallet_identifiers()
         return self
 
+    def _wallet_identifier(self, wallet_id: int, wallet_type: int) -> WalletIdentifier:
+        key = (wallet_id, wallet_type)
+        identifier = self._identifier_for_wallet.get(key)
+        if identifier is None:
+            identifier = WalletIdentifier(uint32(wallet_id), WalletType(wallet_type))
+            self._identifier_for_wallet[key] = identifier
+        return identifier
+
+    async def _load_wallet_identifiers(self) -> None:
+        wallet_identifiers: dict[bytes32, WalletIdentifier] = {}
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            async with conn.execute("SELECT puzzle_hash, wallet_type, wallet_id FROM derivation_paths") as cursor:
+                async for row in cursor:
+                    # if a puzzle hash belongs to more than one wallet, the first one wins
+                    wallet_identifiers.setdefault(bytes32.fromhex(row[0]), self._wallet_identifier(row[2], row[1]))
+        self.wallet_identifiers = wallet_identifiers
+
     async def add_derivation_paths(self, records: list[DerivationRecord]) -> None:
         """
         Insert many derivation paths into the database.
@@ -75,6 +96,7 @@ class WalletPuzzleStore:
         if len(records) == 0:
             return
         sql_records = []
+        new_identifiers: dict[bytes32, WalletIdentifier] = {}
         for record in records:
             log.debug("Adding derivation record: %s", record)
             if record.hardened:
@@ -101,6 +123,10 @@ class WalletPuzzleStore:
                 self.last_wallet_derivation_index[record.wallet_id] = max(
                     self.last_wallet_derivation_index[record.wallet_id], record.index
                 )
+            if record.puzzle_hash not in self.wallet_identifiers:
+                new_identifiers.setdefault(
+                    record.puzzle_hash, self._wallet_identifier(record.wallet_id, record.wallet_type)
+                )
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await (
@@ -109,6 +135,14 @@ class WalletPuzzleStore:
                     sql_records,
                 )
             ).close()
+        self.wallet_identifiers.update(new_identifiers)
+
+    async def rollback_wallet_identifiers(self) -> None:
+        """
+        Rebuilds wallet_identifiers from the database, after the transaction
+        the derivation paths were added or deleted in was rolled back.
+        """
+        await self._load_wallet_identifiers()
 
     async def get_derivation_record(
         self, index: uint32, wallet_id: uint32, hardened: bool
@@ -137,6 +171,9 @@ class WalletPuzzleStore:
         """
         Returns the derivation record by index and wallet id.
         """
+        if puzzle_hash not in self.wallet_identifiers:
+            return None
+
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn,
@@ -165,13 +202,7 @@ class WalletPuzzleStore:
         """
         Checks if passed puzzle_hash is present in the db.
         """
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            row = await execute_fetchone(
-                conn, "SELECT puzzle_hash FROM derivation_paths WHERE puzzle_hash=?", (puzzle_hash.hex(),)
-            )
-
-        return row is not None
+        return puzzle_hash in self.wallet_identifiers
 
     def row_to_record(self, row) -> DerivationRecord:
         return DerivationRecord(
@@ -221,6 +252,9 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
+        if puzzle_hash not in self.wallet_identifiers:
+            return None
+
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn, "SELECT derivation_index FROM derivation_paths WHERE puzzle_hash=?", (puzzle_hash.hex(),)
@@ -232,6 +266,9 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
+        if puzzle_hash not in self.wallet_identifiers:
+            return None
+
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn,
@@ -251,21 +288,7 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
-        cached = self.wallet_identifier_cache.get(puzzle_hash)
-        if cached is not None:
-            return cached
-
-        async with self.db_wrapper.reader_no_transaction() as conn:
-            row = await execute_fetchone(
-                conn, "SELECT wallet_type, wallet_id FROM derivation_paths WHERE puzzle_hash=?", (puzzle_hash.hex(),)
-            )
-
-        if row is not None:
-            wallet_identifier = WalletIdentifier(uint32(row[1]), WalletType(row[0]))
-            self.wallet_identifier_cache.put(puzzle_hash, wallet_identifier)
-            return wallet_identifier
-
-        return None
+        return self.wallet_identifiers.get(puzzle_hash)
 
     async def get_all_puzzle_hashes(self, wallet_id: Optional[int] = None) -> set[bytes32]:
         """
@@ -361,19 +384,22 @@ class WalletPuzzleStore:
 
     async def delete_wallet(self, wallet_id: uint32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
-            # First fetch all puzzle hashes since we need them to drop them from the cache
-            rows = await conn.execute_fetchall(
-                "SELECT puzzle_hash FROM derivation_paths WHERE wallet_id=?", (wallet_id,)
-            )
             cursor = await conn.execute("DELETE FROM derivation_paths WHERE wallet_id=?;", (wallet_id,))
             await cursor.close()
-        # Clear caches
-        puzzle_hashes = {bytes32.fromhex(row[0]) for row in rows}
-        for puzzle_hash in puzzle_hashes:
-            try:
-                self.wallet_identifier_cache.remove(puzzle_hash)
-            except KeyError:
-                pass
+            deleted = [
+                puzzle_hash for puzzle_hash, identifier in self.wallet_identifiers.items() if identifier.id == wallet_id
+            ]
+            for puzzle_hash in deleted:
+                del self.wallet_identifiers[puzzle_hash]
+            # some of the puzzle hashes may still belong to another wallet
+            rows = await execute_key_set_query(
+                conn,
+                "SELECT puzzle_hash, wallet_type, wallet_id FROM derivation_paths "
+                "WHERE puzzle_hash IN ({in_list}) ORDER BY rowid",
+                [puzzle_hash.hex() for puzzle_hash in deleted],
+            )
+            for row in rows:
+                self.wallet_identifiers.setdefault(bytes32.fromhex(row[0]), self._wallet_identifier(row[2], row[1]))
         try:
             self.last_wallet_derivation_index.pop(wallet_id)
         except KeyError:
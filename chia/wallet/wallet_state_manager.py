@@ -36,7 +36,9 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.program import NIL, Program
 from chia.types.coin_record import CoinRecord
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
+from chia.util.batches import to_batches
 from chia.util.bech32m import encode_puzzle_hash
+from chia.util.config import process_config_start_method
 from chia.util.db_synchronous import db_synchronous_on
 from chia.util.db_wrapper import DBWrapper2, PurposefulAbort
 from chia.util.errors import Err
@@ -60,7 +62,6 @@ from chia.wallet.db_wallet.db_wallet_puzzles import MIRROR_PUZZLE_HASH
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.derive_keys import (
     _derive_path,
-    _derive_pk_unhardened,
     master_pk_to_wallet_pk_unhardened,
     master_pk_to_wallet_pk_unhardened_intermediate,
     master_sk_to_wallet_sk,
@@ -104,10 +105,12 @@ from chia.wallet.util.compute_hints import compute_spend_hints_and_additions
 from chia.wallet.util.compute_memos import compute_memos
 from chia.wallet.util.curry_and_treehash import NIL_TREEHASH
 from chia.wallet.util.puzzle_decorator import PuzzleDecoratorManager
+from chia.wallet.util.puzzle_hash_derivation import derive_unhardened_keys
 from chia.wallet.util.query_filter import HashFilter
 from chia.wallet.util.transaction_type import CLAWBACK_INCOMING_TRANSACTION_TYPES, TransactionType
 from chia.wallet.util.tx_config import TXConfig, TXConfigLoader
 from chia.wallet.util.wallet_sync_utils import (
+    CoinStatePrefetch,
     PeerRequestException,
     fetch_coin_spend_for_coin_state,
     last_change_height_cs,
@@ -229,6 +232,9 @@ class WalletStateManager:
         min_num_public_keys = 425
         if not config.get("testing", False) and self.initial_num_public_keys < min_num_public_keys:
             self.initial_num_public_keys = min_num_public_keys
+        self.multiprocessing_context = multiprocessing.get_context(
+            method=process_config_start_method(config=self.config, log=self.log)
+        )
 
         self.coin_store = await WalletCoinStore.create(self.db_wrapper)
         self.tx_store = await WalletTransactionStore.create(self.db_wrapper)
@@ -373,9 +379,14 @@ class WalletStateManager:
         async with self.db_wrapper.writer():
             old_cache = self.puzzle_store.last_wallet_derivation_index.copy()
             try:
-                yield
+                # the inner writer is a savepoint, so the puzzle hash index
+                # can be reloaded from the rolled back state before the outer
+                # writer is released
+                async with self.db_wrapper.writer():
+                    yield
             except Exception:
                 self.puzzle_store.last_wallet_derivation_index = old_cache
+                await self.puzzle_store.rollback_wallet_identifiers()
                 raise
 
     async def create_more_puzzle_hashes(
@@ -457,7 +468,6 @@ class WalletStateManager:
                 # now derive the keysfrom lowest_start_index to last_index
                 # these maps derivation index to public key
                 hardened_keys: dict[int, G1Element] = {}
-                unhardened_keys: dict[int, G1Element] = {}
 
                 if self.private_key is not None:
                     # Hardened
@@ -466,9 +476,21 @@ class WalletStateManager:
                         hardened_keys[index] = _derive_path(intermediate_sk, [index]).get_g1()
 
                 # Unhardened
+                # these also come with the standard puzzle hash of each key, which is all the standard wallet needs
                 intermediate_pk_un = master_pk_to_wallet_pk_unhardened_intermediate(self.root_pubkey)
-                for index in range(lowest_start_index, last_index + 1):
-                    unhardened_keys[index] = _derive_pk_unhardened(intermediate_pk_un, [index])
+                unhardened_keys: dict[int, tuple[G1Element, bytes32]] = dict(
+                    enumerate(
+                        await derive_unhardened_keys(
+                            intermediate_pk_un,
+                            lowest_start_index,
+                            last_index + 1,
+                            num_workers=self.config.get("puzzle_hash_derivation_workers", 2),
+                            min_pool_size=self.config.get("puzzle_hash_derivation_pool_threshold", 5000),
+                            multiprocessing_context=self.multiprocessing_context,
+                        ),
+                        start=lowest_start_index,
+                    )
+                )
 
                 derivation_paths: list[DerivationRecord] = (
                     [] if previous_result is None else previous_result.derivation_paths
@@ -501,9 +523,9 @@ class WalletStateManager:
                                 )
                             )
                         # Unhardened
-                        pubkey = unhardened_keys.get(index)
-                        assert pubkey is not None
-                        puzzlehash_unhardened: bytes32 = target_wallet.puzzle_hash_for_pk(pubkey)
+                        pubkey, puzzlehash_unhardened = unhardened_keys[index]
+                        if target_wallet.type() != WalletType.STANDARD_WALLET:
+                            puzzlehash_unhardened = target_wallet.puzzle_hash_for_pk(pubkey)
                         self.log.debug(
                             f"Puzzle at index {index} wallet ID {wallet_id} puzzle hash {puzzlehash_unhardened.hex()}"
                         )
@@ -818,25 +840,37 @@ class WalletStateManager:
         return {**removals, **{coin_id: cr.coin for coin_id, cr in trade_removals.items() if cr.wallet_id == wallet_id}}
 
     async def determine_coin_type(
-        self, peer: WSChiaConnection, coin_state: CoinState, fork_height: Optional[uint32]
+        self,
+        peer: WSChiaConnection,
+        coin_state: CoinState,
+        fork_height: Optional[uint32],
+        parent: Optional[tuple[CoinState, CoinSpend]] = None,
     ) -> tuple[Optional[WalletIdentifier], Optional[Streamable]]:
+        """
+        parent is the state and spend of the coin's parent, if the caller already has them (see
+        prefetch_for_coin_states()). Otherwise they're requested from peer.
+        """
         if coin_state.created_height is not None and (
             self.is_pool_reward(uint32(coin_state.created_height), coin_state.coin)
             or self.is_farmer_reward(uint32(coin_state.created_height), coin_state.coin)
         ):
             return None, None
 
-        response: list[CoinState] = await self.wallet_node.get_coin_state(
-            [coin_state.coin.parent_coin_info], peer=peer, fork_height=fork_height
-        )
-        if len(response) == 0:
-            self.log.warning(f"Could not find a parent coin with ID: {coin_state.coin.parent_coin_info.hex()}")
-            return None, None
-        parent_coin_state = response[0]
+        if parent is not None:
+            parent_coin_state, coin_spend = parent
+        else:
+            response: list[CoinState] = await self.wallet_node.get_coin_state(
+                [coin_state.coin.parent_coin_info], peer=peer, fork_height=fork_height
+            )
+            if len(response) == 0:
+                self.log.warning(f"Could not find a parent coin with ID: {coin_state.coin.parent_coin_info.hex()}")
+                return None, None
+            parent_coin_state = response[0]
+            coin_spend = await fetch_coin_spend_for_coin_state(
+                parent_coin_state, peer, self.wallet_node.get_cache_for_peer(peer)
+            )
         assert parent_coin_state.spent_height == coin_state.created_height
 
-        coin_spend = await fetch_coin_spend_for_coin_state(parent_coin_state, peer)
-
         uncurried = uncurry_puzzle(coin_spend.puzzle_reveal)
 
         # Check if the coin is a CAT
@@ -1330,7 +1364,9 @@ class WalletStateManager:
     async def get_minter_did(self, launcher_coin: Coin, peer: WSChiaConnection) -> Optional[bytes32]:
         # Get minter DID
         eve_coin = (await self.wallet_node.fetch_children(launcher_coin.name(), peer=peer))[0]
-        eve_coin_spend = await fetch_coin_spend_for_coin_state(eve_coin, peer)
+        eve_coin_spend = await fetch_coin_spend_for_coin_state(
+            eve_coin, peer, self.wallet_node.get_cache_for_peer(peer)
+        )
         eve_full_puzzle: Program = Program.from_bytes(bytes(eve_coin_spend.puzzle_reveal))
         eve_uncurried_nft: Optional[UncurriedNFT] = UncurriedNFT.uncurry(*eve_full_puzzle.uncurry())
         if eve_uncurried_nft is None:
@@ -1359,7 +1395,9 @@ class WalletStateManager:
                 [launcher_parent[0].coin.parent_coin_info], peer=peer
             )
             assert did_coin is not None and len(did_coin) == 1 and did_coin[0].spent_height is not None
-            did_spend = await fetch_coin_spend_for_coin_state(did_coin[0], peer)
+            did_spend = await fetch_coin_spend_for_coin_state(
+                did_coin[0], peer, self.wallet_node.get_cache_for_peer(peer)
+            )
             uncurried = uncurry_puzzle(did_spend.puzzle_reveal)
             did_curried_args = match_did_puzzle(uncurried.mod, uncurried.args)
             if did_curried_args is not None:
@@ -1507,7 +1545,9 @@ class WalletStateManager:
                 spent_height = uint32(coin_state.spent_height)
                 # Create Clawback outgoing transaction
                 created_timestamp = await self.wallet_node.get_timestamp_for_height(uint32(coin_state.spent_height))
-                clawback_coin_spend: CoinSpend = await fetch_coin_spend_for_coin_state(coin_state, peer)
+                clawback_coin_spend: CoinSpend = await fetch_coin_spend_for_coin_state(
+                    coin_state, peer, self.wallet_node.get_cache_for_peer(peer)
+                )
                 clawback_spend_bundle = WalletSpendBundle([clawback_coin_spend], G2Element())
                 if await self.puzzle_store.puzzle_hash_exists(clawback_spend_bundle.additions()[0].puzzle_hash):
                     tx_record = TransactionRecord(
@@ -1595,6 +1635,94 @@ class WalletStateManager:
         vc_wallet = await VCWallet.create_new_vc_wallet(self, self.main_wallet)  # pragma: no cover
         return WalletIdentifier(vc_wallet.id(), WalletType.VC)  # pragma: no cover
 
+    async def prefetch_for_coin_states(
+        self,
+        coin_names: list[bytes32],
+        coin_states: list[CoinState],
+        local_records: dict[bytes32, WalletCoinRecord],
+        peer: WSChiaConnection,
+        fork_height: Optional[uint32],
+    ) -> CoinStatePrefetch:
+        """
+        Requests the peer data that _add_coin_states() will need for coin_states, instead of one request
+        at a time while processing them: the parents (and their spends) of new coins we can't attribute to a
+        wallet yet, and the children of our coins that were spent. Parent states are requested in batches,
+        spends and children concurrently. A failed request is recorded in the result, and raised when the coin
+        state that needs it is processed, just like if the request had been made at that point.
+        """
+        unknown_parents: dict[bytes32, int] = {}
+        spent_coins: list[bytes32] = []
+        for coin_name, coin_state in zip(coin_names, coin_states):
+            if coin_state.created_height is None:
+                continue
+            local_record = local_records.get(coin_name)
+            if local_record is not None:
+                if (
+                    local_record.spent_block_height == (coin_state.spent_height or 0)
+                    and local_record.confirmed_block_height == coin_state.created_height
+                ):
+                    continue
+            ours = (
+                local_record is not None
+                or await self.puzzle_store.puzzle_hash_exists(coin_state.coin.puzzle_hash)
+                or await self.interested_store.get_interested_puzzle_hash_wallet_id(coin_state.coin.puzzle_hash)
+                is not None
+            )
+            if ours:
+                if coin_state.spent_height is not None:
+                    spent_coins.append(coin_name)
+            elif not self.is_pool_reward(
+                uint32(coin_state.created_height), coin_state.coin
+            ) and not self.is_farmer_reward(uint32(coin_state.created_height), coin_state.coin):
+                unknown_parents[coin_state.coin.parent_coin_info] = coin_state.created_height
+
+        result = CoinStatePrefetch()
+        peer_request_cache = self.wallet_node.get_cache_for_peer(peer)
+        semaphore = asyncio.Semaphore(self.config.get("coin_state_prefetch_requests", 10))
+
+        async def fetch_parents(parent_ids: list[bytes32]) -> None:
+            try:
+                async with semaphore:
+                    parent_states = await self.wallet_node.get_coin_state(
+                        parent_ids, peer=peer, fork_height=fork_height
+                    )
+            except Exception as e:
+                result.parent_errors.update((parent_id, e) for parent_id in parent_ids)
+                return
+            await asyncio.gather(
+                *(
+                    fetch_parent_spend(parent_state)
+                    for parent_state in parent_states
+                    if parent_state.spent_height is not None
+                    and parent_state.spent_height == unknown_parents.get(parent_state.coin.name())
+                )
+            )
+
+        async def fetch_parent_spend(parent_state: CoinState) -> None:
+            parent_id = parent_state.coin.name()
+            try:
+                async with semaphore:
+                    coin_spend = await fetch_coin_spend_for_coin_state(parent_state, peer, peer_request_cache)
+            except Exception as e:
+                result.parent_errors[parent_id] = e
+                return
+            result.parents[parent_id] = (parent_state, coin_spend)
+
+        async def fetch_children(coin_name: bytes32) -> None:
+            try:
+                async with semaphore:
+                    children = await self.wallet_node.fetch_children(coin_name, peer=peer, fork_height=fork_height)
+            except Exception as e:
+                result.children_errors[coin_name] = e
+                return
+            result.children[coin_name] = children
+
+        await asyncio.gather(
+            *(fetch_parents(batch.entries) for batch in to_batches(list(unknown_parents), 1000)),
+            *(fetch_children(coin_name) for coin_name in spent_coins),
+        )
+        return result
+
     async def _add_coin_states(
         self,
         coin_states: list[CoinState],
@@ -1617,6 +1745,9 @@ class WalletStateManager:
 
         coin_names = [bytes32(coin_state.coin.name()) for coin_state in coin_states]
         local_records = await self.coin_store.get_coin_records(coin_id_filter=HashFilter.include(coin_names))
+        prefetched = await self.prefetch_for_coin_states(
+            coin_names, coin_states, local_records.coin_id_to_record, peer, fork_height
+        )
 
         for coin_name, coin_state in zip(coin_names, coin_states):
             if peer.closed:
@@ -1625,7 +1756,10 @@ class WalletStateManager:
             local_record = local_records.coin_id_to_record.get(coin_name)
             rollback_wallets = None
             try:
-                async with self.db_wrapper.writer():
+                # this may add new puzzle hashes (create_more_puzzle_hashes() in
+                # coin_added()), which must be forgotten if the transaction is
+                # rolled back
+                async with self.puzzle_hash_db_writer():
                     rollback_wallets = self.wallets.copy()  # Shallow copy of wallets if writer rolls back the db
                     # This only succeeds if we don't raise out of the transaction
                     await self.retry_store.remove_state(coin_state)
@@ -1650,7 +1784,9 @@ class WalletStateManager:
                     elif local_record is not None:
                         wallet_identifier = WalletIdentifier(uint32(local_record.wallet_id), local_record.wallet_type)
                     elif coin_state.created_height is not None:
-                        wallet_identifier, coin_data = await self.determine_coin_type(peer, coin_state, fork_height)
+                        wallet_identifier, coin_data = await self.determine_coin_type(
+                            peer, coin_state, fork_height, prefetched.get_parent(coin_state.coin)
+                        )
                         try:
                             dl_wallet = self.get_dl_wallet()
                         except ValueError:
@@ -1711,7 +1847,11 @@ class WalletStateManager:
                     # if the coin has been spent
                     elif coin_state.created_height is not None and coin_state.spent_height is not None:
                         self.log.debug("Coin spent: %s", coin_state)
-                        children = await self.wallet_node.fetch_children(coin_name, peer=peer, fork_height=fork_height)
+                        children = prefetched.get_children(coin_name)
+                        if children is None:
+                            children = await self.wallet_node.fetch_children(
+                                coin_name, peer=peer, fork_height=fork_height
+                            )
                         record = local_record
                         if record is None:
                             farmer_reward = False
@@ -1795,7 +1935,9 @@ class WalletStateManager:
                                         if coin_spend is None:
                                             # To prevent unnecessary fetch, we only fetch once,
                                             # if there is a child coin that is not owned by the wallet.
-                                            coin_spend = await fetch_coin_spend_for_coin_state(coin_state, peer)
+                                            coin_spend = await fetch_coin_spend_for_coin_state(
+                                                coin_state, peer, self.wallet_node.get_cache_for_peer(peer)
+                                            )
                                             # Check if the parent coin is a Clawback coin
                                             uncurried = uncurry_puzzle(coin_spend.puzzle_reveal)
                                             clawback_metadata = match_clawback_puzzle(
@@ -1890,7 +2032,9 @@ class WalletStateManager:
                                 curr_coin_state: CoinState = coin_state
 
                                 while curr_coin_state.spent_height is not None:
-                                    cs: CoinSpend = await fetch_coin_spend_for_coin_state(curr_coin_state, peer)
+                                    cs: CoinSpend = await fetch_coin_spend_for_coin_state(
+                                        curr_coin_state, peer, self.wallet_node.get_cache_for_peer(peer)
+                                    )
                                     async with self.new_action_scope(self.tx_config, push=True) as action_scope:
                                         success = await singleton_wallet.apply_state_transition(
                                             cs, uint32(curr_coin_state.spent_height), action_scope
@@ -1925,7 +2069,9 @@ class WalletStateManager:
                                     assert len(new_coin_state) == 1
                                     curr_coin_state = new_coin_state[0]
                         if record.wallet_type == WalletType.DATA_LAYER:
-                            singleton_spend = await fetch_coin_spend_for_coin_state(coin_state, peer)
+                            singleton_spend = await fetch_coin_spend_for_coin_state(
+                                coin_state, peer, self.wallet_node.get_cache_for_peer(peer)
+                            )
                             dl_wallet = self.get_wallet(id=uint32(record.wallet_id), required_type=DataLayerWallet)
                             await dl_wallet.singleton_removed(
                                 singleton_spend,
@@ -1950,7 +2096,9 @@ class WalletStateManager:
                             if child.spent_height is None:
                                 # TODO handle spending launcher later block
                                 continue
-                            launcher_spend = await fetch_coin_spend_for_coin_state(child, peer)
+                            launcher_spend = await fetch_coin_spend_for_coin_state(
+                                child, peer, self.wallet_node.get_cache_for_peer(peer)
+                            )
                             if launcher_spend is None:
                                 continue
                             try:
@@ -10,8 +10,9 @@ from chia_rs.sized_bytes import bytes32
 from chia_rs.sized_ints import uint8, uint32
 
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
-from chia.util.db_wrapper import DBWrapper2
+from chia.util.db_wrapper import DBWrapper2, execute_key_set_query
 from chia.util.errors import Err
+from chia.util.lru_cache import LRUCache
 from chia.wallet.conditions import ConditionValidTimes
 from chia.wallet.transaction_record import (
     LightTransactionRecord,
@@ -25,6 +26,12 @@ from chia.wallet.util.transaction_type import TransactionType
 
 log = logging.getLogger(__name__)
 
+# the index that covers each sort order of get_transactions_between()
+SORT_KEY_INDEXES: dict[str, str] = {
+    "CONFIRMED_AT_HEIGHT": "tx_wallet_confirmed_at_height",
+    "RELEVANCE": "tx_wallet_relevance",
+}
+
 
 def filter_ok_mempool_status(sent_to: list[tuple[str, uint8, Optional[str]]]) -> list[tuple[str, uint8, Optional[str]]]:
     """Remove SUCCESS and PENDING status records from a TransactionRecord sent_to field"""
@@ -44,12 +51,15 @@ class WalletTransactionStore:
     tx_submitted: dict[bytes32, tuple[int, int]]  # tx_id: [time submitted: count]
     unconfirmed_txs: list[LightTransactionRecord]  # tx_id: [time submitted: count]
     last_wallet_tx_resend_time: int  # Epoch time in seconds
+    # (wallet_id, confirmed, type filter) -> DB write generation, transaction count
+    count_cache: LRUCache[tuple[int, Optional[bool], Optional[tuple[int, tuple[int, ...]]]], tuple[int, int]]
 
     @classmethod
     async def create(cls, db_wrapper: DBWrapper2):
         self = cls()
 
         self.db_wrapper = db_wrapper
+        self.count_cache = LRUCache(100)
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
                 "CREATE TABLE IF NOT EXISTS transaction_record("
@@ -78,9 +88,21 @@ class WalletTransactionStore:
             await conn.execute("CREATE INDEX IF NOT EXISTS tx_to_puzzle_hash on transaction_record(to_puzzle_hash)")
             await conn.execute("CREATE INDEX IF NOT EXISTS tx_confirmed on transaction_record(confirmed)")
             await conn.execute("CREATE INDEX IF NOT EXISTS tx_sent on transaction_record(sent)")
+            # These cover the transaction listing and counting queries, so they can find the transactions of a
+            # page (or count them) without reading the (large) records themselves. They make the plain wallet_id
+            # index redundant.
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS tx_wallet_confirmed_at_height"
+                " on transaction_record(wallet_id, confirmed_at_height, type, confirmed)"
+            )
             await conn.execute(
-                "CREATE INDEX IF NOT EXISTS transaction_record_wallet_id on transaction_record(wallet_id)"
+                "CREATE INDEX IF NOT EXISTS tx_wallet_relevance on transaction_record"
+                "(wallet_id, confirmed, confirmed_at_height DESC, created_at_time DESC, type)"
             )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS tx_wallet_type on transaction_record(wallet_id, type, confirmed)"
+            )
+            await conn.execute("DROP INDEX IF EXISTS transaction_record_wallet_id")
             await conn.execute(
                 "CREATE INDEX IF NOT EXISTS transaction_record_trade_id_idx ON transaction_record(trade_id)"
             )
@@ -348,15 +370,26 @@ class WalletTransactionStore:
                 f"IN ({','.join([str(x) for x in type_filter.values])})"
             )
 
-        async with self.db_wrapper.reader_no_transaction() as conn:
+        async with self.db_wrapper.reader() as conn:
+            # Find the transactions on the page using the index only, and then load just those records. Selecting
+            # the records directly would have SQLite sort the records of all of the wallet's transactions.
             rows = await conn.execute_fetchall(
-                f"SELECT transaction_record FROM transaction_record WHERE wallet_id=?{puzz_hash_where}"
-                f" {type_filter_str} {confirmed_str} {query_str}, rowid"
+                f"SELECT rowid FROM transaction_record INDEXED BY {SORT_KEY_INDEXES[sort_key]}"
+                f" WHERE wallet_id=?{puzz_hash_where} {type_filter_str} {confirmed_str} {query_str}, rowid"
                 f" LIMIT {start}, {limit}",
                 (wallet_id,),
             )
+            rowids = [row[0] for row in rows]
+            if len(rowids) == 0:
+                return []
+            record_rows = await execute_key_set_query(
+                conn, "SELECT rowid, transaction_record FROM transaction_record WHERE rowid IN ({in_list})", rowids
+            )
+            records = {row[0]: row[1] for row in record_rows}
 
-        return await self._get_new_tx_records_from_old([TransactionRecordOld.from_bytes(row[0]) for row in rows])
+        return await self._get_new_tx_records_from_old(
+            [TransactionRecordOld.from_bytes(records[rowid]) for rowid in rowids]
+        )
 
     async def get_transaction_count_for_wallet(
         self,
@@ -364,6 +397,17 @@ class WalletTransactionStore:
         confirmed: Optional[bool] = None,
         type_filter: Optional[TransactionTypeFilter] = None,
     ) -> int:
+        # the count is cached until the next write to the DB
+        generation = self.db_wrapper.write_generation
+        key = (
+            wallet_id,
+            confirmed,
+            None if type_filter is None else (type_filter.mode, tuple(type_filter.values)),
+        )
+        cached = self.count_cache.get(key)
+        if cached is not None and cached[0] == generation and not self.db_wrapper.current_task_is_writer():
+            return cached[1]
+
         confirmed_str = ""
         if confirmed is not None:
             confirmed_str = f"AND confirmed={int(confirmed)}"
@@ -378,11 +422,15 @@ class WalletTransactionStore:
         async with self.db_wrapper.reader_no_transaction() as conn:
             rows = list(
                 await conn.execute_fetchall(
-                    f"SELECT COUNT(*) FROM transaction_record where wallet_id=? {type_filter_str} {confirmed_str}",
+                    f"SELECT COUNT(*) FROM transaction_record INDEXED BY tx_wallet_type"
+                    f" where wallet_id=? {type_filter_str} {confirmed_str}",
                     (wallet_id,),
                 )
             )
-        return 0 if len(rows) == 0 else rows[0][0]
+        count = 0 if len(rows) == 0 else rows[0][0]
+        if not self.db_wrapper.current_task_is_writer():
+            self.count_cache.put(key, (generation, count))
+        return count
 
     async def get_all_transactions_for_wallet(
         self, wallet_id: int, type: Optional[int] = None
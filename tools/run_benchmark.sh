@@ -15,6 +15,14 @@ run_benchmark() {
   # mv profile-node "$2"
 }
 
+run_replay_benchmark() {
+  # replays the chain through the sync pipeline, reporting the time spent in
+  # each stage. Compare two runs with:
+  # python -m tools.test_full_sync compare <baseline>/benchmark.json <candidate>/benchmark.json
+  mkdir -p "$2"
+  python -m tools.test_full_sync benchmark --test-constants "$1" --json-output "$2/benchmark.json"
+}
+
 cd ..
 
 if [ "$1" = "" ]; then
@@ -31,3 +39,6 @@ run_benchmark stress-test-blockchain-1500-0-refs.sqlite "${TEST_NAME}-keepup-emp
 
 run_benchmark stress-test-blockchain-500-100.sqlite "${TEST_NAME}-sync-full" ""
 run_benchmark stress-test-blockchain-500-100.sqlite "${TEST_NAME}-keepup-full" --keep-up
+
+run_replay_benchmark stress-test-blockchain-1500-0-refs.sqlite "${TEST_NAME}-replay-empty"
+run_replay_benchmark stress-test-blockchain-500-100.sqlite "${TEST_NAME}-replay-full"
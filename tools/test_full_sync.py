@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
 from pathlib import Path
 from typing import Optional
@@ -12,7 +13,7 @@ import click
 import zstd
 from chia_rs import FullBlock
 
-from chia._tests.util.full_sync import FakePeer, FakeServer, run_sync_test
+from chia._tests.util.full_sync import FakePeer, FakeServer, run_sync_benchmark, run_sync_test
 from chia.cmds.init_funcs import chia_init
 from chia.consensus.augmented_chain import AugmentedBlockchain
 from chia.consensus.block_body_validation import ForkInfo
@@ -50,6 +51,13 @@ def main() -> None:
     default=False,
     help="run node in a single process, to include validation in profiles",
 )
+@click.option(
+    "--multiprocess-validation",
+    is_flag=True,
+    required=False,
+    default=False,
+    help="pre-validate blocks in worker processes rather than threads",
+)
 @click.option(
     "--keep-up",
     is_flag=True,
@@ -69,6 +77,7 @@ def run(
     db_version: int,
     profile: bool,
     single_thread: bool,
+    multiprocess_validation: bool,
     test_constants: bool,
     keep_up: bool,
     db_sync: str,
@@ -90,8 +99,104 @@ def run(
             db_sync,
             node_profiler,
             start_at_checkpoint,
+            multiprocess_validation,
+        )
+    )
+
+
+@main.command("benchmark", help="replay an existing blockchain db through the sync pipeline and report timings")
+@click.argument("file", type=click.Path(), required=True)
+@click.option("--db-version", type=int, required=False, default=2, help="the DB version to use in simulated node")
+@click.option("--db-sync", type=str, required=False, default="off", help="sqlite sync mode. One of: off, normal, full")
+@click.option(
+    "--test-constants",
+    is_flag=True,
+    required=False,
+    default=False,
+    help="expect the blockchain database to be blocks using the test constants",
+)
+@click.option(
+    "--single-thread",
+    is_flag=True,
+    required=False,
+    default=False,
+    help="run node in a single process",
+)
+@click.option(
+    "--multiprocess-validation",
+    is_flag=True,
+    required=False,
+    default=False,
+    help="pre-validate blocks in worker processes rather than threads",
+)
+@click.option("--peers", type=int, required=False, default=4, help="the number of local peers serving blocks")
+@click.option(
+    "--start-at-checkpoint",
+    type=click.Path(),
+    required=False,
+    default=None,
+    help="start test from this specified checkpoint state",
+)
+@click.option("--json-output", type=click.Path(), required=False, default=None, help="write the report to this file")
+def benchmark(
+    file: Path,
+    db_version: int,
+    db_sync: str,
+    test_constants: bool,
+    single_thread: bool,
+    multiprocess_validation: bool,
+    peers: int,
+    start_at_checkpoint: Optional[str],
+    json_output: Optional[str],
+) -> None:
+    """
+    The FILE parameter should point to an existing blockchain database file
+    (in v2 format), e.g. one created by tools/generate_chain.py
+    """
+    report = asyncio.run(
+        run_sync_benchmark(
+            Path(file),
+            db_version,
+            single_thread,
+            test_constants,
+            db_sync,
+            start_at_checkpoint,
+            multiprocess_validation,
+            peers,
         )
     )
+    print(f"blocks:      {report['blocks']} ({report['start_height']} - {report['end_height']})")
+    print(f"duration:    {report['duration']:0.2f} s")
+    print(f"blocks/s:    {report['blocks_per_second']:0.2f}")
+    print(f"peak RSS:    {report['peak_rss'] / 1024 / 1024:0.1f} MiB")
+    for stage, timing in report["stages"].items():
+        print(f"{stage + ':':<18} {timing['seconds']:8.2f} s {timing['calls']:8d} calls")
+    if json_output is not None:
+        with open(json_output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+@main.command("compare", help="compare the reports of two benchmark runs")
+@click.argument("baseline", type=click.Path(), required=True)
+@click.argument("candidate", type=click.Path(), required=True)
+def compare(baseline: str, candidate: str) -> None:
+    with open(baseline) as f:
+        base = json.load(f)
+    with open(candidate) as f:
+        cand = json.load(f)
+
+    def row(name: str, before: float, after: float) -> None:
+        change = f"{(after - before) / before * 100:+7.1f}%" if before != 0 else ""
+        print(f"{name:<24} {before:12.2f} {after:12.2f} {change}")
+
+    print(f"{'':<24} {'baseline':>12} {'candidate':>12}")
+    row("duration (s)", base["duration"], cand["duration"])
+    row("blocks/s", base["blocks_per_second"], cand["blocks_per_second"])
+    row("peak RSS (MiB)", base["peak_rss"] / 1024 / 1024, cand["peak_rss"] / 1024 / 1024)
+    for stage in sorted(base["stages"].keys() | cand["stages"].keys()):
+        before = base["stages"].get(stage, {"seconds": 0.0})["seconds"]
+        after = cand["stages"].get(stage, {"seconds": 0.0})["seconds"]
+        row(f"{stage} (s)", before, after)
 
 
 @main.command("analyze", help="generate call stacks for all profiles dumped to current directory")
@@ -202,6 +307,8 @@ async def run_sync_checkpoint(
 
 
 main.add_command(run)
+main.add_command(benchmark)
+main.add_command(compare)
 main.add_command(analyze)
 
 if __name__ == "__main__":